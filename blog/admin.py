@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Blog, Tag, Category, Comment, Reaction, Follow, Notification
+from .models import Blog, Tag, Category, Comment, Reaction, ReactionCount, Follow, Notification, EngagementRollup
 
 # Tag Admin
 class TagAdmin(admin.ModelAdmin):
@@ -37,6 +37,14 @@ class ReactionAdmin(admin.ModelAdmin):
 
 admin.site.register(Reaction, ReactionAdmin)
 
+# Reaction Count Admin
+class ReactionCountAdmin(admin.ModelAdmin):
+    list_display = ('blog', 'like', 'love', 'haha', 'wow', 'applaud')
+    search_fields = ('blog__title',)
+    readonly_fields = ('blog', 'like', 'love', 'haha', 'wow', 'applaud')  # Maintained by signals
+
+admin.site.register(ReactionCount, ReactionCountAdmin)
+
 # Comment Admin
 class CommentAdmin(admin.ModelAdmin):
     list_display = ('blog', 'author', 'content', 'created_at')
@@ -60,3 +68,12 @@ class NotificationAdmin(admin.ModelAdmin):
     search_fields = ('recipient__username', 'sender__username', 'notification_type')
 
 admin.site.register(Notification, NotificationAdmin)
+
+# Engagement Rollup Admin
+class EngagementRollupAdmin(admin.ModelAdmin):
+    list_display = ('bucket', 'granularity', 'author', 'blog', 'metric', 'count')
+    list_filter = ('granularity', 'metric')
+    search_fields = ('author__username', 'blog__title')
+    readonly_fields = ('granularity', 'bucket', 'author', 'blog', 'metric', 'count')  # Written by rollup_engagement
+
+admin.site.register(EngagementRollup, EngagementRollupAdmin)
@@ -0,0 +1,75 @@
+# blog/analytics.py
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import REACTION_CHOICES, Blog, Comment, ReactionCount
+
+AUTHOR_ANALYTICS_CACHE_KEY = "author_analytics_{}"
+AUTHOR_ANALYTICS_CACHE_TIMEOUT = 600  # Also bounds how stale buffered read counts can be
+REACTION_TYPES = [reaction_type for reaction_type, _ in REACTION_CHOICES]
+
+
+def compute_author_analytics(author_id):
+    """
+    Aggregates every post of an author in one query: reads, comments and
+    per-type reactions per post, plus header totals across all posts.
+
+    Reaction totals come from the denormalized counter row joined one-to-one,
+    and comments from a correlated COUNT, so no join multiplies another's rows.
+    """
+    comment_counts = (
+        Comment.objects.filter(blog=OuterRef('pk'))
+                       .order_by()
+                       .values('blog')
+                       .annotate(count=Count('pk'))
+                       .values('count')
+    )
+    rows = (
+        Blog.objects.filter(author_id=author_id)
+                    .values('id', 'title', 'slug', 'created_at', 'read_count',
+                            *(f'reaction_counts__{reaction_type}' for reaction_type in REACTION_TYPES))
+                    .annotate(comments_count=Coalesce(Subquery(comment_counts), 0, output_field=IntegerField()))
+                    .order_by('-created_at', '-id')
+    )
+
+    posts = []
+    for row in rows:
+        reactions = {reaction_type: row.pop(f'reaction_counts__{reaction_type}') for reaction_type in REACTION_TYPES}
+        if reactions['like'] is None:
+            reactions = ReactionCount.rebuild(row['id']).as_dict()  # No counter row yet
+        comments_count = row.pop('comments_count')
+        total_reactions = sum(reactions.values())
+        posts.append({
+            'blog': row,
+            'reactions': reactions,
+            'comments_count': comments_count,
+            'total_reads': row['read_count'],
+            'total_reactions': total_reactions,
+            'chart_data': [row['read_count'], comments_count, total_reactions],  # Format for chart
+        })
+
+    return {
+        'posts': posts,
+        'total_blogs': len(posts),
+        'total_reads': sum(post['total_reads'] for post in posts),
+        'total_engagements': sum(post['comments_count'] + post['total_reactions'] for post in posts),
+    }
+
+
+def get_author_analytics(author_id):
+    """Returns the author's analytics from the cache, computing them on a miss."""
+    key = AUTHOR_ANALYTICS_CACHE_KEY.format(author_id)
+    analytics = cache.get(key)
+    if analytics is None:
+        analytics = compute_author_analytics(author_id)
+        cache.set(key, analytics, AUTHOR_ANALYTICS_CACHE_TIMEOUT)
+    return analytics
+
+
+def invalidate_author_analytics(*author_ids):
+    """Drops the cached analytics of the given authors with one delete_many once the current transaction commits."""
+    keys = [AUTHOR_ANALYTICS_CACHE_KEY.format(author_id) for author_id in set(author_ids)]
+    transaction.on_commit(lambda: cache.delete_many(keys))
@@ -5,4 +5,5 @@ class BlogConfig(AppConfig):
     name = 'blog'
 
     def ready(self):
+        import blog.checks  # noqa: F401
         import blog.signals  
@@ -0,0 +1,378 @@
+# blog/benchmark.py
+
+import gc
+import io
+import json
+import time
+from contextlib import redirect_stdout
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import caches
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import URLPattern, URLResolver, reverse
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from .models import Blog, Category, Comment, Follow, Notification, Reaction, ReactionCount, Tag, TimelineEntry
+from .related import refresh_related_posts
+from .search import get_search_backend
+
+User = get_user_model()
+
+# Rows seeded by default; small enough to build in seconds, large enough to expose N+1 queries
+DEFAULT_SEED = {
+    'users': 1000,
+    'posts': 3000,
+    'reactions': 10000,
+    'comments': 5000,
+    'follows': 5000,
+    'notifications': 10000,
+}
+# Posts, followers, followed authors and notifications owned by the benchmark user itself
+BENCH_USER_POSTS = 40
+BENCH_USER_FOLLOWING = 50
+BENCH_USER_NOTIFICATIONS = 200
+UNREACTED_POSTS = 100  # Covers the warm-up and up to 99 measured first reactions
+
+# Latency may grow by this fraction plus this many milliseconds before it counts as a regression
+DEFAULT_LATENCY_TOLERANCE = 0.5
+LATENCY_SLACK_MS = 5.0
+
+# URL modules whose named routes must all be benchmarked or explicitly skipped
+BENCHMARKED_URLCONFS = ('blog.urls', 'users.urls', 'myblog.urls')
+SKIPPED_URLS = {
+    'logout': 'ends the session the other requests run in',
+    'settings': 'stub view without a response',
+    'blog_interactions': 'stub view without a response',
+    'recent_activities': 'stub view without a response',
+}
+
+SESSION_TABLE = '"django_session"'
+
+REACTION_TYPES = ('like', 'love', 'haha', 'wow', 'applaud')
+NOTIFICATION_TYPES = ('reaction', 'comment', 'follow')
+TOPICS = ('python', 'django', 'design', 'remote', 'finance', 'health', 'marketing', 'career')
+
+
+def _cycle(seq, i):
+    return seq[i % len(seq)]
+
+
+def seed_dataset(**sizes):
+    """
+    Bulk-inserts a deterministic dataset and returns the objects the
+    benchmarked URLs need. Signals do not run for bulk inserts, so derived
+    rows (reaction counters, search index) are built afterwards in bulk.
+    """
+    from users.models import Profile
+
+    # The fragment cache outlives the throwaway database, whose blog ids an earlier run already used
+    caches[getattr(settings, 'BLOG_FRAGMENT_CACHE_ALIAS', 'default')].clear()
+    sizes = {**DEFAULT_SEED, **sizes}
+    password = make_password('benchmark')
+
+    bench_user = User.objects.create(
+        username='bench', email='bench@example.com', password=password, is_staff=True, first_name='Bench'
+    )
+    users = [bench_user] + User.objects.bulk_create([
+        User(username=f'reader{i}', email=f'reader{i}@example.com', password=password)
+        for i in range(sizes['users'] - 1)
+    ])
+    Profile.objects.bulk_create([Profile(user=user, email_verified=True) for user in users])
+
+    tags = Tag.objects.bulk_create([Tag(name=topic.title()) for topic in TOPICS])
+    categories = Category.objects.bulk_create([Category(name=f'{topic.title()} Corner') for topic in TOPICS])
+
+    now = timezone.now()
+    blogs = [
+        Blog(
+            title=f'{_cycle(TOPICS, i).title()} notes {i}',
+            slug=f'{_cycle(TOPICS, i)}-notes-{i}',
+            content=f'<p>{" ".join(TOPICS)} paragraph {i}.</p>' * 20,
+            author=bench_user if i < BENCH_USER_POSTS else _cycle(users, i * 7),
+            status=0 if i % 10 == 9 else 1,
+            published_at=None if i % 10 == 9 else now - timedelta(minutes=i),
+            featured=i % 25 == 0,
+            read_count=i % 500,
+        )
+        for i in range(sizes['posts'])
+    ]
+    for blog in blogs:
+        blog.refresh_content_metadata()  # bulk_create skips save()
+    blogs = Blog.objects.bulk_create(blogs)
+    Blog.tags.through.objects.bulk_create([
+        Blog.tags.through(blog_id=blog.pk, tag_id=_cycle(tags, i + k).pk) for i, blog in enumerate(blogs) for k in range(2)
+    ])
+    Blog.categories.through.objects.bulk_create([
+        Blog.categories.through(blog_id=blog.pk, category_id=_cycle(categories, i).pk) for i, blog in enumerate(blogs)
+    ])
+
+    # One reaction per (blog, user) pair, spread over the posts
+    reactions = []
+    for i in range(sizes['reactions']):
+        blog = _cycle(blogs, i)
+        user = users[(i // len(blogs) + 1 + blog.pk) % len(users)]
+        reactions.append(Reaction(blog=blog, user=user, reaction_type=_cycle(REACTION_TYPES, i)))
+    Reaction.objects.bulk_create(reactions, ignore_conflicts=True)
+    counts = {}
+    for row in Reaction.objects.values('blog_id', 'reaction_type').annotate(total=Count('id')):
+        counts.setdefault(row['blog_id'], {})[row['reaction_type']] = row['total']
+    ReactionCount.objects.bulk_create([ReactionCount(blog_id=blog.pk, **counts.get(blog.pk, {})) for blog in blogs])
+
+    comments = Comment.objects.bulk_create([
+        Comment(blog=_cycle(blogs, i * 3), author=_cycle(users, i * 11), content=f'Comment {i}')
+        for i in range(sizes['comments'])
+    ])
+
+    follows = {(user.pk, bench_user.pk) for user in users[1:sizes['follows'] // 10]}
+    for i in range(sizes['follows'] - len(follows)):
+        follower, followee = _cycle(users, i * 13 + 1), _cycle(users, i * 17 + 2)
+        if follower.pk != followee.pk:
+            follows.add((follower.pk, followee.pk))
+    followed = {user.pk for user in users[2:BENCH_USER_FOLLOWING + 2]}
+    follows.update((bench_user.pk, followee_id) for followee_id in followed)
+    Follow.objects.bulk_create([Follow(follower_id=a, followee_id=b) for a, b in follows], ignore_conflicts=True)
+    # The benchmark user's following timeline, as fan-out on publish would have written it
+    TimelineEntry.objects.bulk_create([
+        TimelineEntry(user=bench_user, blog=blog, author_id=blog.author_id, published_at=blog.published_at)
+        for blog in blogs if blog.author_id in followed and blog.status == 1
+    ])
+
+    Notification.objects.bulk_create([
+        Notification(
+            recipient=bench_user if i < BENCH_USER_NOTIFICATIONS else _cycle(users, i),
+            sender=_cycle(users, i * 5 + 1),
+            notification_type=_cycle(NOTIFICATION_TYPES, i),
+            blog=_cycle(blogs, i),
+            comment=_cycle(comments, i) if i % 3 == 1 else None,
+            is_read=i % 4 == 0,
+            created_at=now - timedelta(minutes=i),
+        )
+        for i in range(sizes['notifications'])
+    ])
+
+    get_search_backend().rebuild()
+
+    # Related posts of everything the benchmarked pages recommend from
+    seeded = {blog.pk for blog in blogs[:BENCH_USER_POSTS]}
+    seeded.update(Reaction.objects.filter(user=bench_user).values_list('blog_id', flat=True))
+    for blog_id in seeded:
+        refresh_related_posts(blog_id)
+
+    return {
+        'user': bench_user,
+        'blog': blogs[0],
+        'other_author': users[1],
+        'replayed_slugs': [blog.slug for blog in blogs[BENCH_USER_POSTS:BENCH_USER_POSTS + 10]],
+        # Published posts the benchmark user has not reacted to, one per first-reaction request
+        'unreacted_slugs': [
+            blog.slug for blog in blogs[BENCH_USER_POSTS + 10:]
+            if blog.status == 1 and blog.pk not in seeded
+        ][:UNREACTED_POSTS],
+        'notification': Notification.objects.filter(recipient=bench_user).first(),
+    }
+
+
+def benchmark_requests(seed):
+    """
+    (label, url name, method, reverse kwargs, query string / POST data) of every
+    benchmarked request. Requests that change state run last.
+    """
+    user, blog = seed['user'], seed['blog']
+    from users.utils import generate_verification_token
+
+    return [
+        ('home', 'home', 'get', {}, {}),
+        ('verify_email', 'verify_email', 'get', {}, {}),
+        ('blogs', 'blogs', 'get', {}, {}),
+        ('following', 'following', 'get', {}, {}),
+        ('blog_detail', 'blog_detail', 'get', {'slug': blog.slug}, {}),
+        ('search', 'search', 'get', {}, {'q': 'python notes'}),
+        ('create_blog', 'create_blog', 'get', {}, {}),
+        ('update_blog', 'update_blog', 'get', {'slug': blog.slug}, {}),
+        ('delete_blog', 'delete_blog', 'get', {'slug': blog.slug}, {}),  # Confirmation page only
+        ('notification_list', 'notification_list', 'get', {}, {}),
+        ('read_count_stats', 'read_count_stats', 'get', {}, {}),
+        ('fragment_cache_stats', 'fragment_cache_stats', 'get', {}, {}),
+        ('notification_stats', 'notification_stats', 'get', {}, {}),
+        ('register', 'register', 'get', {}, {}),
+        ('email_sent', 'email_sent', 'get', {'email': user.email}, {}),
+        ('email_verification', 'email_verification', 'get', {'token': generate_verification_token(user.email)}, {}),
+        ('login', 'login', 'get', {}, {}),
+        ('verify_otp', 'verify_otp', 'get', {}, {}),
+        ('password_reset', 'password_reset', 'get', {}, {}),
+        ('password_reset_confirm', 'password_reset_confirm', 'get', {
+            'uidb64': urlsafe_base64_encode(force_bytes(user.pk)),
+            'token': default_token_generator.make_token(user),
+        }, {}),
+        ('profile', 'profile', 'get', {}, {}),
+        ('author_profile', 'profile', 'get', {'username': user.username}, {}),
+        ('edit_profile', 'edit_profile', 'get', {}, {}),
+        ('email_verification_request', 'email_verification_request', 'get', {}, {}),
+        ('analytics_page', 'analytics_page', 'get', {}, {}),
+        ('analytics_series', 'analytics_series', 'get', {}, {}),
+        ('notifications', 'notifications', 'get', {}, {}),
+        ('my_blogs', 'my_blogs', 'get', {}, {}),
+        ('change_email', 'change_email', 'get', {}, {}),
+        ('fetch_notifications', 'fetch_notifications', 'get', {}, {}),
+        ('notification_stream', 'notification_stream', 'get', {}, {}),  # 204 under WSGI
+        # State-changing requests
+        ('resend_verification_email', 'resend_verification_email', 'get', {'email': user.email}, {}),
+        ('resend_otp', 'resend_otp', 'post', {}, {}),
+        # Alternating reactions: every measured request changes the reaction rather than repeating it
+        ('save_reaction', 'save_reaction', 'post', {'slug': blog.slug}, Rotate([{'reaction': 'like'}, {'reaction': 'love'}])),
+        ('save_reaction_first', 'save_reactions_batch', 'post', {}, Rotate([
+            {'reactions': [{'blog': slug, 'reaction': 'like'}]} for slug in seed['unreacted_slugs']
+        ])),
+        ('save_reactions_batch', 'save_reactions_batch', 'post', {}, {
+            'reactions': [{'blog': slug, 'reaction': 'wow'} for slug in seed['replayed_slugs']],
+        }),
+        ('mark_blog_as_read', 'mark_blog_as_read', 'post', {'slug': blog.slug}, {}),
+        ('toggle_follow', 'toggle_follow', 'post', {'user_id': seed['other_author'].pk}, {}),
+        ('mark_as_read', 'mark_as_read', 'get', {'notification_id': seed['notification'].pk}, {}),
+        ('mark_notifications_as_read', 'mark_notifications_as_read', 'post', {}, {}),
+    ]
+
+
+def _named_patterns(patterns):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from _named_patterns(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            yield pattern.name
+
+
+def unbenchmarked_url_names(seed):
+    """Named routes of BENCHMARKED_URLCONFS that are neither benchmarked nor skipped."""
+    names = set()
+    for urlconf in BENCHMARKED_URLCONFS:
+        module = __import__(urlconf, fromlist=['urlpatterns'])
+        # Only the project's own routes; included third-party apps (admin, allauth) are out of scope
+        names.update(_named_patterns(
+            p for p in module.urlpatterns
+            if not isinstance(p, URLResolver) or p.urlconf_name in BENCHMARKED_URLCONFS
+        ))
+    covered = {name for _, name, *_ in benchmark_requests(seed)}
+    return names - covered - set(SKIPPED_URLS)
+
+
+def _percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+class Rotate(list):
+    """Request payloads sent in turn, one per request, for writes that must not repeat themselves."""
+
+
+def _request_kwargs(method, data, i):
+    if isinstance(data, Rotate):
+        data = data[i % len(data)]
+    return {'data': json.dumps(data), 'content_type': 'application/json'} if method == 'post' else {'data': data}
+
+
+def measure(client, method, url, data, repeat):
+    """Requests a URL `repeat` times after one warm-up request and summarizes the runs."""
+    send = getattr(client, method)
+    timings, queries = [], 0
+    with redirect_stdout(io.StringIO()):  # Views print debug output
+        send(url, **_request_kwargs(method, data, 0))
+        gc.collect()
+        gc.disable()  # Like timeit: keep collector pauses out of the timings
+        try:
+            for i in range(1, repeat + 1):
+                kwargs = _request_kwargs(method, data, i)
+                with CaptureQueriesContext(connection) as captured:
+                    start = time.perf_counter()
+                    response = send(url, **kwargs)
+                    timings.append((time.perf_counter() - start) * 1000)
+                queries = max(queries, len(captured))
+        finally:
+            gc.enable()
+    content = b'' if response.streaming else response.content
+    return {
+        'status': response.status_code,
+        'queries': queries,
+        'p50_ms': round(_percentile(timings, 0.5), 2),
+        'p95_ms': round(_percentile(timings, 0.95), 2),
+        'bytes': len(content),
+    }
+
+
+def run_benchmark(seed, repeat=20):
+    """Drives every benchmarked URL as the seeded user and returns {label: measurements}."""
+    client = Client(raise_request_exception=False)
+    client.force_login(seed['user'])
+    session = client.session
+    session['temp_user_id'] = seed['user'].pk  # Lets verify_otp/resend_otp reach their OTP code path
+    session.save()
+
+    results = {}
+    for label, name, method, url_kwargs, data in benchmark_requests(seed):
+        results[label] = measure(client, method, reverse(name, kwargs=url_kwargs), data, repeat)
+    return results
+
+
+def _session_queries(client, method, url, data, repeat):
+    """Most session-table and total queries of `repeat` requests, after one warm-up request."""
+    send = getattr(client, method)
+    session_queries = queries = 0
+    with redirect_stdout(io.StringIO()):
+        send(url, **_request_kwargs(method, data, 0))
+        for i in range(1, repeat + 1):
+            with CaptureQueriesContext(connection) as captured:
+                send(url, **_request_kwargs(method, data, i))
+            session_queries = max(
+                session_queries, sum(1 for query in captured if SESSION_TABLE in query['sql'])
+            )
+            queries = max(queries, len(captured))
+    return {'session_queries': session_queries, 'queries': queries}
+
+
+def run_session_benchmark(seed, engines, repeat=5):
+    """
+    Drives the blog.urls requests of the benchmark under each session engine
+    ({name: dotted path}) and returns {label: {name: {'session_queries', 'queries'}}}.
+    """
+    blog_routes = set(_named_patterns(__import__('blog.urls', fromlist=['urlpatterns']).urlpatterns))
+    results = {}
+    for engine_name, engine in engines.items():
+        # The session middleware reads the engine when a client's handler loads, so each engine gets a fresh client
+        with override_settings(SESSION_ENGINE=engine):
+            client = Client(raise_request_exception=False)
+            client.force_login(seed['user'])
+            for label, name, method, url_kwargs, data in benchmark_requests(seed):
+                if name in blog_routes:
+                    results.setdefault(label, {})[engine_name] = _session_queries(
+                        client, method, reverse(name, kwargs=url_kwargs), data, repeat
+                    )
+    return results
+
+
+def find_regressions(results, baseline, latency_tolerance=DEFAULT_LATENCY_TOLERANCE):
+    """
+    Compares results with a stored baseline. Any extra query is a regression;
+    p95 latency may drift by the tolerance before it is.
+    """
+    regressions = []
+    for label, expected in baseline.items():
+        actual = results.get(label)
+        if actual is None:
+            regressions.append(f'{label}: no longer benchmarked')
+            continue
+        if actual['status'] != expected['status']:
+            regressions.append(f"{label}: status {expected['status']} -> {actual['status']}")
+        if actual['queries'] > expected['queries']:
+            regressions.append(f"{label}: {expected['queries']} -> {actual['queries']} queries")
+        allowed = expected['p95_ms'] * (1 + latency_tolerance) + LATENCY_SLACK_MS
+        if actual['p95_ms'] > allowed:
+            regressions.append(f"{label}: p95 {expected['p95_ms']}ms -> {actual['p95_ms']}ms")
+    return regressions
@@ -0,0 +1,17 @@
+# blog/checks.py
+
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+
+@register(Tags.caches, deploy=True)
+def check_read_dedup_store(app_configs, **kwargs):
+    """Deployments must share the read dedup filters between workers (see blog/read_dedup.py)."""
+    if getattr(settings, 'READ_DEDUP_REDIS_URL', None):
+        return []
+    return [Error(
+        'READ_DEDUP_REDIS_URL is not set.',
+        hint='Read deduplication needs a Redis server shared by every worker; without it each worker '
+             'keeps its own filters and counts a read once per worker.',
+        id='blog.E001',
+    )]
@@ -1,20 +1,62 @@
 # blog/context_processors.py
 
+from django.db import connection
+
 from .models import Notification
+from .util import get_unread_notifications_count, unread_count_stats
+
+# Maximum number of notifications exposed to templates through the context
+NOTIFICATION_CONTEXT_LIMIT = 20
+
 
 def notifications(request):
     """
     Context processor to pass notifications to the template globally.
+
+    Nothing is queried up front: the notifications are a bounded lazy queryset,
+    and the unread count is a callable that templates only invoke when they use it.
     """
     if request.user.is_authenticated:
-        # Fetch notifications for the logged-in user
-        notifications = Notification.objects.filter(recipient=request.user).order_by('-created_at')
+        user_id = request.user.pk
+        unread_count_stats['requests'] += 1
+        resolved = []
 
-        # Fetch unread notifications count
-        unread_notifications_count = notifications.filter(is_read=False).count()
+        def unread_notifications_count():
+            # Templates may touch the count several times; look it up once per request
+            if not resolved:
+                with connection.execute_wrapper(_count_lookup_query):
+                    resolved.append(get_unread_notifications_count(user_id))
+            return resolved[0]
 
         return {
-            'notifications': notifications,
+            'notifications': Notification.objects.filter(recipient_id=user_id)
+                                                 .select_related('sender', 'blog')
+                                                 .order_by('-created_at')[:NOTIFICATION_CONTEXT_LIMIT],
             'unread_notifications_count': unread_notifications_count,
         }
     return {}
+
+
+def _count_lookup_query(execute, sql, params, many, context):
+    # Every statement a lookup sends, including the cache's own when it is the DatabaseCache
+    unread_count_stats['db_queries'] += 1
+    return execute(sql, params, many, context)
+
+
+def notification_context_stats():
+    """
+    Summarizes how many queries the lazy, cached processor avoided. The
+    previous processor ran one COUNT on every authenticated render; db_queries
+    counts every statement the lookups sent instead, so hits on a
+    database-backed cache are not reported as saved.
+    """
+    requests = unread_count_stats['requests']
+    db_queries = unread_count_stats['db_queries']
+    return {
+        'requests': requests,
+        'cache_hits': unread_count_stats['cache_hits'],
+        'count_queries': unread_count_stats['count_queries'],
+        'db_queries': db_queries,
+        'queries_saved': requests - db_queries,
+        'queries_saved_per_request': round((requests - db_queries) / requests, 3) if requests else 0.0,
+    }
@@ -0,0 +1,168 @@
+# blog/engagement.py
+
+from collections import Counter
+from datetime import timedelta, timezone as dt_timezone
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ENGAGEMENT_METRICS, Blog, EngagementEvent, EngagementRollup
+
+ROLLUP_BATCH_SIZE = 1000
+ROLLUP_GRANULARITIES = ('hour', 'day')
+SERIES_MAX_POINTS = 1000  # Bounds the response: 41 days hourly, ~2.7 years daily
+SERIES_HOURLY_MAX_RANGE = timedelta(days=2)  # Longer ranges default to daily buckets
+
+
+def log_engagement(metric, author_id, blog_id=None, count=1):
+    """Appends one event to the raw engagement log."""
+    return EngagementEvent.objects.create(metric=metric, author_id=author_id, blog_id=blog_id, count=count)
+
+
+def log_engagement_batch(events):
+    """Appends (metric, author_id, blog_id) events to the raw engagement log in one insert."""
+    EngagementEvent.objects.bulk_create([
+        EngagementEvent(metric=metric, author_id=author_id, blog_id=blog_id) for metric, author_id, blog_id in events
+    ])
+
+
+def log_reads(read_counts):
+    """
+    Logs the reads of one read-buffer flush ({blog_id: count}) as one event
+    per blog, resolving the authors in a single query.
+    """
+    authors = dict(Blog.objects.filter(pk__in=read_counts.keys()).order_by().values_list('id', 'author_id'))
+    created_at = timezone.now()
+    EngagementEvent.objects.bulk_create([
+        EngagementEvent(metric='read', author_id=authors[blog_id], blog_id=blog_id, count=count, created_at=created_at)
+        for blog_id, count in read_counts.items()
+        if blog_id in authors  # Deleted since the read was buffered
+    ])
+
+
+def bucket_start(moment, granularity):
+    """Start of the hour or day containing `moment`, in the current time zone."""
+    moment = timezone.localtime(moment)
+    if granularity == 'hour':
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _bucket_step(granularity):
+    return timedelta(hours=1) if granularity == 'hour' else timedelta(days=1)
+
+
+def _merge_rollups(totals):
+    """
+    Adds {(granularity, bucket, author_id, blog_id, metric): count} onto the
+    rollup rows, creating the missing ones. Runs inside the caller's transaction.
+    """
+    keys = list(totals)
+    candidates = EngagementRollup.objects.select_for_update().filter(
+        granularity__in={key[0] for key in keys},
+        bucket__in={key[1] for key in keys},
+        author_id__in={key[2] for key in keys},
+    )
+    existing = {
+        (row.granularity, row.bucket, row.author_id, row.blog_id, row.metric): row for row in candidates
+    }
+
+    updated, created = [], []
+    for key, count in totals.items():
+        row = existing.get(key)
+        if row is not None:
+            row.count += count
+            updated.append(row)
+        else:
+            granularity, bucket, author_id, blog_id, metric = key
+            created.append(EngagementRollup(
+                granularity=granularity, bucket=bucket, author_id=author_id, blog_id=blog_id, metric=metric, count=count
+            ))
+    EngagementRollup.objects.bulk_update(updated, ['count'], batch_size=500)
+    EngagementRollup.objects.bulk_create(created, batch_size=500)
+
+
+def rollup_engagement(batch_size=ROLLUP_BATCH_SIZE):
+    """
+    Folds the oldest `batch_size` raw events into the hourly and daily
+    rollups and deletes them, in one transaction. Returns how many events
+    were compacted; zero means the log is drained.
+
+    Meant for a single rollup_engagement worker: two workers creating the
+    same new bucket collide on its unique constraint, and the loser's batch
+    rolls back untouched for the next run.
+    """
+    with transaction.atomic():
+        events = list(
+            EngagementEvent.objects.select_for_update(skip_locked=True)
+                                   .order_by('id')
+                                   .values_list('id', 'author_id', 'blog_id', 'metric', 'count', 'created_at')
+                                   [:batch_size]
+        )
+        if not events:
+            return 0
+
+        totals = Counter()
+        for _, author_id, blog_id, metric, count, created_at in events:
+            for granularity in ROLLUP_GRANULARITIES:
+                bucket = bucket_start(created_at, granularity)
+                totals[(granularity, bucket, author_id, None, metric)] += count
+                if blog_id is not None:
+                    totals[(granularity, bucket, author_id, blog_id, metric)] += count
+
+        _merge_rollups(totals)
+        EngagementEvent.objects.filter(pk__in=[event[0] for event in events]).delete()
+    return len(events)
+
+
+def engagement_series(author_id, start, end, granularity=None, blog_id=None, metrics=ENGAGEMENT_METRICS):
+    """
+    Chart-ready series of an author's engagement (or one of their posts')
+    between two datetimes, read from the rollup tables only.
+
+    Returns {'granularity', 'categories', 'series'} with one zero-filled data
+    point per bucket, the shape ApexCharts takes for its xaxis and series.
+    Events not rolled up yet are not included. Raises ValueError for an
+    empty or too long range.
+    """
+    if end <= start:
+        raise ValueError("The range must end after it starts.")
+    if granularity is None:
+        granularity = 'hour' if end - start <= SERIES_HOURLY_MAX_RANGE else 'day'
+    if granularity not in ROLLUP_GRANULARITIES:
+        raise ValueError(f"Unknown granularity: {granularity}")
+
+    step = _bucket_step(granularity)
+    buckets = []
+    bucket = bucket_start(start, granularity)
+    while bucket < end:
+        buckets.append(bucket)
+        if len(buckets) > SERIES_MAX_POINTS:
+            raise ValueError(f"The range spans more than {SERIES_MAX_POINTS} {granularity} buckets.")
+        # Hours step in UTC and days on the wall clock, so DST changes neither skip nor shift buckets
+        if granularity == 'hour':
+            bucket = timezone.localtime(bucket.astimezone(dt_timezone.utc) + step)
+        else:
+            bucket = bucket_start(bucket + step, granularity)
+
+    rows = EngagementRollup.objects.filter(
+        granularity=granularity,
+        author_id=author_id,
+        bucket__gte=buckets[0],
+        bucket__lt=end,
+        metric__in=metrics,
+    )
+    rows = rows.filter(blog_id=blog_id) if blog_id is not None else rows.filter(blog__isnull=True)
+
+    position = {bucket: index for index, bucket in enumerate(buckets)}
+    data = {metric: [0] * len(buckets) for metric in metrics}
+    for bucket, metric, count in rows.values_list('bucket', 'metric', 'count'):
+        index = position.get(bucket)
+        if index is not None:
+            data[metric][index] = count
+
+    return {
+        'granularity': granularity,
+        'categories': [bucket.isoformat() for bucket in buckets],
+        'series': [{'name': metric, 'data': data[metric]} for metric in metrics],
+    }
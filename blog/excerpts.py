@@ -0,0 +1,41 @@
+# blog/excerpts.py
+
+import math
+import re
+from html import unescape
+
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
+
+EXCERPT_WORDS = 30  # Cards show 20-30 words; templates truncate the stored excerpt further if needed
+EXCERPT_MAX_LENGTH = 300
+WORDS_PER_MINUTE = 200
+
+_INVISIBLE = re.compile(r'<(script|style)\b.*?</\1\s*>', re.IGNORECASE | re.DOTALL)
+# Block-level tags separate words even when the editor writes no whitespace between them
+_BLOCK_TAG = re.compile(
+    r'</?(?:p|div|br|hr|li|ul|ol|h[1-6]|blockquote|pre|table|tr|td|th|section|article|figure|figcaption)\b[^>]*>',
+    re.IGNORECASE,
+)
+_WHITESPACE = re.compile(r'\s+')
+
+
+def plain_text(content):
+    """The visible text of an HTML body, entities decoded and whitespace collapsed."""
+    text = _BLOCK_TAG.sub(' ', _INVISIBLE.sub(' ', content or ''))
+    return _WHITESPACE.sub(' ', unescape(strip_tags(text))).strip()
+
+
+def content_metadata(content):
+    """
+    Sanitized excerpt, word count and estimated reading time (in whole
+    minutes, at least one) of a blog body, as stored on the Blog row.
+    """
+    text = plain_text(content)
+    word_count = len(text.split())
+    excerpt = Truncator(Truncator(text).words(EXCERPT_WORDS)).chars(EXCERPT_MAX_LENGTH)
+    return {
+        'excerpt': excerpt,
+        'word_count': word_count,
+        'reading_time': max(1, math.ceil(word_count / WORDS_PER_MINUTE)),
+    }
@@ -0,0 +1,135 @@
+# blog/fragment_cache.py
+
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+# Shared parts of blog_detail, each versioned by the model whose changes invalidate it
+FRAGMENT_GROUPS = ('article', 'comments', 'reactions', 'related')
+FRAGMENT_VERSION_CACHE_KEY = "blog_fragment_version_{}_{}"
+FRAGMENT_CACHE_KEY = "blog_fragment_{}_{}_{}_{}"
+
+# Hit/miss counters of this worker, exported by blog.views.fragment_cache_stats
+fragment_stats = Counter()
+
+
+def _fragment_cache():
+    return caches[getattr(settings, 'BLOG_FRAGMENT_CACHE_ALIAS', 'default')]
+
+
+def _fragment_timeout():
+    return getattr(settings, 'BLOG_FRAGMENT_CACHE_TIMEOUT', 3600)
+
+
+def _new_version():
+    return uuid.uuid4().hex[:12]
+
+
+def bump_blog_fragment_version(blog_id, *groups):
+    """
+    Invalidates the given fragment groups of a blog (all of them by default)
+    once the current transaction commits.
+    """
+    bump_blog_fragment_versions([blog_id], *groups)
+
+
+def bump_blog_fragment_versions(blog_ids, *groups):
+    """
+    Invalidates fragment groups of several blogs with one delete_many once
+    the current transaction commits.
+
+    The version keys are dropped rather than rewritten: the next render starts
+    a fresh random version, so fragments under the old one are never read
+    again, and invalidating costs one DELETE even on the database cache.
+    """
+    groups = groups or FRAGMENT_GROUPS
+    keys = [FRAGMENT_VERSION_CACHE_KEY.format(blog_id, group) for blog_id in set(blog_ids) for group in groups]
+
+    def bump():
+        _fragment_cache().delete_many(keys)
+        fragment_stats['invalidations'] += len(keys)
+
+    transaction.on_commit(bump)
+
+
+class BlogFragmentCache:
+    """
+    Rendered fragments of one blog's detail page.
+
+    Versions and fragments are each fetched with a single get_many on first
+    use, so a fully cached page costs two cache round trips; whatever the
+    render had to start or render is written back by save() with one
+    set_many.
+    """
+
+    def __init__(self, blog_id):
+        self.blog_id = blog_id
+        self._versions = None
+        self._fragments = None
+        self._parts = set()
+        self._pending = {}  # Versions started and fragments rendered, written together by save()
+
+    @property
+    def loaded(self):
+        return self._versions is not None
+
+    def register(self, group, part):
+        """Declares a fragment before rendering, so it is fetched with the others."""
+        self._parts.add((group, part))
+
+    def _load(self):
+        cache = _fragment_cache()
+        keys = {group: FRAGMENT_VERSION_CACHE_KEY.format(self.blog_id, group) for group in FRAGMENT_GROUPS}
+        found = cache.get_many(keys.values())
+        self._versions = {}
+        for group, key in keys.items():
+            version = found.get(key)
+            if version is None:
+                # Nothing rendered under a missing version can be trusted; start a fresh one. A
+                # concurrent render starting its own only orphans the fragments of the one it replaces
+                version = self._pending[key] = _new_version()
+            self._versions[group] = version
+
+        fragment_keys = {self.key(group, part): (group, part) for group, part in self._parts}
+        self._fragments = {
+            fragment_keys[key]: html for key, html in cache.get_many(fragment_keys.keys()).items()
+        }
+
+    def key(self, group, part):
+        return FRAGMENT_CACHE_KEY.format(self.blog_id, group, self._versions[group], part)
+
+    def get(self, group, part):
+        if not self.loaded:
+            self._load()
+        html = self._fragments.get((group, part))
+        fragment_stats['hits' if html is not None else 'misses'] += 1
+        return html
+
+    def set(self, group, part, html):
+        if not self.loaded:
+            self._load()
+        self._fragments[(group, part)] = html
+        self._pending[self.key(group, part)] = html
+
+    def save(self):
+        """Writes the versions and fragments of this render with one set_many."""
+        if self._pending:
+            # Versions expire with their fragments; an expired one just starts afresh
+            _fragment_cache().set_many(self._pending, _fragment_timeout())
+            self._pending = {}
+
+
+def blog_fragment_stats():
+    """Summarizes the fragment cache counters of this worker."""
+    hits = fragment_stats['hits']
+    misses = fragment_stats['misses']
+    lookups = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'invalidations': fragment_stats['invalidations'],
+        'hit_rate': round(hits / lookups, 3) if lookups else 0.0,
+    }
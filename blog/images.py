@@ -0,0 +1,210 @@
+# blog/images.py
+
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+# Pillow is imported by the functions that decode or encode, not here: the signals import this
+# module at startup, and every worker would pay for Pillow before serving anything
+
+# Widths generated per image field; cards render blog images at 300-550 px, avatars at 100 px
+BLOG_IMAGE_WIDTHS = (320, 640, 1024)
+PROFILE_PICTURE_WIDTHS = (96, 192)
+VARIANT_FORMATS = (
+    ('webp', 'WEBP', {'quality': 80, 'method': 4}),
+    ('jpg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+)
+ORIGINAL_JPEG_QUALITY = 90  # Re-encoding an original to drop its metadata
+
+_executor = None
+_job_executor = None
+
+
+def _image_executor():
+    # Pillow releases the GIL while resampling and encoding, so variants encode in parallel
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'IMAGE_PIPELINE_WORKERS', 4), thread_name_prefix='image-variants'
+        )
+    return _executor
+
+
+def _pipeline_executor():
+    # Whole uploads are processed here, off the request thread; a separate pool from the encoders
+    # above, so a job waiting on its encodes can never hold the threads they need
+    global _job_executor
+    if _job_executor is None:
+        _job_executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'IMAGE_PIPELINE_JOBS', 1), thread_name_prefix='image-pipeline'
+        )
+    return _job_executor
+
+
+def variant_name(name, width, extension):
+    """Storage name of one variant, next to the original: blog_images/cat.png -> blog_images/cat__w320.webp"""
+    root, _ = os.path.splitext(name)
+    return f"{root}__w{width}.{extension}"
+
+
+def _flatten(image):
+    """RGB copy for formats without alpha, composited on white."""
+    from PIL import Image
+
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        rgba = image.convert('RGBA')
+        background = Image.new('RGB', rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def _encode_variant(image, width, pil_format, options):
+    from PIL import Image
+
+    variant = image.copy()
+    variant.thumbnail((width, width * 10), Image.LANCZOS)
+    if pil_format == 'JPEG':
+        variant = _flatten(variant)
+    buffer = BytesIO()
+    variant.save(buffer, pil_format, **options)  # No exif= argument, so no metadata is carried over
+    return buffer.getvalue()
+
+
+def _overwrite(storage, name, data):
+    # Written in place: storage.save() would pick a free name instead of replacing this fixed one
+    with storage.open(name, 'wb') as target:
+        target.write(data)
+
+
+def _strip_original(image, pil_format):
+    """The upright original re-encoded without EXIF and other metadata."""
+    buffer = BytesIO()
+    if pil_format == 'JPEG':
+        _flatten(image).save(buffer, 'JPEG', quality=ORIGINAL_JPEG_QUALITY, optimize=True)
+    else:
+        image.save(buffer, pil_format)
+    return buffer.getvalue()
+
+
+def process_image(field_file, widths):
+    """
+    Runs the upload pipeline on a stored image: applies and strips its EXIF
+    orientation and metadata, and writes a WebP and a JPEG variant for every
+    width narrower than the image, encoded concurrently.
+
+    Returns {'width', 'height', 'variants'} for the model's bookkeeping
+    fields, or None if the file is missing, not an image, or cannot be
+    re-encoded; the stored original is left untouched in that case. Animated
+    images keep their original and get no variants.
+    """
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    storage, name = field_file.storage, field_file.name
+    try:
+        with storage.open(name, 'rb') as source:
+            image = Image.open(source)
+            image.load()
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError) as e:
+        logger.warning(f"Skipping image {name}: {e}")
+        return None
+
+    pil_format = image.format or 'PNG'
+    if pil_format == 'MPO':
+        pil_format = 'JPEG'  # Multi-picture JPEGs from phone cameras; the first picture is the photo
+    if getattr(image, 'n_frames', 1) > 1:
+        return {'width': image.width, 'height': image.height, 'variants': []}
+
+    executor = _image_executor()
+    try:
+        image = ImageOps.exif_transpose(image)  # Rotate first; the orientation tag goes with the rest
+        variant_widths = sorted(width for width in set(widths) if width < image.width)
+        stripped = executor.submit(_strip_original, image, pil_format)
+        jobs = {
+            (width, extension): executor.submit(_encode_variant, image, width, pil_format_name, options)
+            for width in variant_widths
+            for extension, pil_format_name, options in VARIANT_FORMATS
+        }
+        # Every encode finishes before anything in storage is touched: a format Pillow reads but
+        # cannot write (KeyError from the encoder registry) must not cost the user their original
+        original = stripped.result()
+        encoded = {key: job.result() for key, job in jobs.items()}
+    except (OSError, KeyError, ValueError, Image.DecompressionBombError) as e:
+        logger.warning(f"Skipping image {name}: {e}")
+        return None
+
+    # Storage writes stay on this thread, replacing the files under their deterministic names
+    _overwrite(storage, name, original)
+    for (width, extension), data in encoded.items():
+        _overwrite(storage, variant_name(name, width, extension), data)
+
+    return {'width': image.width, 'height': image.height, 'variants': variant_widths}
+
+
+def image_name(value):
+    """Storage name of an image field value (a FieldFile, an upload or a raw name), or None."""
+    return getattr(value, 'name', value) or None
+
+
+def process_model_image(model, pk, field_name, widths):
+    """
+    Processes the image in one row's field and records its dimensions and
+    variants in the <field>_width, <field>_height and <field>_variants
+    columns with a single UPDATE. Returns the recorded metadata or None.
+    """
+    instance = model.objects.filter(pk=pk).only('pk', field_name).first()
+    field_file = getattr(instance, field_name, None) if instance else None
+    if not field_file:
+        return None
+
+    meta = process_image(field_file, widths)
+    if meta is None:
+        return None
+    model.objects.filter(pk=pk).update(**{
+        f'{field_name}_width': meta['width'],
+        f'{field_name}_height': meta['height'],
+        f'{field_name}_variants': meta['variants'],
+    })
+    return meta
+
+
+def _process_in_background(model, pk, field_name, widths, on_processed):
+    try:
+        if process_model_image(model, pk, field_name, widths) and on_processed:
+            on_processed()
+    except Exception:
+        logger.exception(f"Image pipeline failed for {model.__name__} {pk}")
+    finally:
+        close_old_connections()  # This thread's connection outlives the job otherwise
+
+
+def queue_model_image(model, pk, field_name, widths, on_processed=None):
+    """
+    Hands process_model_image for one row to the pipeline's background
+    thread and returns without waiting; on_processed() runs there once the
+    metadata is recorded. Inline instead when IMAGE_PIPELINE_BACKGROUND is
+    off. A job lost with its worker process leaves the width unset, so the
+    process_images command picks the image up again.
+    """
+    if not getattr(settings, 'IMAGE_PIPELINE_BACKGROUND', True):
+        if process_model_image(model, pk, field_name, widths) and on_processed:
+            on_processed()
+        return
+    _pipeline_executor().submit(_process_in_background, model, pk, field_name, widths, on_processed)
+
+
+def image_srcset(field_file, extension):
+    """srcset value over the recorded variants of an image field, or '' if it has none."""
+    instance, field_name = field_file.instance, field_file.field.name
+    widths = getattr(instance, f'{field_name}_variants', None) or []
+    urls = [(field_file.storage.url(variant_name(field_file.name, width, extension)), width) for width in widths]
+    original_width = getattr(instance, f'{field_name}_width', None)
+    if urls and original_width and extension == 'jpg':
+        urls.append((field_file.url, original_width))
+    return ', '.join(f"{url} {width}w" for url, width in urls)
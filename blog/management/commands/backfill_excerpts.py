@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from blog.models import Blog
+
+METADATA_FIELDS = ['excerpt', 'word_count', 'reading_time']
+
+
+class Command(BaseCommand):
+    help = 'Recompute the stored excerpt, word count and reading time of every blog post'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Posts loaded and updated per batch')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        updated = 0
+        last_pk = 0
+        while True:
+            # Keyset batches, so only one batch of bodies is ever in memory
+            batch = list(Blog.objects.filter(pk__gt=last_pk).order_by('pk').only('id', 'content')[:batch_size])
+            if not batch:
+                break
+            for blog in batch:
+                blog.refresh_content_metadata()
+            Blog.objects.bulk_update(batch, METADATA_FIELDS)
+            updated += len(batch)
+            last_pk = batch[-1].pk
+        self.stdout.write(self.style.SUCCESS(f'Updated the excerpts of {updated} posts'))
@@ -0,0 +1,53 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from blog.benchmark import DEFAULT_SEED, run_session_benchmark, seed_dataset
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway test database and report, per blog page, the session-table and total '
+        'queries of one request under each configured session engine'
+    )
+
+    def add_arguments(self, parser):
+        for name, default in DEFAULT_SEED.items():
+            parser.add_argument(f'--{name}', type=int, default=default, help=f'Seeded {name} (default {default})')
+        parser.add_argument('--repeat', type=int, default=5, help='Measured requests per URL and engine')
+        parser.add_argument(
+            '--engine', action='append', choices=list(settings.SESSION_ENGINES),
+            help='Only benchmark this engine (repeatable); all of SESSION_ENGINES by default',
+        )
+        parser.add_argument('--output', help='Also write the results to this JSON file')
+
+    def handle(self, *args, **options):
+        names = options['engine'] or list(settings.SESSION_ENGINES)
+        engines = {name: settings.SESSION_ENGINES[name] for name in names}
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.stdout.write('Seeding benchmark dataset...')
+            seed = seed_dataset(**{name: options[name] for name in DEFAULT_SEED})
+            results = run_session_benchmark(seed, engines, repeat=options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+        if not results:
+            raise CommandError('No blog.urls requests were benchmarked')
+
+        # Each cell: session-table queries / all queries of one request
+        self.stdout.write(f"{'view':<28}" + ''.join(f"{name:>12}{'':6}" for name in names))
+        for label, row in results.items():
+            cells = ''.join(f"{row[name]['session_queries']:>9} / {row[name]['queries']:<6}" for name in names)
+            self.stdout.write(f'{label:<28}{cells}')
+        totals = {name: sum(row[name]['session_queries'] for row in results.values()) for name in names}
+        self.stdout.write(f"{'session queries, all pages':<28}" + ''.join(f"{totals[name]:>9}{'':9}" for name in names))
+
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(results, indent=2) + '\n')
@@ -0,0 +1,68 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from blog.benchmark import (
+    DEFAULT_LATENCY_TOLERANCE, DEFAULT_SEED, find_regressions, run_benchmark, seed_dataset, unbenchmarked_url_names,
+)
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / 'benchmarks' / 'views_baseline.json'
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway test database, request every view and report query counts, '
+        'p50/p95 latency and response size; fails when a view regresses past the baseline'
+    )
+
+    def add_arguments(self, parser):
+        for name, default in DEFAULT_SEED.items():
+            parser.add_argument(f'--{name}', type=int, default=default, help=f'Seeded {name} (default {default})')
+        parser.add_argument('--repeat', type=int, default=20, help='Measured requests per URL')
+        parser.add_argument('--baseline', default=str(DEFAULT_BASELINE), help='Baseline JSON file')
+        parser.add_argument('--update-baseline', action='store_true', help='Write the results as the new baseline')
+        parser.add_argument('--latency-tolerance', type=float, default=DEFAULT_LATENCY_TOLERANCE,
+                            help='Allowed relative p95 growth before a view counts as regressed')
+        parser.add_argument('--output', help='Also write the results to this JSON file')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.stdout.write('Seeding benchmark dataset...')
+            seed = seed_dataset(**{name: options[name] for name in DEFAULT_SEED})
+            missing = unbenchmarked_url_names(seed)
+            if missing:
+                raise CommandError(f"URLs missing from the benchmark: {', '.join(sorted(missing))}")
+            results = run_benchmark(seed, repeat=options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write(f"{'view':<28}{'status':>7}{'queries':>9}{'p50 ms':>10}{'p95 ms':>10}{'bytes':>10}")
+        for label, row in results.items():
+            self.stdout.write(
+                f"{label:<28}{row['status']:>7}{row['queries']:>9}{row['p50_ms']:>10}{row['p95_ms']:>10}{row['bytes']:>10}"
+            )
+
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(results, indent=2) + '\n')
+
+        baseline_path = Path(options['baseline'])
+        if options['update_baseline']:
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            baseline_path.write_text(json.dumps(results, indent=2, sort_keys=True) + '\n')
+            self.stdout.write(self.style.SUCCESS(f'Baseline written to {baseline_path}'))
+            return
+        if not baseline_path.exists():
+            self.stdout.write(self.style.WARNING(f'No baseline at {baseline_path}; run with --update-baseline'))
+            return
+
+        regressions = find_regressions(results, json.loads(baseline_path.read_text()), options['latency_tolerance'])
+        if regressions:
+            raise CommandError('Views regressed past the baseline:\n  ' + '\n  '.join(regressions))
+        self.stdout.write(self.style.SUCCESS('No view regressed past the baseline'))
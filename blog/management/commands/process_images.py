@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from blog.images import BLOG_IMAGE_WIDTHS, PROFILE_PICTURE_WIDTHS, process_model_image
+from blog.models import Blog
+from users.models import Profile
+
+# (label, model, image field, variant widths) of every field the pipeline covers
+IMAGE_FIELDS = (
+    ('blog', Blog, 'blog_image', BLOG_IMAGE_WIDTHS),
+    ('profile', Profile, 'profile_picture', PROFILE_PICTURE_WIDTHS),
+)
+
+
+class Command(BaseCommand):
+    help = 'Run the image pipeline (EXIF strip, dimensions, WebP/JPEG variants) over existing media'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--only', choices=[label for label, *_ in IMAGE_FIELDS], help='Only process this kind of image'
+        )
+        parser.add_argument('--force', action='store_true', help='Reprocess images that were already processed')
+        parser.add_argument('--batch-size', type=int, default=100, help='Primary keys fetched per query')
+
+    def handle(self, *args, **options):
+        for label, model, field_name, widths in IMAGE_FIELDS:
+            if options['only'] and options['only'] != label:
+                continue
+
+            rows = model.objects.exclude(**{f'{field_name}__isnull': True}).exclude(**{field_name: ''})
+            if not options['force']:
+                rows = rows.filter(**{f'{field_name}_width__isnull': True})
+
+            processed = skipped = 0
+            for pk in rows.order_by('pk').values_list('pk', flat=True).iterator(chunk_size=options['batch_size']):
+                if process_model_image(model, pk, field_name, widths):
+                    processed += 1
+                else:
+                    skipped += 1
+            self.stdout.write(self.style.SUCCESS(
+                f'Processed {processed} {label} images ({skipped} missing or unreadable)'
+            ))
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from blog.models import Blog, ReactionCount
+
+
+class Command(BaseCommand):
+    help = 'Rebuild or reconcile the denormalized reaction counts from the Reaction table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('slugs', nargs='*', help='Only rebuild the blogs with these slugs')
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Report blogs whose counters have drifted without fixing them',
+        )
+
+    def handle(self, *args, **options):
+        blogs = Blog.objects.select_related('reaction_counts').order_by('id')
+        if options['slugs']:
+            blogs = blogs.filter(slug__in=options['slugs'])
+
+        checked = drifted = 0
+        for blog in blogs.iterator(chunk_size=500):
+            checked += 1
+            expected = ReactionCount.count_reactions(blog)
+            try:
+                stored = blog.reaction_counts.as_dict()
+            except ReactionCount.DoesNotExist:
+                stored = None
+
+            if stored == expected:
+                continue
+
+            drifted += 1
+            self.stdout.write(f"{blog.slug}: stored={stored} expected={expected}")
+            if not options['check']:
+                ReactionCount.objects.update_or_create(blog=blog, defaults=expected)
+
+        if options['check']:
+            self.stdout.write(self.style.WARNING(f'{drifted} of {checked} blogs have drifted counters'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Reconciled {drifted} of {checked} blogs'))
@@ -0,0 +1,31 @@
+from django.utils import timezone
+
+from blog.models import Blog
+from blog.related import RELATED_REFRESH_BATCH_SIZE, process_related_refreshes, queue_related_refresh
+from myblog.management.base import LoopingCommand
+
+
+class Command(LoopingCommand):
+    help = 'Recompute the related posts of every queued blog, queueing the neighbours that changed'
+    loop_help = 'Keep refreshing instead of exiting once drained'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--all', action='store_true', help='Queue every published blog first (initial build)')
+        parser.add_argument('--batch-size', type=int, default=RELATED_REFRESH_BATCH_SIZE, help='Blogs refreshed per claim')
+
+    def run_once(self, **options):
+        # Follow-ups queued during this pass wait for the next one
+        started = timezone.now()
+        refreshed = 0
+        while True:
+            processed = process_related_refreshes(options['batch_size'], queued_before=started)
+            if not processed:
+                break
+            refreshed += processed
+        self.stdout.write(self.style.SUCCESS(f'Refreshed the related posts of {refreshed} blogs'))
+
+    def handle(self, *args, **options):
+        if options['all']:
+            queue_related_refresh(Blog.objects.published().values_list('pk', flat=True))
+        super().handle(*args, **options)
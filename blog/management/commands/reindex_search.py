@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from blog.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the blog search index (or create the native full-text index on PostgreSQL)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help='Blogs loaded per batch')
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        indexed = backend.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Search index rebuilt with {backend.__class__.__name__} ({indexed} blogs)'
+        ))
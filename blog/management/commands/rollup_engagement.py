@@ -0,0 +1,21 @@
+from blog.engagement import ROLLUP_BATCH_SIZE, rollup_engagement
+from myblog.management.base import LoopingCommand
+
+
+class Command(LoopingCommand):
+    help = 'Fold raw engagement events into the hourly and daily rollups and delete them'
+    loop_help = 'Keep compacting instead of exiting once drained'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--batch-size', type=int, default=ROLLUP_BATCH_SIZE, help='Events compacted per transaction')
+
+    def run_once(self, **options):
+        compacted = 0
+        while True:
+            # Short transactions, so request-time inserts into the log never wait long
+            rolled = rollup_engagement(options['batch_size'])
+            if not rolled:
+                break
+            compacted += rolled
+        self.stdout.write(self.style.SUCCESS(f'Rolled up {compacted} engagement events'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from blog.timeline import trim_timelines
+
+
+class Command(BaseCommand):
+    help = 'Trim every following timeline to its newest TIMELINE_MAX_ENTRIES entries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-entries', type=int, help='Entries kept per user (default: TIMELINE_MAX_ENTRIES)')
+
+    def handle(self, *args, **options):
+        deleted = trim_timelines(options['max_entries'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} timeline entries'))
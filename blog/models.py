@@ -4,6 +4,8 @@ from django.utils.text import slugify
 
 from django.contrib.auth import get_user_model
 
+from .excerpts import EXCERPT_MAX_LENGTH, content_metadata
+
 User = get_user_model()
 
 # Tag model
@@ -35,6 +37,32 @@ STATUS = (
     (1, 'Published')
 )
 
+class BlogQuerySet(models.QuerySet):
+    # Columns needed to render a blog card in the listing templates; never the full content
+    CARD_FIELDS = (
+        'id', 'title', 'slug', 'excerpt', 'reading_time', 'blog_image', 'blog_image_width', 'blog_image_variants',
+        'status', 'featured', 'created_at', 'read_count',
+        'author', 'author__username', 'author__first_name', 'author__last_name',
+        'author__profile__id', 'author__profile__first_name', 'author__profile__last_name',
+        'author__profile__profile_picture', 'author__profile__profile_picture_width',
+        'author__profile__profile_picture_variants',
+    )
+
+    def published(self):
+        return self.filter(status=1)
+
+    def cards(self):
+        """
+        Loads everything a listing card renders in a fixed number of queries:
+        the author and profile are joined, tags and categories prefetched.
+        """
+        return (
+            self.select_related('author__profile')
+                .prefetch_related('tags', 'categories')
+                .only(*self.CARD_FIELDS)
+        )
+
+
 class Blog(models.Model):
     title = models.CharField(max_length=200)
     content = models.TextField()
@@ -43,6 +71,10 @@ class Blog(models.Model):
     slug = models.SlugField(unique=True, max_length=200)
     author = models.ForeignKey('users.CustomUser', on_delete=models.CASCADE)
     blog_image = models.ImageField(upload_to='blog_images/', null=True, blank=True)
+    # Recorded by the image pipeline (blog/images.py): upright size and generated variant widths
+    blog_image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    blog_image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    blog_image_variants = models.JSONField(default=list, blank=True, editable=False)
     status = models.IntegerField(choices=STATUS, default=0)
     tags = models.ManyToManyField(Tag, related_name='blogs', blank=True)
     featured = models.BooleanField(default=False)
@@ -51,10 +83,31 @@ class Blog(models.Model):
     #field to track read count
     read_count = models.PositiveIntegerField(default=0)
 
+    # Derived from content in save(), so listings never load or tokenize the body
+    excerpt = models.CharField(max_length=EXCERPT_MAX_LENGTH, blank=True, editable=False)
+    word_count = models.PositiveIntegerField(default=0, editable=False)
+    reading_time = models.PositiveSmallIntegerField(default=1, editable=False)  # Minutes
+
+    # Set on first publish; orders the following timeline (created_at is a date refreshed on every save)
+    published_at = models.DateTimeField(null=True, blank=True, editable=False)
+    # Followers read this post at request time instead of receiving a timeline entry, see blog/timeline.py
+    timeline_pull = models.BooleanField(default=False, editable=False)
+
+    objects = BlogQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Blog"
         verbose_name_plural = "Blogs"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='blog_status_created_idx'),  # Published listings
+            # Featured posts; partial because featured=True compiles to a bare "featured" test on SQLite
+            models.Index(fields=['status', 'created_at'], condition=models.Q(featured=True), name='blog_featured_status_idx'),
+            models.Index(fields=['author', 'status', 'created_at'], name='blog_author_status_idx'),  # Profiles
+            models.Index(fields=['author', 'created_at'], name='blog_author_created_idx'),  # My blogs, drafts included
+            # Posts of authors with too many followers to fan out, merged into timelines on read
+            models.Index(fields=['author', 'published_at'], condition=models.Q(timeline_pull=True), name='blog_timeline_pull_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -63,13 +116,39 @@ class Blog(models.Model):
         return self.reactions.values('reaction_type').annotate(count=models.Count('reaction_type'))
     
     def get_reaction_count(self, reaction_type):
-        return self.reactions.filter(reaction_type=reaction_type).count()
+        return self.get_reaction_counts().get(reaction_type, 0)
+
+    def get_reaction_counts(self):
+        """
+        Returns the per-type reaction counts from the denormalized counter row.
+        The row is rebuilt from the Reaction table if it does not exist yet.
+        """
+        try:
+            counts = self.reaction_counts
+        except ReactionCount.DoesNotExist:
+            counts = ReactionCount.rebuild(self)
+            self.reaction_counts = counts
+        return counts.as_dict()
 
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.title)
+        if self.status == 1 and self.published_at is None:
+            self.published_at = now()
+        update_fields = kwargs.get('update_fields')
+        # A card loaded without its content keeps its stored metadata instead of fetching the body
+        content_loaded = 'content' not in self.get_deferred_fields()
+        if content_loaded and (update_fields is None or 'content' in update_fields):
+            self.refresh_content_metadata()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'excerpt', 'word_count', 'reading_time'}
         super().save(*args, **kwargs)
 
+    def refresh_content_metadata(self):
+        """Recomputes the excerpt, word count and reading time from the content."""
+        for field, value in content_metadata(self.content).items():
+            setattr(self, field, value)
+
     def get_absolute_url(self):
         from django.urls import reverse
         return reverse("blog_detail", kwargs={"slug": self.slug})
@@ -93,21 +172,123 @@ class Reaction(models.Model):
         unique_together = ('blog', 'user')  # Ensure a user can only react once to the same blog
         verbose_name = "Reaction"
         verbose_name_plural = "Reactions"
+        indexes = [
+            models.Index(fields=['blog', 'reaction_type'], name='reaction_blog_type_idx'),  # Per-type counts
+        ]
 
     def __str__(self):
         return f"{self.user.username} reacted {self.reaction_type} to {self.blog.title}"
 
-    def save(self, *args, **kwargs):
-        is_new = self.pk is None  # Check if this is a new Reaction
-        super().save(*args, **kwargs)  # Save the Reaction instance
-        if is_new and self.blog.author != self.user:
-            # Ensure Notification is created only once per new Reaction
-            Notification.objects.create(
-                recipient=self.blog.author,
-                sender=self.user,
-                notification_type='reaction',  # Type as defined in Notification.NOTIFICATION_TYPES
-                blog=self.blog
-            )
+
+# Reaction counter model
+class ReactionCount(models.Model):
+    """
+    Denormalized per-blog reaction totals, kept in sync by the Reaction signals
+    so the counts can be read in a single row lookup.
+    """
+    blog = models.OneToOneField(Blog, related_name='reaction_counts', on_delete=models.CASCADE, primary_key=True)
+    like = models.PositiveIntegerField(default=0)
+    love = models.PositiveIntegerField(default=0)
+    haha = models.PositiveIntegerField(default=0)
+    wow = models.PositiveIntegerField(default=0)
+    applaud = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Reaction Count"
+        verbose_name_plural = "Reaction Counts"
+
+    def __str__(self):
+        return f"Reaction counts for {self.blog.title}"
+
+    def as_dict(self):
+        return {reaction_type: getattr(self, reaction_type) for reaction_type, _ in REACTION_CHOICES}
+
+    @staticmethod
+    def count_reactions(blog):
+        """Counts the reactions of a blog per type in one grouped query."""
+        counts = {reaction_type: 0 for reaction_type, _ in REACTION_CHOICES}
+        rows = Reaction.objects.filter(blog=blog).values('reaction_type').annotate(count=models.Count('id'))
+        for row in rows:
+            if row['reaction_type'] in counts:
+                counts[row['reaction_type']] = row['count']
+        return counts
+
+    @classmethod
+    def rebuild(cls, blog):
+        """Recomputes the counter row of a blog (or blog id) from the Reaction table."""
+        counts, _ = cls.objects.update_or_create(blog_id=getattr(blog, 'pk', blog), defaults=cls.count_reactions(blog))
+        return counts
+
+    @classmethod
+    def adjust(cls, blog_id, reaction_type, delta):
+        """
+        Atomically moves one counter by delta with an F() expression.
+        Missing rows are left alone; they are rebuilt on the next read.
+        """
+        queryset = cls.objects.filter(blog_id=blog_id)
+        if delta < 0:
+            # Never drive a counter below zero; drift is fixed by rebuild_reaction_counts
+            queryset = queryset.filter(**{f"{reaction_type}__gte": -delta})
+        return queryset.update(**{reaction_type: models.F(reaction_type) + delta})
+
+
+# Search index model
+class SearchTerm(models.Model):
+    """
+    Inverted index entry used by the portable search backend (see blog/search.py):
+    one row per distinct term of a published blog, weighted by where it occurs.
+    """
+    term = models.CharField(max_length=64)
+    blog = models.ForeignKey(Blog, related_name='search_terms', on_delete=models.CASCADE)
+    weight = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        unique_together = ('term', 'blog')
+        verbose_name = "Search Term"
+        verbose_name_plural = "Search Terms"
+
+    def __str__(self):
+        return f"{self.term} -> {self.blog_id} ({self.weight})"
+
+
+# Related posts models
+class RelatedPost(models.Model):
+    """
+    One precomputed recommendation: `related` is the rank-th most similar
+    published post to `blog` (see blog/related.py). Rebuilt per blog by the
+    refresh_related_posts command.
+    """
+    blog = models.ForeignKey(Blog, related_name='related_posts', on_delete=models.CASCADE)
+    related = models.ForeignKey(Blog, related_name='recommended_in', on_delete=models.CASCADE)
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        verbose_name = "Related Post"
+        verbose_name_plural = "Related Posts"
+        constraints = [
+            # Also the index behind every lookup: one blog's recommendations in rank order
+            models.UniqueConstraint(fields=['blog', 'rank'], name='related_post_blog_rank_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.blog_id} -> {self.related_id} ({self.score:.3f})"
+
+
+class RelatedPostsRefresh(models.Model):
+    """
+    Queue of blogs whose related posts are out of date: their tags, status or
+    reactions changed, or a post they could rank changed.
+    """
+    blog = models.OneToOneField(Blog, on_delete=models.CASCADE, primary_key=True, related_name='+')
+    queued_at = models.DateTimeField(default=now)
+
+    class Meta:
+        verbose_name = "Related Posts Refresh"
+        verbose_name_plural = "Related Posts Refreshes"
+
+    def __str__(self):
+        return f"Refresh related posts of {self.blog_id}"
 
 
 # Comment model
@@ -135,6 +316,30 @@ class Follow(models.Model):
     def __str__(self):
         return f"{self.follower.username} follows {self.followee.username}"
 
+# Timeline model
+class TimelineEntry(models.Model):
+    """
+    A post delivered to a follower's "following" timeline when it was
+    published (fan-out on write). Trimmed to the newest TIMELINE_MAX_ENTRIES
+    per user by the trim_timelines command.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='timeline_entries')
+    blog = models.ForeignKey(Blog, on_delete=models.CASCADE, related_name='+')
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    published_at = models.DateTimeField()  # Copied from the blog, so pages never join it
+
+    class Meta:
+        unique_together = ('user', 'blog')
+        verbose_name = "Timeline Entry"
+        verbose_name_plural = "Timeline Entries"
+        indexes = [
+            # Newest-first timeline pages, keyset-paginated by (published_at, blog)
+            models.Index(fields=['user', 'published_at', 'blog'], name='timeline_user_published_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.blog_id} in the timeline of {self.user_id}"
+
 # Notification model
 class Notification(models.Model):
     NOTIFICATION_TYPES = (
@@ -150,11 +355,88 @@ class Notification(models.Model):
     comment = models.ForeignKey(Comment, on_delete=models.CASCADE, null=True, blank=True)
     created_at = models.DateTimeField(default=now)
     is_read = models.BooleanField(default=False)
+    # Natural key of the event that produced this notification, see blog.notification_dispatcher
+    event_key = models.CharField(max_length=100, unique=True, null=True, blank=True, editable=False)
 
     class Meta:
         verbose_name = "Notification"
         verbose_name_plural = "Notifications"
         ordering = ['-created_at']
+        indexes = [
+            # Newest-first notification lists of one recipient
+            models.Index(fields=['recipient', 'created_at'], name='notif_recipient_created_idx'),
+            # Unread counts, and the feed and stream, which page by id. is_read=False compiles to
+            # "NOT is_read", which SQLite cannot match to an index column, but it does match this
+            # partial index's condition
+            models.Index(fields=['recipient', 'id'], condition=models.Q(is_read=False), name='notif_recipient_unread_idx'),
+        ]
 
     def __str__(self):
         return f"{self.notification_type.capitalize()} by {self.sender.username} to {self.recipient.username}"
+
+
+# Engagement history models
+ENGAGEMENT_METRICS = ('read', 'comment', 'follow') + tuple(
+    f"reaction_{reaction_type}" for reaction_type, _ in REACTION_CHOICES
+)
+ENGAGEMENT_METRIC_CHOICES = tuple((metric, metric.replace('_', ' ').capitalize()) for metric in ENGAGEMENT_METRICS)
+
+class EngagementEvent(models.Model):
+    """
+    Raw engagement log: one row per reaction, comment or follow, and one per
+    blog and read-buffer flush for reads. The rollup_engagement command folds
+    these rows into EngagementRollup and deletes them.
+    """
+    metric = models.CharField(max_length=20, choices=ENGAGEMENT_METRIC_CHOICES)
+    # The user credited with the engagement: the blog author, or the followee of a follow
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    blog = models.ForeignKey(Blog, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    count = models.PositiveIntegerField(default=1)
+    created_at = models.DateTimeField(default=now)
+
+    class Meta:
+        verbose_name = "Engagement Event"
+        verbose_name_plural = "Engagement Events"
+
+    def __str__(self):
+        return f"{self.metric} x{self.count} for {self.author_id} at {self.created_at}"
+
+
+class EngagementRollup(models.Model):
+    """
+    Engagement totals per hour and per day bucket (in the site's time zone).
+
+    Rows with a blog count that post only; rows without one count everything
+    credited to the author, follows included, so author charts need no SUM.
+    """
+    GRANULARITY_CHOICES = (
+        ('hour', 'Hour'),
+        ('day', 'Day'),
+    )
+
+    granularity = models.CharField(max_length=4, choices=GRANULARITY_CHOICES)
+    bucket = models.DateTimeField()
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    blog = models.ForeignKey(Blog, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    metric = models.CharField(max_length=20, choices=ENGAGEMENT_METRIC_CHOICES)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Engagement Rollup"
+        verbose_name_plural = "Engagement Rollups"
+        # Both also serve the chart range scans: equality on the prefix, range on bucket
+        constraints = [
+            models.UniqueConstraint(
+                fields=['granularity', 'author', 'bucket', 'metric'],
+                condition=models.Q(blog__isnull=True),
+                name='rollup_author_bucket_uniq',
+            ),
+            models.UniqueConstraint(
+                fields=['granularity', 'blog', 'bucket', 'metric'],
+                condition=models.Q(blog__isnull=False),
+                name='rollup_blog_bucket_uniq',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.metric}={self.count} per {self.granularity} at {self.bucket}"
@@ -0,0 +1,119 @@
+# blog/notification_dispatcher.py
+
+import logging
+import threading
+from contextlib import contextmanager
+from functools import partial
+
+from django.db import transaction
+
+from .models import Notification
+from .util import forget_notification_caches
+
+logger = logging.getLogger(__name__)
+
+
+def notification_event_key(notification_type, recipient_id, sender_id, blog_id=None, comment_id=None):
+    """
+    Natural key of a notification event. The same event always maps to the
+    same key, so delivering it twice cannot create a second row.
+    """
+    return f"{notification_type}:{recipient_id}:{sender_id}:{blog_id or ''}:{comment_id or ''}"
+
+
+def deliver_notifications(events):
+    """
+    Writes a batch of notification events with one bulk_create.
+
+    Events are plain dicts of ids, so a batch can equally be handed to a
+    background job instead of being delivered inline.
+    """
+    events = {event['event_key']: event for event in events}
+    if not events:
+        return 0
+
+    existing = set(
+        Notification.objects.filter(event_key__in=events.keys()).values_list('event_key', flat=True)
+    )
+    new_notifications = [
+        Notification(
+            recipient_id=event['recipient_id'],
+            sender_id=event['sender_id'],
+            notification_type=event['notification_type'],
+            blog_id=event['blog_id'],
+            comment_id=event['comment_id'],
+            event_key=key,
+        )
+        for key, event in events.items() if key not in existing
+    ]
+    # ignore_conflicts keeps concurrent deliveries of the same event idempotent
+    Notification.objects.bulk_create(new_notifications, ignore_conflicts=True)
+
+    # bulk_create skips post_save, so refresh the per-user caches here
+    recipients = {n.recipient_id for n in new_notifications}
+    if recipients:
+        forget_notification_caches(recipients)
+    return len(new_notifications)
+
+
+class NotificationDispatcher:
+    """
+    Single entry point for creating notifications.
+
+    Every event is delivered after the surrounding transaction commits, so
+    rolled-back work never notifies anyone. Events dispatched inside
+    batch() are written together with one bulk_create.
+    """
+
+    def __init__(self, deliver=deliver_notifications):
+        self.deliver = deliver
+        self._local = threading.local()
+
+    def dispatch(self, notification_type, recipient, sender, blog=None, comment=None):
+        recipient_id = getattr(recipient, 'pk', recipient)
+        sender_id = getattr(sender, 'pk', sender)
+        if recipient_id == sender_id:
+            return  # Prevent self-notifications
+
+        blog_id = getattr(blog, 'pk', blog)
+        comment_id = getattr(comment, 'pk', comment)
+        event = {
+            'event_key': notification_event_key(notification_type, recipient_id, sender_id, blog_id, comment_id),
+            'notification_type': notification_type,
+            'recipient_id': recipient_id,
+            'sender_id': sender_id,
+            'blog_id': blog_id,
+            'comment_id': comment_id,
+        }
+
+        batch = getattr(self._local, 'batch', None)
+        if batch is not None:
+            batch.append(event)
+        else:
+            transaction.on_commit(partial(self._deliver, [event]))
+
+    @contextmanager
+    def batch(self):
+        """Collects the events dispatched in the block and delivers them together."""
+        outer = getattr(self._local, 'batch', None)
+        if outer is not None:
+            yield  # Nested batches join the outer one
+            return
+
+        self._local.batch = events = []
+        try:
+            yield
+        finally:
+            self._local.batch = None
+        if events:
+            transaction.on_commit(partial(self._deliver, events))
+
+    def _deliver(self, events):
+        try:
+            return self.deliver(events)
+        except Exception as e:
+            logger.error(f"Failed to deliver {len(events)} notifications: {e}")
+            return 0
+
+
+dispatcher = NotificationDispatcher()
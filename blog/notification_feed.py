@@ -0,0 +1,78 @@
+# blog/notification_feed.py
+
+from .models import Notification
+from .util import get_unread_notifications_count
+
+# Only the columns the notification badge needs, joined in a single query
+FEED_FIELDS = ('id', 'notification_type', 'created_at', 'sender__username', 'blog_id', 'blog__title')
+NOTIFICATION_TYPE_LABELS = dict(Notification.NOTIFICATION_TYPES)
+FEED_PAGE_SIZE = 20
+FEED_MAX_PAGE_SIZE = 50
+
+
+class NotificationFeedSerializer:
+    """
+    Serializes a user's unread notifications for the JSON feed and the SSE stream.
+
+    Rows come from one values() query that joins the sender and blog, newest
+    first, and pages are addressed with an opaque "before" id cursor.
+    """
+
+    def __init__(self, user_id, limit=FEED_PAGE_SIZE):
+        self.user_id = user_id
+        self.limit = max(1, min(int(limit), FEED_MAX_PAGE_SIZE))
+
+    def queryset(self):
+        return Notification.objects.filter(recipient_id=self.user_id, is_read=False).values(*FEED_FIELDS)
+
+    @staticmethod
+    def serialize(row):
+        notification_type = row['notification_type']
+        if notification_type == 'follow':
+            message = f"{row['sender__username']} started following you."
+            url = "/profile/"  # Adjust the URL to the user's profile page
+        elif notification_type == 'reaction' or notification_type == 'comment':
+            label = NOTIFICATION_TYPE_LABELS.get(notification_type, notification_type)
+            message = f"{row['sender__username']} {label} your post: {row['blog__title']}" if row['blog_id'] else ""
+            url = f"/blog/{row['blog_id']}" if row['blog_id'] else "/"
+        else:
+            message = "You have a new notification."
+            url = "/"
+
+        return {
+            "id": row['id'],
+            "message": message,
+            "url": url,
+            "created_at": row['created_at'].strftime("%Y-%m-%d %H:%M:%S"),
+        }
+
+    def page(self, before=None):
+        """
+        Returns one page of the feed in the shape base.html expects, plus a
+        next_cursor for older notifications.
+        """
+        queryset = self.queryset().order_by('-id')
+        if before:
+            queryset = queryset.filter(id__lt=before)
+
+        # Fetch one extra row to learn whether another page exists
+        rows = list(queryset[:self.limit + 1])
+        has_more = len(rows) > self.limit
+        rows = rows[:self.limit]
+
+        if not before and not has_more:
+            # The whole unread set is on this page, so it is the count
+            unseen_count = len(rows)
+        else:
+            unseen_count = get_unread_notifications_count(self.user_id)
+
+        return {
+            "unseen_count": unseen_count,
+            "notifications": [self.serialize(row) for row in rows],
+            "next_cursor": rows[-1]['id'] if has_more else None,
+        }
+
+    async def anewer_than(self, cursor):
+        """Returns serialized notifications with an id above the cursor, oldest first."""
+        queryset = self.queryset().filter(id__gt=cursor).order_by('id')[:self.limit]
+        return [self.serialize(row) async for row in queryset]
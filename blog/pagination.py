@@ -0,0 +1,106 @@
+# blog/pagination.py
+
+import base64
+import binascii
+import json
+
+from django.db.models import Q
+
+
+class KeysetPage:
+    """
+    One page of keyset-paginated results. Iterates like a Django Page, but
+    links to its neighbours with cursors instead of page numbers.
+    """
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Paginates a queryset by (created_at, id), newest first, without COUNT or OFFSET.
+
+    Each page is fetched with a range filter on the last row seen, so deep pages
+    cost the same as the first one. Cursors are opaque URL-safe tokens.
+    """
+
+    def __init__(self, queryset, per_page, field='created_at'):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.field = field
+
+    def encode_cursor(self, obj, direction):
+        value = self.queryset.model._meta.get_field(self.field).value_to_string(obj)
+        payload = json.dumps([direction, value, obj.pk], separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            direction, value, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            value = self.queryset.model._meta.get_field(self.field).to_python(value)
+        except (binascii.Error, ValueError, TypeError, json.JSONDecodeError) as e:
+            raise ValueError(f"Invalid cursor: {cursor}") from e
+        if direction not in ('next', 'prev'):
+            raise ValueError(f"Invalid cursor direction: {direction}")
+        return direction, value, pk
+
+    def get_page(self, cursor=None):
+        """Returns the page for a cursor; a missing or invalid cursor yields the first page."""
+        direction = value = pk = None
+        if cursor:
+            try:
+                direction, value, pk = self.decode_cursor(cursor)
+            except ValueError:
+                direction = None
+
+        field = self.field
+        if direction == 'prev':
+            # Walk backwards (oldest first) from the cursor, then flip the rows
+            queryset = self.queryset.filter(
+                Q(**{f'{field}__gt': value}) | Q(**{field: value, 'pk__gt': pk})
+            ).order_by(field, 'pk')
+        else:
+            queryset = self.queryset.order_by(f'-{field}', '-pk')
+            if direction == 'next':
+                queryset = queryset.filter(Q(**{f'{field}__lt': value}) | Q(**{field: value, 'pk__lt': pk}))
+
+        # One extra row tells whether the page has a neighbour in the walking direction
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        if direction == 'prev':
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, direction == 'next'
+
+        if not rows:
+            return KeysetPage([])
+        return KeysetPage(
+            rows,
+            next_cursor=self.encode_cursor(rows[-1], 'next') if has_next else None,
+            previous_cursor=self.encode_cursor(rows[0], 'prev') if has_previous else None,
+        )
@@ -0,0 +1,175 @@
+# blog/reactions.py
+
+from collections import Counter, defaultdict
+
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from .analytics import invalidate_author_analytics
+from .engagement import log_engagement_batch
+from .fragment_cache import bump_blog_fragment_versions
+from .models import REACTION_CHOICES, Reaction, ReactionCount
+from .notification_dispatcher import dispatcher
+from .related import queue_related_refresh
+
+REACTION_TYPES = [reaction_type for reaction_type, _ in REACTION_CHOICES]
+REACTION_BATCH_LIMIT = 100  # Reactions accepted per replayed batch
+
+
+def _returning_supported():
+    # MariaDB only returns columns from INSERT and DELETE, so UPDATE ... RETURNING is limited to these
+    return connection.vendor in ('postgresql', 'sqlite') and connection.features.can_return_columns_from_insert
+
+
+def _lock_reactions(user_id, blog_ids):
+    """{blog_id: reaction_type} of a user's existing reactions, locked until commit."""
+    return dict(
+        Reaction.objects.select_for_update()
+                        .filter(user_id=user_id, blog_id__in=blog_ids)
+                        .values_list('blog_id', 'reaction_type')
+    )
+
+
+def _insert_reactions(user_id, reactions):
+    """
+    Inserts {blog_id: reaction_type} for a user and returns the blog ids it
+    actually inserted. A row a concurrent request inserted first is skipped,
+    not overwritten: INSERT ... ON CONFLICT DO NOTHING RETURNING where
+    supported, otherwise one savepoint per row once the batch hits the
+    unique constraint.
+    """
+    if _returning_supported():
+        table = connection.ops.quote_name(Reaction._meta.db_table)
+        created_at = connection.ops.adapt_datetimefield_value(timezone.now())
+        rows = ', '.join(['(%s, %s, %s, %s)'] * len(reactions))
+        params = [value for blog_id, reaction_type in reactions.items()
+                  for value in (blog_id, user_id, reaction_type, created_at)]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} (blog_id, user_id, reaction_type, created_at) VALUES {rows} "
+                f"ON CONFLICT (blog_id, user_id) DO NOTHING RETURNING blog_id",
+                params,
+            )
+            return {blog_id for blog_id, in cursor.fetchall()}
+
+    new = [Reaction(blog_id=blog_id, user_id=user_id, reaction_type=reaction_type)
+           for blog_id, reaction_type in reactions.items()]
+    try:
+        with transaction.atomic():
+            Reaction.objects.bulk_create(new)
+        return set(reactions)
+    except IntegrityError:
+        pass
+    inserted = set()
+    for reaction in new:
+        try:
+            with transaction.atomic():
+                Reaction.objects.bulk_create([reaction])
+            inserted.add(reaction.blog_id)
+        except IntegrityError:
+            pass
+    return inserted
+
+
+def _update_reactions(user_id, reactions):
+    """Changes the type of existing reactions, one UPDATE per new reaction type."""
+    by_type = defaultdict(list)
+    for blog_id, reaction_type in reactions.items():
+        by_type[reaction_type].append(blog_id)
+    for reaction_type, blog_ids in by_type.items():
+        Reaction.objects.filter(user_id=user_id, blog_id__in=blog_ids).update(reaction_type=reaction_type)
+
+
+def _apply_count_deltas(blog_id, deltas):
+    """
+    Moves the counters of one blog by {reaction_type: delta}, never below
+    zero, and returns the resulting counts. A single UPDATE ... RETURNING
+    where supported; a counter row that does not exist yet is rebuilt.
+    """
+    table = connection.ops.quote_name(ReactionCount._meta.db_table)
+    columns = [connection.ops.quote_name(reaction_type) for reaction_type in REACTION_TYPES]
+    assignments, params = [], []
+    for reaction_type, column in zip(REACTION_TYPES, columns):
+        delta = deltas.get(reaction_type, 0)
+        if delta:
+            assignments.append(f"{column} = CASE WHEN {column} + %s < 0 THEN 0 ELSE {column} + %s END")
+            params += [delta, delta]
+
+    row = None
+    with connection.cursor() as cursor:
+        if _returning_supported():
+            cursor.execute(
+                f"UPDATE {table} SET {', '.join(assignments)} WHERE blog_id = %s RETURNING {', '.join(columns)}",
+                [*params, blog_id],
+            )
+            row = cursor.fetchone()
+        else:
+            cursor.execute(f"UPDATE {table} SET {', '.join(assignments)} WHERE blog_id = %s", [*params, blog_id])
+            if cursor.rowcount:
+                cursor.execute(f"SELECT {', '.join(columns)} FROM {table} WHERE blog_id = %s", [blog_id])
+                row = cursor.fetchone()
+    if row is None:
+        return ReactionCount.rebuild(blog_id).as_dict()
+    return dict(zip(REACTION_TYPES, row))
+
+
+def _read_counts(blog_ids):
+    counts = {row.blog_id: row.as_dict() for row in ReactionCount.objects.filter(blog_id__in=blog_ids)}
+    for blog_id in set(blog_ids) - counts.keys():
+        counts[blog_id] = ReactionCount.rebuild(blog_id).as_dict()
+    return counts
+
+
+def write_reactions(user_id, reactions, authors):
+    """
+    Sets a user's reactions, {blog_id: reaction_type}, in one transaction and
+    returns {blog_id: counts} read from the denormalized counters.
+
+    `authors` maps each blog to its author_id. The existing reactions are
+    read under lock and only the changed ones updated; the missing ones are
+    inserted by a statement that reports which rows it inserted, so a first
+    reaction that loses a race to a concurrent one for the same post is
+    re-read under lock and counted as a change, never twice. Counters move
+    only for the rows these writes changed, and are read back in the same
+    statement. The side effects of the Reaction signals (notifications,
+    engagement log, fragment and analytics invalidation, related posts) are
+    applied here in bulk, since these writes do not send them; each cache
+    invalidation is a single delete_many after commit.
+    """
+    with transaction.atomic(), dispatcher.batch():
+        previous = _lock_reactions(user_id, reactions.keys())
+        missing = {blog_id: reaction_type for blog_id, reaction_type in reactions.items() if blog_id not in previous}
+        created = _insert_reactions(user_id, missing) if missing else set()
+        if missing.keys() - created:
+            # Inserted by a concurrent request since the read, which the insert waited for
+            previous.update(_lock_reactions(user_id, missing.keys() - created))
+
+        updated = {
+            blog_id: reaction_type for blog_id, reaction_type in reactions.items()
+            if blog_id in previous and previous[blog_id] != reaction_type
+        }
+        if updated:
+            _update_reactions(user_id, updated)
+        changed = [blog_id for blog_id in reactions if blog_id in created or blog_id in updated]
+        if not changed:
+            return _read_counts(reactions.keys())
+
+        counts = {}
+        for blog_id in changed:
+            deltas = Counter({reactions[blog_id]: 1})
+            if blog_id in updated:
+                deltas[previous[blog_id]] -= 1
+            counts[blog_id] = _apply_count_deltas(blog_id, deltas)
+
+        for blog_id in created:
+            dispatcher.dispatch('reaction', recipient=authors[blog_id], sender=user_id, blog=blog_id)
+        log_engagement_batch([(f"reaction_{reactions[blog_id]}", authors[blog_id], blog_id) for blog_id in changed])
+        bump_blog_fragment_versions(changed, 'reactions')
+        invalidate_author_analytics(*(authors[blog_id] for blog_id in changed))
+        if created:
+            queue_related_refresh(created)
+
+    unchanged = [blog_id for blog_id in reactions if blog_id not in counts]
+    if unchanged:
+        counts.update(_read_counts(unchanged))
+    return counts
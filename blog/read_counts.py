@@ -0,0 +1,169 @@
+# blog/read_counts.py
+
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db.models import F
+
+logger = logging.getLogger(__name__)
+
+
+class ReadCountBuffer:
+    """
+    In-process buffer for blog read events.
+
+    Views add increments here instead of saving the Blog row. A background
+    thread coalesces them per blog and flushes them as one
+    UPDATE ... SET read_count = read_count + n per post.
+    """
+
+    def __init__(self, flush_interval=5.0, max_pending=10000):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending = Counter()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._stop = threading.Event()
+
+        # Operator-facing counters
+        self.recorded = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.flushed_events = 0
+        self.last_flush_at = None
+        self.last_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+
+    def add(self, blog_id, count=1):
+        """
+        Buffers `count` reads for a blog. Returns False if the event was dropped
+        because the buffer is full.
+        """
+        with self._lock:
+            if blog_id not in self._pending and len(self._pending) >= self.max_pending:
+                self.dropped += count
+                return False
+            self._pending[blog_id] += count
+            self.recorded += count
+
+        if self.flush_interval <= 0:
+            # Write-through mode, used by tests and single-process setups
+            self.flush()
+        else:
+            self._ensure_flusher()
+        return True
+
+    def flush(self):
+        """
+        Writes all pending increments to the database. Returns the number of
+        read events flushed.
+        """
+        from .engagement import log_reads
+        from .models import Blog
+
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+        if not pending:
+            return 0
+
+        started = time.monotonic()
+        flushed = 0
+        applied = {}
+        for blog_id, count in pending.items():
+            try:
+                Blog.objects.filter(pk=blog_id).update(read_count=F('read_count') + count)
+                flushed += count
+                applied[blog_id] = count
+            except Exception as e:
+                logger.error(f"Dropping {count} read events for blog {blog_id}: {e}")
+                with self._lock:
+                    self.dropped += count
+        if applied:
+            try:
+                # One engagement event per blog feeds the read history charts
+                log_reads(applied)
+            except Exception as e:
+                logger.error(f"Could not log {flushed} reads to the engagement log: {e}")
+        elapsed = time.monotonic() - started
+
+        with self._lock:
+            self.flushes += 1
+            self.flushed_events += flushed
+            self.last_flush_at = time.time()
+            self.last_flush_seconds = elapsed
+            self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+        logger.info(f"Flushed {flushed} read events for {len(pending)} blogs in {elapsed * 1000:.1f} ms")
+        return flushed
+
+    def pending_count(self):
+        with self._lock:
+            return sum(self._pending.values())
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pid': os.getpid(),
+                'pending': sum(self._pending.values()),
+                'recorded': self.recorded,
+                'dropped': self.dropped,
+                'flushes': self.flushes,
+                'flushed_events': self.flushed_events,
+                'last_flush_at': self.last_flush_at,
+                'last_flush_ms': round(self.last_flush_seconds * 1000, 2),
+                'max_flush_ms': round(self.max_flush_seconds * 1000, 2),
+            }
+
+    def _ensure_flusher(self):
+        # Threads do not survive a fork, so each gunicorn worker starts its own
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='read-count-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        from django.db import close_old_connections
+
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Read count flush failed: {e}")
+            finally:
+                close_old_connections()
+
+    def stop(self):
+        """Stops the background flusher and writes whatever is still pending."""
+        self._stop.set()
+        self.flush()
+
+
+read_buffer = ReadCountBuffer(
+    flush_interval=getattr(settings, 'READ_COUNT_FLUSH_INTERVAL', 5.0),
+    max_pending=getattr(settings, 'READ_COUNT_MAX_PENDING', 10000),
+)
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        read_buffer.stop()
+    except Exception as e:
+        logger.error(f"Could not flush read counts on exit: {e}")
+
+
+def record_read(blog):
+    """
+    Records one read of a blog without touching its row in the request.
+    """
+    return read_buffer.add(blog.pk)
@@ -0,0 +1,107 @@
+# blog/read_dedup.py
+
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+READ_DEDUP_CACHE_KEY = "read_seen_{}_{}"  # user id, bucket number
+READ_DEDUP_REDIS_KEY = "read_dedup:" + READ_DEDUP_CACHE_KEY
+BLOOM_BITS = 4096  # 512 bytes per user and bucket
+BLOOM_HASHES = 4  # ~0.2% false positives at 200 posts read per bucket, ~2.5% at 500
+
+# Serializes the read-modify-write of a filter in a process-local cache, where it would otherwise
+# drop the bits of a concurrent request by the same user
+_filter_lock = threading.Lock()
+_redis_client = None
+
+
+def _dedup_redis():
+    """Client of the READ_DEDUP_REDIS_URL server, or None when the filters live in a Django cache."""
+    global _redis_client
+    url = getattr(settings, 'READ_DEDUP_REDIS_URL', None)
+    if not url:
+        return None
+    if _redis_client is None:
+        import redis
+
+        _redis_client = redis.Redis.from_url(url)
+    return _redis_client
+
+
+def _dedup_cache():
+    return caches[getattr(settings, 'READ_DEDUP_CACHE_ALIAS', 'default')]
+
+
+def _window():
+    # A read is counted once per user and post within this many seconds (up to twice as long)
+    return getattr(settings, 'READ_DEDUP_WINDOW', 86400)
+
+
+def _bit_positions(blog_id):
+    # hashlib rather than hash(): positions must agree across worker processes
+    digest = hashlib.blake2b(str(blog_id).encode(), digest_size=4 * BLOOM_HASHES).digest()
+    return [int.from_bytes(digest[i * 4:(i + 1) * 4], 'big') % BLOOM_BITS for i in range(BLOOM_HASHES)]
+
+
+def _contains(bloom, positions):
+    return bloom is not None and all(bloom[position // 8] & (1 << position % 8) for position in positions)
+
+
+def _first_read_redis(client, current_key, previous_key, positions, timeout):
+    """
+    Redis keeps the filters as bit strings: one MULTI sets the post's bits in
+    the current bucket, reading their old values, and reads them in the
+    previous one. SETBIT only ever adds bits, so concurrent reads lose none.
+    """
+    pipeline = client.pipeline()
+    for position in positions:
+        pipeline.setbit(current_key, position, 1)
+    for position in positions:
+        pipeline.getbit(previous_key, position)
+    pipeline.expire(current_key, timeout)
+    bits = pipeline.execute()
+    seen_now, seen_before = bits[:BLOOM_HASHES], bits[BLOOM_HASHES:2 * BLOOM_HASHES]
+    return not (all(seen_now) or all(seen_before))
+
+
+def first_read(user_id, blog_id, now=None):
+    """
+    Returns True the first time a user opens a post within the dedup window
+    and remembers it; False for a repeat view.
+
+    Each user has one Bloom filter per time bucket, kept on the
+    READ_DEDUP_REDIS_URL server (one pipelined round trip per view). Every
+    worker must share that server: the READ_DEDUP_CACHE_ALIAS cache used
+    without it is process-local, good for one development process only, and
+    a deploy check fails until it is set. There the check is one get_many
+    over the current and previous buckets and a new read is one set.
+    Buckets expire by themselves after two windows. A false positive skips
+    counting a read; a lost filter counts a read again.
+    """
+    window = _window()
+    bucket = int((time.time() if now is None else now) // window)
+    positions = _bit_positions(blog_id)
+
+    client = _dedup_redis()
+    if client is not None:
+        return _first_read_redis(
+            client, READ_DEDUP_REDIS_KEY.format(user_id, bucket), READ_DEDUP_REDIS_KEY.format(user_id, bucket - 1),
+            positions, 2 * window,
+        )
+
+    current_key = READ_DEDUP_CACHE_KEY.format(user_id, bucket)
+    previous_key = READ_DEDUP_CACHE_KEY.format(user_id, bucket - 1)
+    cache = _dedup_cache()
+    with _filter_lock:
+        found = cache.get_many([current_key, previous_key])
+        if _contains(found.get(current_key), positions) or _contains(found.get(previous_key), positions):
+            return False
+
+        bloom = bytearray(found.get(current_key) or bytes(BLOOM_BITS // 8))
+        for position in positions:
+            bloom[position // 8] |= 1 << position % 8
+        cache.set(current_key, bytes(bloom), 2 * window)
+    return True
@@ -0,0 +1,222 @@
+# blog/related.py
+
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Min, Sum
+from django.utils import timezone
+
+from .fragment_cache import bump_blog_fragment_version
+from .models import Blog, Reaction, ReactionCount, RelatedPost, RelatedPostsRefresh
+
+RELATED_POSTS_LIMIT = 6  # Recommendations stored per post
+RELATED_CANDIDATE_LIMIT = 200  # Most-overlapping posts scored per signal
+RELATED_REACTOR_SAMPLE = 1000  # Latest reactors of a post used for co-reactions
+RELATED_REFRESH_BATCH_SIZE = 100
+
+# Feature weights of the weighted Jaccard similarity over tags and categories
+TAG_WEIGHT = 1.0
+CATEGORY_WEIGHT = 0.5
+# Blend of the two similarities into one score
+TAXONOMY_WEIGHT = 1.0
+CO_REACTION_WEIGHT = 0.5
+
+# Columns the related and recommended post lists render; recommendations also show the author's avatar
+RELATED_POST_FIELDS = ('id', 'title', 'slug', 'blog_image', 'blog_image_width', 'blog_image_variants')
+RECOMMENDED_POST_FIELDS = RELATED_POST_FIELDS + (
+    'author', 'author__username', 'author__profile__id', 'author__profile__profile_picture',
+)
+
+SCORE_PRECISION = 4  # Rounded, so an unchanged score compares equal after a round trip
+
+
+def queue_related_refresh(blog_ids):
+    """Marks blogs as needing their related posts recomputed."""
+    RelatedPostsRefresh.objects.bulk_create(
+        [RelatedPostsRefresh(blog_id=blog_id) for blog_id in set(blog_ids)], ignore_conflicts=True
+    )
+
+
+def _taxonomy_features(blog_ids):
+    """{blog_id: {feature: weight}} over the tags and categories of the given blogs."""
+    features = defaultdict(dict)
+    for blog_id, tag_id in Blog.tags.through.objects.filter(blog_id__in=blog_ids).values_list('blog_id', 'tag_id'):
+        features[blog_id][('tag', tag_id)] = TAG_WEIGHT
+    for blog_id, category_id in Blog.categories.through.objects.filter(blog_id__in=blog_ids).values_list(
+        'blog_id', 'category_id'
+    ):
+        features[blog_id][('category', category_id)] = CATEGORY_WEIGHT
+    return features
+
+
+def _weighted_jaccard(a, b):
+    shared = sum(weight for feature, weight in a.items() if feature in b)
+    union = sum(a.values()) + sum(b.values()) - shared
+    return shared / union if union else 0.0
+
+
+def _overlapping(through, field, values, blog_id):
+    """Published posts sharing the most `field` values with a blog, via its M2M through table."""
+    return list(
+        through.objects.filter(**{f'{field}__in': values}, blog__status=1)
+                       .exclude(blog_id=blog_id)
+                       .values('blog_id')
+                       .annotate(shared=Count('id'))
+                       .order_by('-shared', '-blog_id')
+                       .values_list('blog_id', flat=True)[:RELATED_CANDIDATE_LIMIT]
+    )
+
+
+def score_related(blog_id):
+    """
+    Scores the published posts related to a blog as
+    TAXONOMY_WEIGHT * weighted Jaccard over tags and categories
+    + CO_REACTION_WEIGHT * Jaccard over the users who reacted to both.
+
+    Only the RELATED_CANDIDATE_LIMIT most-overlapping posts of each signal
+    are scored. Returns {blog_id: score} without zero scores.
+    """
+    own = _taxonomy_features([blog_id]).get(blog_id, {})
+    tag_ids = [value for kind, value in own if kind == 'tag']
+    category_ids = [value for kind, value in own if kind == 'category']
+
+    candidates = set()
+    if tag_ids:
+        candidates.update(_overlapping(Blog.tags.through, 'tag_id', tag_ids, blog_id))
+    if category_ids:
+        candidates.update(_overlapping(Blog.categories.through, 'category_id', category_ids, blog_id))
+
+    reactors = list(
+        Reaction.objects.filter(blog_id=blog_id).order_by('-created_at')
+                        .values_list('user_id', flat=True)[:RELATED_REACTOR_SAMPLE]
+    )
+    co_reactions = Counter()
+    if reactors:
+        co_reactions.update(dict(
+            Reaction.objects.filter(user_id__in=reactors, blog__status=1)
+                            .exclude(blog_id=blog_id)
+                            .values('blog_id')
+                            .annotate(shared=Count('id'))
+                            .order_by('-shared', '-blog_id')
+                            .values_list('blog_id', 'shared')[:RELATED_CANDIDATE_LIMIT]
+        ))
+        candidates.update(co_reactions)
+    if not candidates:
+        return {}
+
+    features = _taxonomy_features(candidates)
+    reaction_totals = {}
+    if co_reactions:
+        # Reactor counts come from the denormalized counters; one reaction per user and post
+        for counts in ReactionCount.objects.filter(blog_id__in=co_reactions.keys()):
+            reaction_totals[counts.blog_id] = sum(counts.as_dict().values())
+
+    scores = {}
+    for candidate in candidates:
+        score = TAXONOMY_WEIGHT * _weighted_jaccard(own, features.get(candidate, {}))
+        shared = co_reactions.get(candidate, 0)
+        if shared:
+            union = len(reactors) + max(reaction_totals.get(candidate, shared), shared) - shared
+            score += CO_REACTION_WEIGHT * shared / union
+        score = round(score, SCORE_PRECISION)
+        if score > 0:
+            scores[candidate] = score
+    return scores
+
+
+def refresh_related_posts(blog_id):
+    """
+    Rebuilds the stored recommendations of one blog and returns the blogs
+    whose own lists this made stale.
+
+    Similarity is symmetric, so a post whose list no longer matches its score
+    against this blog (it should now rank it, or ranks it at an old score) is
+    queued next instead of every post being rebuilt.
+    """
+    published = Blog.objects.filter(pk=blog_id, status=1).exists()
+    scores = score_related(blog_id) if published else {}
+    top = sorted(scores.items(), key=lambda item: (-item[1], -item[0]))[:RELATED_POSTS_LIMIT]
+
+    with transaction.atomic():
+        RelatedPost.objects.filter(blog_id=blog_id).delete()
+        RelatedPost.objects.bulk_create([
+            RelatedPost(blog_id=blog_id, related_id=related_id, score=score, rank=rank)
+            for rank, (related_id, score) in enumerate(top)
+        ])
+        bump_blog_fragment_version(blog_id, 'related')
+
+    # Lists that rank this blog at a score that has changed, or no longer relate to it at all
+    ranked_by = dict(RelatedPost.objects.filter(related_id=blog_id).values_list('blog_id', 'score'))
+    stale = {listing_id for listing_id, stored in ranked_by.items() if scores.get(listing_id) != stored}
+
+    # Lists that do not rank this blog yet but would now
+    lists = {
+        row['blog_id']: row
+        for row in RelatedPost.objects.filter(blog_id__in=scores.keys())
+                                      .values('blog_id')
+                                      .annotate(lowest=Min('score'), entries=Count('id'))
+    }
+    for candidate, score in scores.items():
+        if candidate in ranked_by:
+            continue
+        row = lists.get(candidate)
+        if row is None or row['entries'] < RELATED_POSTS_LIMIT or score > row['lowest']:
+            stale.add(candidate)
+    return stale
+
+
+def process_related_refreshes(batch_size=RELATED_REFRESH_BATCH_SIZE, queued_before=None):
+    """
+    Rebuilds the related posts of up to batch_size queued blogs, queueing the
+    neighbours they made stale. Only entries queued before `queued_before`
+    are taken, so one pass cannot chase its own follow-ups forever. Returns
+    how many blogs were refreshed.
+    """
+    queued_before = queued_before or timezone.now()
+    with transaction.atomic():
+        blog_ids = list(
+            RelatedPostsRefresh.objects.select_for_update(skip_locked=True)
+                                       .filter(queued_at__lte=queued_before)
+                                       .order_by('queued_at')
+                                       .values_list('blog_id', flat=True)[:batch_size]
+        )
+        RelatedPostsRefresh.objects.filter(blog_id__in=blog_ids).delete()
+
+    stale = set()
+    for blog_id in blog_ids:
+        stale |= refresh_related_posts(blog_id)
+    if stale:
+        queue_related_refresh(stale)
+    return len(blog_ids)
+
+
+def related_posts(blog_id, limit=RELATED_POSTS_LIMIT):
+    """A blog's stored recommendations, in rank order, in one indexed lookup."""
+    return (
+        Blog.objects.published()
+                    .filter(recommended_in__blog_id=blog_id)
+                    .order_by('recommended_in__rank')
+                    .only(*RELATED_POST_FIELDS)[:limit]
+    )
+
+
+def recommended_posts_for(user_id, fallback_blog_id=None, limit=5, seeds=5):
+    """
+    Recommendations for a user: the posts most related to the last `seeds`
+    posts they reacted to, summed over those seeds, ranked and loaded in one
+    query over the related-posts index. Users without reactions get the
+    related posts of `fallback_blog_id`.
+    """
+    recent_reactions = Reaction.objects.filter(user_id=user_id).order_by('-created_at').values('blog_id')[:seeds]
+    posts = Blog.objects.published().select_related('author__profile').only(*RECOMMENDED_POST_FIELDS)
+    recommended = list(
+        posts.filter(recommended_in__blog_id__in=recent_reactions)
+             .exclude(reactions__user_id=user_id)
+             .annotate(relatedness=Sum('recommended_in__score'))
+             .order_by('-relatedness', '-pk')[:limit]
+    )
+    if not recommended and fallback_blog_id is not None:
+        recommended = list(
+            posts.filter(recommended_in__blog_id=fallback_blog_id).order_by('recommended_in__rank')[:limit]
+        )
+    return recommended
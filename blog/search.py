@@ -0,0 +1,127 @@
+# blog/search.py
+
+import re
+from collections import Counter
+
+from django.db import connection
+from django.db.models import Count, Sum
+from django.utils.html import strip_tags
+
+from .models import Blog, SearchTerm
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOP_WORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'has', 'in', 'is', 'it',
+    'its', 'of', 'on', 'or', 'that', 'the', 'to', 'was', 'were', 'will', 'with',
+}
+TITLE_WEIGHT = 3
+CONTENT_WEIGHT = 1
+MAX_TERM_LENGTH = 64
+MAX_QUERY_TERMS = 10
+INDEXED_FIELDS = ('title', 'content', 'status')  # A save that changes none of them leaves the index current
+
+
+def tokenize(text):
+    """Splits text (HTML allowed) into lowercase, stop-word-free search terms."""
+    return [
+        token for token in TOKEN_RE.findall(strip_tags(text or '').lower())
+        if len(token) > 1 and len(token) <= MAX_TERM_LENGTH and token not in STOP_WORDS
+    ]
+
+
+class InvertedIndexBackend:
+    """
+    Portable search backend for SQLite and MySQL.
+
+    Each published blog is indexed in Python into SearchTerm rows; queries
+    look terms up through the (term, blog) index and rank by the number of
+    matched terms, then by summed weight.
+    """
+
+    def index(self, blog):
+        SearchTerm.objects.filter(blog_id=blog.pk).delete()
+        if blog.status != 1:
+            return 0  # Drafts are never searchable
+
+        weights = Counter()
+        for term in tokenize(blog.title):
+            weights[term] += TITLE_WEIGHT
+        for term in tokenize(blog.content):
+            weights[term] += CONTENT_WEIGHT
+        SearchTerm.objects.bulk_create(
+            [SearchTerm(term=term, blog_id=blog.pk, weight=weight) for term, weight in weights.items()]
+        )
+        return len(weights)
+
+    def search(self, query):
+        terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+        if not terms:
+            return Blog.objects.none()
+        return (
+            Blog.objects.filter(status=1, search_terms__term__in=terms)
+                        .annotate(matched_terms=Count('search_terms'), rank=Sum('search_terms__weight'))
+                        .order_by('-matched_terms', '-rank', '-id')
+        )
+
+    def rebuild(self, batch_size=200):
+        indexed = 0
+        for blog in Blog.objects.only('id', *INDEXED_FIELDS).iterator(chunk_size=batch_size):
+            self.index(blog)
+            indexed += 1
+        return indexed
+
+
+class PostgresBackend:
+    """
+    Native PostgreSQL full-text search over a GIN expression index.
+
+    The database keeps the index current on every write, so index() is a no-op;
+    rebuild() only has to make sure the index exists.
+    """
+
+    INDEX_NAME = 'blog_blog_search_gin'
+    VECTOR_SQL = (
+        "setweight(to_tsvector('english', coalesce({prefix}title, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce({prefix}content, '')), 'B')"
+    )
+
+    def index(self, blog):
+        return 0
+
+    def search(self, query):
+        from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVectorField
+        from django.db.models import F
+        from django.db.models.expressions import RawSQL
+
+        if not query.strip():
+            return Blog.objects.none()
+        search_query = SearchQuery(query, config='english', search_type='websearch')
+        prefix = f'{Blog._meta.db_table}.'
+        vector = RawSQL(self.VECTOR_SQL.format(prefix=prefix), [], output_field=SearchVectorField())
+        return (
+            Blog.objects.filter(status=1)
+                        .annotate(document=vector)
+                        .filter(document=search_query)
+                        .annotate(rank=SearchRank(F('document'), search_query))
+                        .order_by('-rank', '-id')
+        )
+
+    def rebuild(self, batch_size=200):
+        table = Blog._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {self.INDEX_NAME} ON {table} "
+                f"USING GIN (({self.VECTOR_SQL.format(prefix='')}))"
+            )
+        return Blog.objects.count()
+
+
+def get_search_backend():
+    if connection.vendor == 'postgresql':
+        return PostgresBackend()
+    return InvertedIndexBackend()
+
+
+def search_blogs(query):
+    """Returns published blogs matching the query, best matches first."""
+    return get_search_backend().search(query)
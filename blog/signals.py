@@ -1,6 +1,33 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_init, post_save, post_delete, pre_delete
 from django.dispatch import receiver
-from .models import Follow, Notification, Blog, Comment, Reaction
+from .models import Follow, Notification, Blog, Comment, Reaction, ReactionCount, RelatedPost
+from .util import increment_unread_notifications_count, reset_unread_notifications_count, set_latest_notification_id
+from .notification_dispatcher import dispatcher
+from .search import INDEXED_FIELDS, get_search_backend
+from .fragment_cache import bump_blog_fragment_version, bump_blog_fragment_versions
+from .analytics import invalidate_author_analytics
+from .engagement import log_engagement
+from .images import BLOG_IMAGE_WIDTHS, image_name, queue_model_image
+from .related import queue_related_refresh
+from .timeline import backfill_timeline, fan_out_post, remove_author_from_timeline, remove_post_from_timelines
+
+
+def blog_author_id(instance):
+    """
+    The author of a comment's or reaction's blog, for the receivers below.
+
+    Read from the blog the instance already holds, or else with one narrow
+    query remembered on the instance, instead of loading the whole Blog row.
+    """
+    if instance._meta.get_field('blog').is_cached(instance):
+        return instance.blog.author_id
+    blog_id, author_id = getattr(instance, '_blog_author', (None, None))
+    if blog_id != instance.blog_id:
+        author_id = Blog.objects.filter(pk=instance.blog_id).values_list('author_id', flat=True).first()
+        instance._blog_author = (instance.blog_id, author_id)
+    return author_id
+
 
 # Notify the followee when they are followed
 @receiver(post_save, sender=Follow)
@@ -9,11 +36,7 @@ def notify_on_follow(sender, instance, created, **kwargs):
     Create a notification for the followee when they are followed.
     """
     if created:
-        Notification.objects.create(
-            recipient=instance.followee,
-            sender=instance.follower,
-            notification_type='follow'
-        )
+        dispatcher.dispatch('follow', recipient=instance.followee_id, sender=instance.follower_id)
 
 
 # Notify the blog author when their blog receives a comment
@@ -23,13 +46,13 @@ def comment_created(sender, instance, created, **kwargs):
     Create a notification for the blog author when a comment is added to their blog.
     Exclude notifications if the author comments on their own blog.
     """
-    if created and instance.blog.author != instance.author:
-        Notification.objects.create(
-            recipient=instance.blog.author,
-            sender=instance.author,
-            notification_type='comment',
-            blog=instance.blog,
-            comment=instance
+    if created:
+        dispatcher.dispatch(
+            'comment',
+            recipient=blog_author_id(instance),
+            sender=instance.author_id,
+            blog=instance.blog_id,
+            comment=instance.pk,
         )
 
 
@@ -40,11 +63,297 @@ def reaction_created(sender, instance, created, **kwargs):
     Create a notification for the blog author when their blog receives a reaction.
     Exclude notifications if the author reacts to their own blog.
     """
-    if created and instance.blog.author != instance.user:
-        Notification.objects.create(
-            recipient=instance.blog.author,
-            sender=instance.user,
-            notification_type='reaction',
-            blog=instance.blog,
-            reaction=instance
+    if created:
+        dispatcher.dispatch(
+            'reaction',
+            recipient=blog_author_id(instance),
+            sender=instance.user_id,
+            blog=instance.blog_id,
         )
+
+
+# Keep the search index in sync; deleted blogs cascade to their SearchTerm rows
+def _indexed_values(instance):
+    return tuple(instance.__dict__.get(field) for field in INDEXED_FIELDS)
+
+
+@receiver(post_init, sender=Blog)
+def remember_indexed_fields(sender, instance, **kwargs):
+    """
+    Remember the searchable fields as loaded, so a later save can tell whether the index is stale.
+    """
+    instance._original_indexed_values = _indexed_values(instance) if instance.pk else None
+
+
+@receiver(post_save, sender=Blog)
+def index_blog_for_search(sender, instance, update_fields=None, **kwargs):
+    """
+    Re-index a blog when a save changes its title, content or status, dropping it from the index while it is a draft.
+    """
+    if update_fields is not None and not set(update_fields) & set(INDEXED_FIELDS):
+        return
+    values = _indexed_values(instance)
+    if values != instance._original_indexed_values:
+        get_search_backend().index(instance)
+    instance._original_indexed_values = values
+
+
+# Keep the denormalized reaction counters in sync
+@receiver(post_save, sender=Blog)
+def create_reaction_counts(sender, instance, created, **kwargs):
+    """
+    Give every new blog an empty counter row.
+    """
+    if created:
+        ReactionCount.objects.get_or_create(blog=instance)
+
+
+@receiver(post_init, sender=Reaction)
+def remember_reaction_type(sender, instance, **kwargs):
+    """
+    Remember the reaction type as loaded, so a later save can tell whether it changed.
+    """
+    instance._original_reaction_type = instance.__dict__.get('reaction_type') if instance.pk else None
+
+
+# Registered before update_reaction_counts_on_save, which resets the remembered type
+@receiver(post_save, sender=Reaction)
+def log_reaction_engagement(sender, instance, created, **kwargs):
+    """
+    Log a new reaction to the engagement log, or a changed one under its new type.
+    """
+    if created or instance._original_reaction_type != instance.reaction_type:
+        log_engagement(f"reaction_{instance.reaction_type}", blog_author_id(instance), instance.blog_id)
+
+
+@receiver(post_save, sender=Reaction)
+def update_reaction_counts_on_save(sender, instance, created, **kwargs):
+    """
+    Increment the counter for a new reaction, or move one count across when the type changes.
+    """
+    previous_type = instance._original_reaction_type
+    if created:
+        ReactionCount.adjust(instance.blog_id, instance.reaction_type, 1)
+    elif previous_type and previous_type != instance.reaction_type:
+        ReactionCount.adjust(instance.blog_id, previous_type, -1)
+        ReactionCount.adjust(instance.blog_id, instance.reaction_type, 1)
+    instance._original_reaction_type = instance.reaction_type
+
+
+@receiver(post_delete, sender=Reaction)
+def update_reaction_counts_on_delete(sender, instance, **kwargs):
+    """
+    Decrement the counter of the deleted reaction's type.
+    """
+    ReactionCount.adjust(instance.blog_id, instance._original_reaction_type or instance.reaction_type, -1)
+
+
+# Invalidate the cached blog_detail fragments that depend on the changed rows
+@receiver(post_save, sender=Blog)
+@receiver(post_delete, sender=Blog)
+def invalidate_blog_fragments(sender, instance, **kwargs):
+    """
+    Drop every cached fragment of a blog when it is edited or deleted.
+    """
+    bump_blog_fragment_version(instance.pk)
+
+
+@receiver(post_save, sender=Blog)
+@receiver(pre_delete, sender=Blog)
+def invalidate_related_fragments(sender, instance, **kwargs):
+    """
+    Drop the cached related-post lists that link to an edited or deleted blog.
+    """
+    if not kwargs.get('created', False):
+        ranked_by = list(RelatedPost.objects.filter(related_id=instance.pk).values_list('blog_id', flat=True))
+        if ranked_by:
+            bump_blog_fragment_versions(ranked_by, 'related')
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_fragments(sender, instance, **kwargs):
+    """
+    Drop the cached comments list of the commented blog.
+    """
+    bump_blog_fragment_version(instance.blog_id, 'comments')
+
+
+@receiver(post_save, sender=Reaction)
+@receiver(post_delete, sender=Reaction)
+def invalidate_reaction_fragments(sender, instance, **kwargs):
+    """
+    Drop the cached reaction buttons of the reacted blog.
+    """
+    bump_blog_fragment_version(instance.blog_id, 'reactions')
+
+
+# Drop the author's cached analytics on every engagement event
+@receiver(post_save, sender=Blog)
+@receiver(post_delete, sender=Blog)
+def invalidate_analytics_on_blog_change(sender, instance, **kwargs):
+    """
+    A new, edited or deleted post changes its author's analytics.
+    """
+    invalidate_author_analytics(instance.author_id)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=Reaction)
+@receiver(post_delete, sender=Reaction)
+def invalidate_analytics_on_engagement(sender, instance, **kwargs):
+    """
+    Comments and reactions change the analytics of the commented or reacted post's author.
+    """
+    invalidate_author_analytics(blog_author_id(instance))
+
+
+# Append comments and follows to the engagement log behind the history charts
+@receiver(post_save, sender=Comment)
+def log_comment_engagement(sender, instance, created, **kwargs):
+    """
+    Log a new comment for the commented post's author.
+    """
+    if created:
+        log_engagement('comment', blog_author_id(instance), instance.blog_id)
+
+
+@receiver(post_save, sender=Follow)
+def log_follow_engagement(sender, instance, created, **kwargs):
+    """
+    Log a new follower for the followee.
+    """
+    if created:
+        log_engagement('follow', instance.followee_id)
+
+
+# Fan new posts out to the following timelines of their author's followers
+@receiver(post_init, sender=Blog)
+def remember_blog_status(sender, instance, **kwargs):
+    """
+    Remember the status as loaded, so a later save can tell whether the post was just published.
+    """
+    instance._original_status = instance.__dict__.get('status') if instance.pk else None
+
+
+# Registered before fan_out_on_publish, which resets the remembered status
+@receiver(post_save, sender=Blog)
+def refresh_related_on_status_change(sender, instance, created, **kwargs):
+    """
+    Queue a post whose publication status changed for new related posts.
+    Its refresh in turn queues the posts that rank it.
+    """
+    if 'status' in instance.get_deferred_fields():
+        return
+    if instance.status != instance._original_status and (instance.status == 1 or not created):
+        queue_related_refresh([instance.pk])
+
+
+@receiver(post_save, sender=Blog)
+def fan_out_on_publish(sender, instance, created, **kwargs):
+    """
+    Deliver a newly published post to its followers once it is committed,
+    and take an unpublished one out of their timelines.
+    """
+    if 'status' in instance.get_deferred_fields():
+        return  # Saved without loading the status, so it cannot have changed
+    was_published = instance._original_status == 1
+    if instance.status == 1 and not was_published:
+        transaction.on_commit(lambda: fan_out_post(instance.pk))
+    elif was_published and instance.status != 1:
+        remove_post_from_timelines(instance.pk)
+    instance._original_status = instance.status
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline_on_follow(sender, instance, created, **kwargs):
+    """
+    Give a new follower the latest posts of the followed author.
+    """
+    if created:
+        backfill_timeline(instance.follower_id, instance.followee_id)
+
+
+@receiver(post_delete, sender=Follow)
+def clear_timeline_on_unfollow(sender, instance, **kwargs):
+    """
+    Drop the unfollowed author's posts from the former follower's timeline.
+    """
+    remove_author_from_timeline(instance.follower_id, instance.followee_id)
+
+
+# Queue related-post refreshes when the signals they are computed from change
+@receiver(m2m_changed, sender=Blog.tags.through)
+@receiver(m2m_changed, sender=Blog.categories.through)
+def refresh_related_on_taxonomy_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Tags or categories added to or removed from posts, from either side of the relation.
+    """
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            queue_related_refresh([instance.pk])
+    elif action in ('post_add', 'post_remove') and pk_set:
+        queue_related_refresh(pk_set)
+    elif action == 'pre_clear':
+        # The cleared posts are only known before the clear
+        queue_related_refresh(instance.blogs.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Reaction)
+@receiver(post_delete, sender=Reaction)
+def refresh_related_on_reaction(sender, instance, **kwargs):
+    """
+    A new or removed reaction changes the co-reaction signal of the reacted post.
+    """
+    if kwargs.get('created', True):
+        queue_related_refresh([instance.blog_id])
+
+
+# Run the image pipeline on newly uploaded blog images
+@receiver(post_init, sender=Blog)
+def remember_blog_image(sender, instance, **kwargs):
+    """
+    Remember the stored image name as loaded, so a later save can tell whether a new one was uploaded.
+    """
+    instance._original_blog_image = image_name(instance.__dict__.get('blog_image')) if instance.pk else None
+
+
+@receiver(post_save, sender=Blog)
+def process_blog_image(sender, instance, **kwargs):
+    """
+    Queue a new blog image for stripping, measuring and resizing once it is
+    committed; the article fragments are re-rendered when its variants exist.
+    """
+    if 'blog_image' in instance.get_deferred_fields():
+        return
+    name = image_name(instance.blog_image)
+    if name and name != instance._original_blog_image:
+        blog_id = instance.pk
+        transaction.on_commit(lambda: queue_model_image(
+            Blog, blog_id, 'blog_image', BLOG_IMAGE_WIDTHS,
+            on_processed=lambda: bump_blog_fragment_version(blog_id, 'article'),
+        ))
+    instance._original_blog_image = name
+
+
+# Keep the cached unread notification counts in sync
+@receiver(post_save, sender=Notification)
+def update_unread_count_on_save(sender, instance, created, **kwargs):
+    """
+    Count a new unread notification, or drop the cached count when one is edited.
+    """
+    if created and not instance.is_read:
+        increment_unread_notifications_count(instance.recipient_id)
+        set_latest_notification_id(instance.recipient_id, instance.pk)
+    elif not created:
+        reset_unread_notifications_count(instance.recipient_id)
+
+
+@receiver(post_delete, sender=Notification)
+def update_unread_count_on_delete(sender, instance, **kwargs):
+    """
+    Drop the cached count when a notification is removed.
+    """
+    if not instance.is_read:
+        reset_unread_notifications_count(instance.recipient_id)
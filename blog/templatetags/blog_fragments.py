@@ -0,0 +1,53 @@
+# blog/templatetags/blog_fragments.py
+
+from django import template
+
+from blog.fragment_cache import FRAGMENT_GROUPS
+
+register = template.Library()
+
+
+class BlogFragmentNode(template.Node):
+    def __init__(self, nodelist, group, part):
+        self.nodelist = nodelist
+        self.group = group
+        self.part = part
+
+    def render(self, context):
+        fragments = context.get('blog_fragments')
+        if fragments is None:
+            return self.nodelist.render(context)
+
+        if not fragments.loaded:
+            # Declare every fragment of the page so they are fetched in one round trip
+            for node in context.template.nodelist.get_nodes_by_type(BlogFragmentNode):
+                fragments.register(node.group, node.part)
+
+        html = fragments.get(self.group, self.part)
+        if html is None:
+            html = self.nodelist.render(context)
+            fragments.set(self.group, self.part, html)
+        return html
+
+
+@register.tag
+def blogfragment(parser, token):
+    """
+    Caches the enclosed, user-independent markup of a blog page:
+
+        {% blogfragment 'comments' 'list' %} ... {% endblogfragment %}
+
+    The first argument is the invalidation group (see blog.fragment_cache),
+    the optional second one names the part when a group has several.
+    Without a `blog_fragments` context variable the block renders uncached;
+    the view calls its save() once the page is rendered.
+    """
+    bits = token.split_contents()
+    if len(bits) not in (2, 3):
+        raise template.TemplateSyntaxError(f"'{bits[0]}' takes a group and an optional part name")
+    group, part = [bit.strip('\'"') for bit in bits[1:]] + [None] * (3 - len(bits))
+    if group not in FRAGMENT_GROUPS:
+        raise template.TemplateSyntaxError(f"Unknown blog fragment group: {group}")
+    nodelist = parser.parse(('endblogfragment',))
+    parser.delete_first_token()
+    return BlogFragmentNode(nodelist, group, part or group)
@@ -0,0 +1,43 @@
+# blog/templatetags/blog_images.py
+
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+
+from blog.images import image_srcset
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(image, sizes='100vw', default='', **attrs):
+    """
+    Renders an image field as a <picture> offering its WebP and JPEG variants
+    through srcset, so the browser downloads the smallest one that fills
+    `sizes`. Images without recorded variants render as a plain <img>, and
+    an empty field renders `default` instead. The recorded intrinsic width
+    and height are emitted unless the caller passes its own, so the browser
+    reserves the box before the image arrives.
+
+        {% responsive_image post.blog_image sizes="(max-width: 575px) 100vw, 550px" class="img-cover" alt=post.title %}
+    """
+    if not image:
+        return format_html('<img src="{}"{}>', default, flatatt(attrs))
+
+    instance, field_name = image.instance, image.field.name
+    # A deferred column would cost a query per image; card querysets pass their box size instead
+    deferred = instance.get_deferred_fields()
+    if 'width' not in attrs and 'height' not in attrs and not deferred & {f'{field_name}_width', f'{field_name}_height'}:
+        width = getattr(instance, f'{field_name}_width', None)
+        height = getattr(instance, f'{field_name}_height', None)
+        if width and height:
+            attrs.update(width=width, height=height)
+
+    webp = image_srcset(image, 'webp')
+    if not webp:
+        return format_html('<img src="{}"{}>', image.url, flatatt(attrs))
+
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}"><img src="{}" srcset="{}" sizes="{}"{}></picture>',
+        webp, sizes, image.url, image_srcset(image, 'jpg'), sizes, flatatt(attrs),
+    )
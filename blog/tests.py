@@ -1,7 +1,15 @@
+import json
+from datetime import timedelta
+from pathlib import Path
+from io import BytesIO, StringIO
 from unittest.mock import patch
+from django.test import TestCase
+from django.core.management import call_command
 from django.urls import reverse
 from django.contrib.auth import get_user_model
-from blog.models import Blog, Notification, Comment
+from blog.models import Blog, Notification, Comment, Follow, Reaction, ReactionCount
+
+User = get_user_model()
 
 #Test Blog Creation
 class BlogCreationTests(TestCase):
@@ -255,3 +263,1271 @@ class NotificationReadTests(TestCase):
         # Check if the notification is marked as read
         self.notification.refresh_from_db()
         self.assertTrue(self.notification.is_read)
+
+
+#Test Denormalized Reaction Counts
+class ReactionCountTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', email='author@example.com', password='password')
+        self.reader = User.objects.create_user(username='reader', email='reader@example.com', password='password')
+        self.other = User.objects.create_user(username='other', email='other@example.com', password='password')
+        self.blog = Blog.objects.create(
+            title='Counted Blog',
+            content='Test content for the blog.',
+            author=self.author,
+            status=1,
+        )
+
+    def test_counts_follow_create_change_and_delete(self):
+        reaction = Reaction.objects.create(blog=self.blog, user=self.reader, reaction_type='like')
+        Reaction.objects.create(blog=self.blog, user=self.other, reaction_type='like')
+        self.assertEqual(Blog.objects.get(pk=self.blog.pk).get_reaction_counts()['like'], 2)
+
+        reaction = Reaction.objects.get(pk=reaction.pk)
+        reaction.reaction_type = 'wow'
+        reaction.save()
+        counts = Blog.objects.get(pk=self.blog.pk).get_reaction_counts()
+        self.assertEqual((counts['like'], counts['wow']), (1, 1))
+
+        reaction.delete()
+        counts = Blog.objects.get(pk=self.blog.pk).get_reaction_counts()
+        self.assertEqual((counts['like'], counts['wow']), (1, 0))
+
+    def test_receivers_look_up_the_blog_author_once(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as queries:
+            Reaction.objects.create(blog_id=self.blog.pk, user=self.reader, reaction_type='like')
+            Comment.objects.create(blog_id=self.blog.pk, author=self.reader, content='Nice')
+        blog_table = f'FROM "{Blog._meta.db_table}"'
+        lookups = [query['sql'] for query in queries if blog_table in query['sql']]
+        self.assertEqual(len(lookups), 2)  # One per saved row, shared by all of its receivers
+        self.assertTrue(all('"content"' not in sql for sql in lookups))
+
+    def test_counts_read_in_one_query(self):
+        Reaction.objects.create(blog=self.blog, user=self.reader, reaction_type='love')
+        blog = Blog.objects.get(pk=self.blog.pk)
+        blog.get_reaction_counts()
+        with self.assertNumQueries(0):
+            self.assertEqual(blog.get_reaction_count('love'), 1)
+            self.assertEqual(blog.get_reaction_count('haha'), 0)
+
+    def test_save_reaction_returns_counter_values(self):
+        self.client.login(username='reader@example.com', password='password')
+        response = self.client.post(
+            reverse('save_reaction', kwargs={'slug': self.blog.slug}),
+            data=json.dumps({'reaction': 'haha'}),
+            content_type='application/json',
+        )
+        data = response.json()
+        self.assertTrue(data['success'])
+        self.assertEqual(data['reaction_summary']['haha'], 1)
+        self.assertEqual(data['current_reaction'], 'haha')
+
+    def test_rebuild_command_reconciles_drift(self):
+        Reaction.objects.create(blog=self.blog, user=self.reader, reaction_type='applaud')
+        ReactionCount.objects.filter(blog=self.blog).update(applaud=7)
+
+        out = StringIO()
+        call_command('rebuild_reaction_counts', '--check', stdout=out)
+        self.assertEqual(ReactionCount.objects.get(blog=self.blog).applaud, 7)
+
+        call_command('rebuild_reaction_counts', stdout=out)
+        self.assertEqual(ReactionCount.objects.get(blog=self.blog).applaud, 1)
+
+
+#Test Buffered Read Counts
+class ReadCountBufferTests(TestCase):
+    def setUp(self):
+        from django.core.cache import caches
+
+        caches['read_dedup'].clear()
+        self.author = User.objects.create_user(username='author', email='author@example.com', password='password')
+        self.reader = User.objects.create_user(username='reader', email='reader@example.com', password='password')
+        self.blog = Blog.objects.create(
+            title='Read Blog',
+            content='Test content for the blog.',
+            author=self.author,
+            status=1,
+        )
+
+    def test_reads_are_coalesced_into_one_update(self):
+        from blog.read_counts import ReadCountBuffer
+
+        buffer = ReadCountBuffer(flush_interval=60)
+        for _ in range(3):
+            buffer.add(self.blog.pk)
+        self.blog.refresh_from_db()
+        self.assertEqual(self.blog.read_count, 0)
+
+        # One update, plus the author lookup and insert of the engagement log
+        with self.assertNumQueries(3):
+            self.assertEqual(buffer.flush(), 3)
+        self.blog.refresh_from_db()
+        self.assertEqual(self.blog.read_count, 3)
+        self.assertEqual(buffer.stats()['flushes'], 1)
+
+    def test_full_buffer_drops_events(self):
+        from blog.read_counts import ReadCountBuffer
+
+        buffer = ReadCountBuffer(flush_interval=60, max_pending=1)
+        self.assertTrue(buffer.add(self.blog.pk))
+        self.assertFalse(buffer.add(self.blog.pk + 1))
+        self.assertEqual(buffer.stats()['dropped'], 1)
+
+    def test_mark_blog_as_read_buffers_the_read(self):
+        from blog.read_counts import read_buffer
+
+        self.client.login(username='reader@example.com', password='password')
+        response = self.client.post(reverse('mark_blog_as_read', kwargs={'slug': self.blog.slug}))
+        self.assertTrue(response.json()['success'])
+
+        read_buffer.flush()
+        self.blog.refresh_from_db()
+        self.assertEqual(self.blog.read_count, 1)
+
+    def test_mark_blog_as_read_skips_counted_and_own_reads(self):
+        from blog.read_counts import read_buffer
+
+        self.client.login(username='reader@example.com', password='password')
+        self.client.get(self.blog.get_absolute_url())  # Counts the read
+        response = self.client.post(reverse('mark_blog_as_read', kwargs={'slug': self.blog.slug}))
+        self.assertFalse(response.json()['counted'])
+
+        self.client.login(username='author@example.com', password='password')
+        response = self.client.post(reverse('mark_blog_as_read', kwargs={'slug': self.blog.slug}))
+        self.assertFalse(response.json()['counted'])
+
+        read_buffer.flush()
+        self.blog.refresh_from_db()
+        self.assertEqual(self.blog.read_count, 1)
+
+
+#Test Lazy Notification Context Processor
+class NotificationContextTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        self.user = User.objects.create_user(username='reader', email='reader@example.com', password='password')
+        self.sender = User.objects.create_user(username='sender', email='sender@example.com', password='password')
+
+    def _context(self):
+        from django.test import RequestFactory
+        from blog.context_processors import notifications
+
+        request = RequestFactory().get('/')
+        request.user = self.user
+        return notifications(request)
+
+    def test_count_is_not_queried_unless_used(self):
+        with self.assertNumQueries(0):
+            self._context()
+
+    def test_count_is_cached_and_kept_in_sync(self):
+        Notification.objects.create(recipient=self.user, sender=self.sender, notification_type='follow')
+        self.assertEqual(self._context()['unread_notifications_count'](), 1)
+
+        Notification.objects.create(recipient=self.user, sender=self.sender, notification_type='follow')
+        count = self._context()['unread_notifications_count']
+        with self.assertNumQueries(1):  # The cache table lookup only
+            self.assertEqual(count(), 2)
+            self.assertEqual(count(), 2)
+
+        self.client.login(username='reader@example.com', password='password')
+        self.client.post(reverse('mark_notifications_as_read'))
+        self.assertEqual(self._context()['unread_notifications_count'](), 0)
+
+    def test_stats_count_cache_table_lookups_as_queries(self):
+        from blog.context_processors import notification_context_stats
+        from blog.util import unread_count_stats
+
+        self._context()['unread_notifications_count']()  # Warm the cache
+        unread_count_stats.clear()
+        self._context()
+        self._context()['unread_notifications_count']()
+        stats = notification_context_stats()
+        self.assertEqual((stats['requests'], stats['cache_hits'], stats['count_queries']), (2, 1, 0))
+        self.assertEqual(stats['db_queries'], 1)  # The hit still read the DatabaseCache table
+        self.assertEqual(stats['queries_saved'], 1)
+
+
+#Test Single-Path Notification Dispatch
+class NotificationDispatchTests(TestCase):
+    def setUp(self):
+        from django.core.cache import caches
+
+        caches['fragments'].clear()
+        self.author = User.objects.create_user(username='author', email='author@example.com', password='password')
+        self.reader = User.objects.create_user(username='reader', email='reader@example.com', password='password')
+        self.blog = Blog.objects.create(
+            title='Dispatched Blog',
+            content='Test content for the blog.',
+            author=self.author,
+            status=1,
+        )
+        self.client.login(username='reader@example.com', password='password')
+
+    def test_reaction_view_creates_one_notification(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse('save_reaction', kwargs={'slug': self.blog.slug}),
+                data=json.dumps({'reaction': 'like'}),
+                content_type='application/json',
+            )
+        self.assertEqual(Notification.objects.filter(notification_type='reaction').count(), 1)
+
+    @patch('blog.views.record_read')
+    def test_comment_and_follow_create_one_notification_each(self, mock_record_read):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('blog_detail', kwargs={'slug': self.blog.slug}), {'comment_body': 'Nice post'})
+            self.client.get(reverse('toggle_follow', kwargs={'user_id': self.author.id}))
+        self.assertEqual(Notification.objects.filter(notification_type='comment').count(), 1)
+        self.assertEqual(Notification.objects.filter(notification_type='follow').count(), 1)
+
+    def test_redelivery_is_idempotent_and_batched(self):
+        from blog.notification_dispatcher import dispatcher
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with dispatcher.batch():
+                dispatcher.dispatch('reaction', recipient=self.author, sender=self.reader, blog=self.blog)
+                dispatcher.dispatch('reaction', recipient=self.author, sender=self.reader, blog=self.blog)
+                dispatcher.dispatch('follow', recipient=self.author, sender=self.reader)
+        with self.captureOnCommitCallbacks(execute=True):
+            dispatcher.dispatch('follow', recipient=self.author, sender=self.reader)
+        self.assertEqual(Notification.objects.filter(recipient=self.author).count(), 2)
+
+    def test_self_actions_do_not_notify(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Reaction.objects.create(blog=self.blog, user=self.author, reaction_type='wow')
+        self.assertFalse(Notification.objects.exists())
+
+
+#Test Full-Text Search
+class BlogSearchTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', email='author@example.com', password='password')
+        self.title_match = Blog.objects.create(
+            title='Django performance tips', content='<p>Caching makes pages fast.</p>', author=self.author, status=1
+        )
+        self.body_match = Blog.objects.create(
+            title='Weekend notes', content='<p>Some thoughts on django.</p>', author=self.author, status=1
+        )
+        self.draft = Blog.objects.create(
+            title='Django draft', content='Unpublished django work.', author=self.author, status=0
+        )
+        self.client.login(username='author@example.com', password='password')
+
+    def test_results_are_ranked_and_drafts_hidden(self):
+        from blog.search import search_blogs
+
+        self.assertEqual(list(search_blogs('django')), [self.title_match, self.body_match])
+        self.assertEqual(list(search_blogs('django caching')), [self.title_match, self.body_match])
+        self.assertEqual(list(search_blogs('the')), [])
+
+    def test_index_follows_updates_and_deletes(self):
+        from blog.search import search_blogs
+
+        self.draft.status = 1
+        self.draft.save()
+        self.assertIn(self.draft, search_blogs('unpublished'))
+
+        self.body_match.delete()
+        self.assertEqual(list(search_blogs('thoughts')), [])
+
+    def test_saves_leaving_indexed_fields_alone_skip_reindex(self):
+        from blog.search import search_blogs
+
+        with patch('blog.search.InvertedIndexBackend.index') as index:
+            self.body_match.featured = True
+            self.body_match.save()
+            self.body_match.save(update_fields=['featured'])
+            Blog.objects.get(pk=self.title_match.pk).save()
+        index.assert_not_called()
+
+        self.body_match.title = 'Weekend haiku'
+        self.body_match.save(update_fields=['title'])
+        self.assertEqual(list(search_blogs('haiku')), [self.body_match])
+
+    def test_search_view_paginates(self):
+        response = self.client.get(reverse('search'), {'q': 'django'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['blogs']), [self.title_match, self.body_match])
+
+    def test_reindex_command(self):
+        from blog.models import SearchTerm
+
+        SearchTerm.objects.all().delete()
+        call_command('reindex_search', stdout=StringIO())
+        self.assertTrue(SearchTerm.objects.filter(term='django', blog=self.title_match).exists())
+        self.assertFalse(SearchTerm.objects.filter(blog=self.draft).exists())
+
+
+#Test Card Querysets
+class BlogCardQueryTests(TestCase):
+    def setUp(self):
+        from blog.models import Tag, Category
+
+        from users.models import Profile
+
+        self.author = User.objects.create_user(username='author', email='author@example.com', password='password')
+        Profile.objects.create(user=self.author)
+        self.tag = Tag.objects.create(name='Python')
+        self.category = Category.objects.create(name='Tech')
+        self.client.login(username='author@example.com', password='password')
+
+    def _add_posts(self, count):
+        for _ in range(count):
+            blog = Blog.objects.create(
+                title=f'Card {Blog.objects.count()}', content='Card content.', author=self.author, status=1, featured=True
+            )
+            blog.tags.add(self.tag)
+            blog.categories.add(self.category)
+
+    def _queries_for(self, url):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    @patch('blog.views.record_read')
+    def test_listing_pages_render_in_constant_queries(self, mock_record_read):
+        urls = [
+            reverse('blogs'), reverse('home'), reverse('my_blogs'),
+            reverse('profile', args=['author']), reverse('search') + '?q=card',
+        ]
+        self._add_posts(3)
+        [self._queries_for(url) for url in urls]  # Warm the session and notification caches
+        few = [self._queries_for(url) for url in urls]
+        self._add_posts(5)
+        self.assertEqual([self._queries_for(url) for url in urls], few)
+
+    def test_blog_list_renders_one_page(self):
+        self._add_posts(7)
+        response = self.client.get(reverse('blogs'))
+        self.assertEqual(len(response.context['blogs']), 5)
+        self.assertTrue(response.context['blogs'].has_next())
+
+
+# Test keyset pagination
+class KeysetPaginationTests(TestCase):
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='pager', email='pager@example.com', password='password')
+        self.blogs = [
+            Blog.objects.create(title=f'Page {i}', content='Content.', author=self.author, status=1)
+            for i in range(7)
+        ]
+
+    def _paginator(self):
+        from .pagination import KeysetPaginator
+        return KeysetPaginator(Blog.objects.all(), 3)
+
+    def test_walks_forward_and_back(self):
+        paginator = self._paginator()
+        newest_first = sorted(self.blogs, key=lambda b: (b.created_at, b.pk), reverse=True)
+
+        first = paginator.get_page()
+        self.assertEqual(list(first), newest_first[:3])
+        self.assertFalse(first.has_previous())
+
+        second = paginator.get_page(first.next_cursor)
+        self.assertEqual(list(second), newest_first[3:6])
+        last = paginator.get_page(second.next_cursor)
+        self.assertEqual(list(last), newest_first[6:])
+        self.assertFalse(last.has_next())
+
+        back = paginator.get_page(last.previous_cursor)
+        self.assertEqual(list(back), newest_first[3:6])
+        self.assertTrue(back.has_next())
+
+    def test_invalid_cursor_returns_first_page(self):
+        page = self._paginator().get_page('not-a-cursor')
+        self.assertEqual(len(page), 3)
+        self.assertFalse(page.has_previous())
+
+    def test_pages_without_count_queries(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        paginator = self._paginator()
+        cursor = paginator.get_page().next_cursor
+        with CaptureQueriesContext(connection) as queries:
+            list(paginator.get_page(cursor))
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('COUNT(', queries[0]['sql'].upper())
+
+
+# Test the blog_detail fragment cache
+@patch('blog.views.record_read')
+class BlogFragmentCacheTests(TestCase):
+
+    def setUp(self):
+        from django.core.cache import caches
+        from .fragment_cache import fragment_stats
+
+        caches['fragments'].clear()
+        self.author = User.objects.create_user(username='writer', email='writer@example.com', password='password')
+        self.reader = User.objects.create_user(username='reader', email='reader@example.com', password='password')
+        self.blog = Blog.objects.create(title='Cached', content='<p>First body</p>', author=self.author, status=1)
+        self.client.login(username='reader@example.com', password='password')
+        self.url = reverse('blog_detail', args=[self.blog.slug])
+        fragment_stats.clear()
+
+    def _get(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.get(self.url)
+
+    def test_second_render_hits_cache(self, mock_record_read):
+        from .fragment_cache import blog_fragment_stats
+
+        self._get()
+        self.assertEqual(blog_fragment_stats()['hits'], 0)
+        response = self._get()
+        self.assertContains(response, 'First body')
+        self.assertEqual(blog_fragment_stats()['misses'], 6)
+        self.assertEqual(blog_fragment_stats()['hits'], 6)
+
+    def test_render_writes_back_with_one_set_many(self, mock_record_read):
+        from django.core.cache import caches
+        from .fragment_cache import FRAGMENT_GROUPS
+
+        cache = caches['fragments']
+        with patch.object(cache, 'set_many', wraps=cache.set_many) as set_many, \
+                patch.object(cache, 'add', wraps=cache.add) as add:
+            self._get()
+            self._get()
+        self.assertEqual(set_many.call_count, 1)  # Versions and fragments of the cold render; none when warm
+        self.assertEqual(len(set_many.call_args[0][0]), len(FRAGMENT_GROUPS) + 6)
+        add.assert_not_called()
+
+    def test_blog_edit_invalidates_article(self, mock_record_read):
+        self._get()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.blog.content = '<p>Second body</p>'
+            self.blog.save()
+        response = self._get()
+        self.assertContains(response, 'Second body')
+        self.assertNotContains(response, 'First body')
+
+    def test_comment_and_reaction_invalidate_their_fragments(self, mock_record_read):
+        self._get()
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(blog=self.blog, author=self.reader, content='Fresh comment')
+            Reaction.objects.create(blog=self.blog, user=self.reader, reaction_type='wow')
+        response = self._get()
+        self.assertContains(response, 'Fresh comment')
+        self.assertContains(response, '<span id="wow-count">1</span>')
+
+    def test_per_user_state_stays_outside_cache(self, mock_record_read):
+        self._get()
+        with self.captureOnCommitCallbacks(execute=True):
+            Reaction.objects.create(blog=self.blog, user=self.reader, reaction_type='love')
+        self.assertContains(self._get(), 'data-current-reaction="love"')
+
+        self.client.login(username='writer@example.com', password='password')
+        response = self._get()
+        self.assertContains(response, 'data-current-reaction=""')
+        self.assertContains(response, reverse('update_blog', args=[self.blog.slug]))
+
+
+# Test that the hot queries are served by indexes
+class QueryPlanIndexTests(TestCase):
+    """
+    Issues the listing, feed and counter queries through the views and
+    helpers that run them, then checks with EXPLAIN QUERY PLAN (SQLite) that
+    each one searches the expected composite index instead of scanning the table.
+    """
+
+    def setUp(self):
+        from users.models import Profile
+
+        self.author = User.objects.create_user(username='writer', email='writer@example.com', password='password')
+        self.reader = User.objects.create_user(username='reader', email='reader@example.com', password='password')
+        Profile.objects.create(user=self.author)
+        self.blog = Blog.objects.create(title='Indexed', content='Body', author=self.author, status=1, featured=True)
+        Notification.objects.create(recipient=self.reader, sender=self.author, notification_type='follow')
+        self.client.login(username='reader@example.com', password='password')
+
+    def assertUsesIndex(self, run, pattern, index_name):
+        """Checks every query `run` issues whose SQL matches `pattern` searches `index_name`."""
+        import re
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        if connection.vendor != 'sqlite':
+            self.skipTest('Query plans are only checked on SQLite')
+        with CaptureQueriesContext(connection) as captured:
+            run()
+        queries = [query['sql'] for query in captured if re.search(pattern, query['sql'])]
+        self.assertTrue(queries, f'No query matched {pattern}')
+        for sql in queries:
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plan = '\n'.join(row[-1] for row in cursor.fetchall())
+            self.assertRegex(plan, rf'USING (COVERING )?INDEX ({index_name})\b', f'{sql}\n{plan}')
+
+    def test_home_listings(self):
+        home = lambda: self.client.get(reverse('home'))
+        self.assertUsesIndex(home, r'FROM "blog_blog" .*WHERE .*"blog_blog"\."featured"', 'blog_featured_status_idx')
+        self.assertUsesIndex(
+            home, r'FROM "blog_blog" .*WHERE (?!.*"featured").*"created_at" DESC LIMIT 6$', 'blog_status_created_idx'
+        )
+
+    def test_blog_list(self):
+        self.assertUsesIndex(
+            lambda: self.client.get(reverse('blogs')), r'FROM "blog_blog" .*ORDER BY', 'blog_status_created_idx'
+        )
+
+    def test_author_listings(self):
+        author_blogs = r'FROM "blog_blog" .*WHERE .*"blog_blog"\."author_id" = '
+        profile = lambda: self.client.get(reverse('profile', args=[self.author.username]))
+        self.assertUsesIndex(profile, author_blogs, 'blog_author_status_idx')
+        self.client.login(username='writer@example.com', password='password')
+        self.assertUsesIndex(lambda: self.client.get(reverse('my_blogs')), author_blogs, 'blog_author_created_idx')
+
+    def test_notification_queries(self):
+        from django.core.cache import caches
+        from django.test import RequestFactory
+        from .context_processors import notifications
+        from .util import get_unread_notifications_count
+
+        caches['default'].clear()
+        self.assertUsesIndex(
+            lambda: get_unread_notifications_count(self.reader.pk), r'FROM "blog_notification"',
+            'notif_recipient_unread_idx'
+        )
+        self.assertUsesIndex(
+            lambda: self.client.get(reverse('fetch_notifications')), r'FROM "blog_notification"',
+            'notif_recipient_unread_idx'
+        )
+
+        request = RequestFactory().get('/')
+        request.user = self.reader
+        self.assertUsesIndex(
+            lambda: list(notifications(request)['notifications']), r'FROM "blog_notification"',
+            'notif_recipient_created_idx'
+        )
+        # The page lists every notification, then marks the unread ones as read
+        notifications_page = lambda: self.client.get(reverse('notifications'))
+        self.assertUsesIndex(notifications_page, r'^SELECT .*FROM "blog_notification"', 'notif_recipient_created_idx')
+        Notification.objects.create(recipient=self.reader, sender=self.author, notification_type='comment')
+        self.assertUsesIndex(notifications_page, r'^UPDATE "blog_notification"', 'notif_recipient_unread_idx')
+
+    def test_reaction_counts(self):
+        from .models import ReactionCount
+
+        self.assertUsesIndex(
+            lambda: ReactionCount.count_reactions(self.blog), r'FROM "blog_reaction"', 'reaction_blog_type_idx'
+        )
+
+    def test_otp_lookups(self):
+        from users.models import OTP
+        from users.utils import create_and_send_otp
+
+        active_otp = 'users_otp_one_active_per_user|users_otp_lookup_idx'
+        # Login and resend_otp replace the active OTP in place
+        self.assertUsesIndex(lambda: create_and_send_otp(self.reader), r'^SELECT .*FROM "users_otp"', active_otp)
+        # verify_otp
+        self.assertUsesIndex(lambda: OTP.objects.active().get(user=self.reader), r'FROM "users_otp"', active_otp)
+
+
+# Test the view benchmark harness
+class ViewBenchmarkTests(TestCase):
+    """
+    Runs the benchmark_views harness on a small dataset. Query counts do not
+    depend on the data volume, so they are held to the stored baseline here;
+    latency is only compared by the full `manage.py benchmark_views` run.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        from .benchmark import seed_dataset
+
+        cls.seed = seed_dataset(users=60, posts=80, reactions=200, comments=100, follows=100, notifications=300)
+
+    def test_every_url_is_benchmarked(self):
+        from .benchmark import unbenchmarked_url_names
+
+        self.assertEqual(unbenchmarked_url_names(self.seed), set())
+
+    @patch('blog.views.record_read')
+    def test_query_counts_do_not_exceed_baseline(self, mock_record_read):
+        from django.conf import settings
+        from .benchmark import find_regressions, run_benchmark
+
+        baseline_path = Path(settings.BASE_DIR) / 'benchmarks' / 'views_baseline.json'
+        baseline = json.loads(baseline_path.read_text())
+        results = run_benchmark(self.seed, repeat=1)
+        for row in baseline.values():
+            row['p95_ms'] = float('inf')  # Timings are too noisy for the test suite
+        self.assertEqual(find_regressions(results, baseline), [])
+
+    @patch('blog.views.record_read')
+    def test_cached_sessions_skip_the_session_table(self, mock_record_read):
+        from django.conf import settings
+        from .benchmark import run_session_benchmark
+
+        results = run_session_benchmark(self.seed, settings.SESSION_ENGINES, repeat=1)
+        self.assertIn('blog_detail', results)
+        for label, row in results.items():
+            self.assertEqual(row['db']['session_queries'], 1, label)
+            self.assertEqual(row['cached_db']['session_queries'], 0, label)
+            self.assertEqual(row['signed_cookies']['session_queries'], 0, label)
+
+    def test_find_regressions(self):
+        from .benchmark import find_regressions
+
+        baseline = {'home': {'status': 200, 'queries': 5, 'p50_ms': 10, 'p95_ms': 20, 'bytes': 100}}
+        same = {'home': dict(baseline['home'], p95_ms=24)}
+        self.assertEqual(find_regressions(same, baseline), [])
+        worse = {'home': dict(baseline['home'], queries=9, p95_ms=100)}
+        self.assertEqual(find_regressions(worse, baseline), ['home: 5 -> 9 queries', 'home: p95 20ms -> 100ms'])
+
+
+# Test the engagement log, its rollups and the chart series endpoint
+class EngagementRollupTests(TestCase):
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='writer', email='writer@example.com', password='password')
+        self.reader = User.objects.create_user(username='reader', email='reader@example.com', password='password')
+        self.blog = Blog.objects.create(title='Tracked', slug='tracked', content='Body', author=self.author, status=1)
+
+    def _engage(self):
+        from .read_counts import ReadCountBuffer
+
+        buffer = ReadCountBuffer(flush_interval=0)
+        buffer.add(self.blog.pk, count=3)
+        Comment.objects.create(blog=self.blog, author=self.reader, content='Nice')
+        reaction = Reaction.objects.create(blog=self.blog, user=self.reader, reaction_type='like')
+        reaction.reaction_type = 'wow'
+        reaction.save()
+        Follow.objects.create(follower=self.reader, followee=self.author)
+
+    def _series(self, **params):
+        from django.utils import timezone
+
+        now = timezone.now()
+        params = {'start': (now - timedelta(hours=1)).isoformat(), 'end': (now + timedelta(hours=1)).isoformat(), **params}
+        response = self.client.get(reverse('analytics_series'), params)
+        if response['Content-Type'] != 'application/json':
+            return response, {}
+        return response, {series['name']: sum(series['data']) for series in response.json().get('series', [])}
+
+    def test_events_are_logged(self):
+        from .models import EngagementEvent
+
+        self._engage()
+        logged = dict(EngagementEvent.objects.values_list('metric', 'count'))
+        self.assertEqual(logged, {'read': 3, 'comment': 1, 'reaction_like': 1, 'reaction_wow': 1, 'follow': 1})
+
+    def test_rollup_compacts_events_incrementally(self):
+        from .models import EngagementEvent, EngagementRollup
+
+        self._engage()
+        call_command('rollup_engagement', batch_size=2, stdout=StringIO())
+        self.assertFalse(EngagementEvent.objects.exists())
+
+        Comment.objects.create(blog=self.blog, author=self.reader, content='Again')
+        call_command('rollup_engagement', stdout=StringIO())
+
+        for granularity in ('hour', 'day'):
+            author_row = EngagementRollup.objects.get(granularity=granularity, blog=None, metric='comment')
+            blog_row = EngagementRollup.objects.get(granularity=granularity, blog=self.blog, metric='comment')
+            self.assertEqual((author_row.count, blog_row.count), (2, 2))
+        # Follows belong to the author, not to a post
+        self.assertFalse(EngagementRollup.objects.filter(blog=self.blog, metric='follow').exists())
+
+    def test_series_endpoint_reads_rollups_only(self):
+        self._engage()
+        call_command('rollup_engagement', stdout=StringIO())
+        Comment.objects.create(blog=self.blog, author=self.reader, content='Not rolled up yet')
+        self.client.login(username='writer@example.com', password='password')
+
+        with self.assertNumQueries(3):  # Session, user, rollup range scan
+            response, totals = self._series()
+        self.assertEqual(response.json()['granularity'], 'hour')
+        self.assertEqual(len(response.json()['categories']), len(response.json()['series'][0]['data']))
+        self.assertEqual(totals['read'], 3)
+        self.assertEqual(totals['comment'], 1)
+        self.assertEqual(totals['follow'], 1)
+
+        _, totals = self._series(blog='tracked', granularity='day', metric=['reaction_like', 'reaction_wow', 'follow'])
+        self.assertEqual(totals, {'reaction_like': 1, 'reaction_wow': 1, 'follow': 0})
+
+    def test_series_endpoint_rejects_bad_ranges(self):
+        self.client.login(username='writer@example.com', password='password')
+        self.assertEqual(self._series(start='2024-01-02', end='2024-01-01')[0].status_code, 400)
+        self.assertEqual(self._series(start='2020-01-01', end='2024-01-01', granularity='hour')[0].status_code, 400)
+        self.assertEqual(self._series(metric='views')[0].status_code, 400)
+        self.assertEqual(self._series(blog='not-mine')[0].status_code, 404)
+
+
+# Test the following timeline
+class TimelineTests(TestCase):
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='writer', email='writer@example.com', password='password')
+        self.reader = User.objects.create_user(username='reader', email='reader@example.com', password='password')
+        self.other = User.objects.create_user(username='other', email='other@example.com', password='password')
+        Follow.objects.create(follower=self.reader, followee=self.author)
+        Follow.objects.create(follower=self.other, followee=self.author)
+
+    def _publish(self, title, author=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Blog.objects.create(title=title, content='Body', author=author or self.author, status=1)
+
+    def _walk(self, user, per_page):
+        from .timeline import timeline_page
+
+        titles, cursor = [], None
+        while True:
+            page = timeline_page(user.pk, cursor, per_page=per_page)
+            titles.extend(post.title for post in page)
+            if not page.has_next():
+                return titles
+            cursor = page.next_cursor
+
+    def test_publish_fans_out_to_followers(self):
+        from .models import TimelineEntry
+
+        with self.captureOnCommitCallbacks(execute=True):
+            draft = Blog.objects.create(title='Draft', content='Body', author=self.author, status=0)
+        self.assertFalse(TimelineEntry.objects.exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            draft.status = 1
+            draft.save()
+        self.assertEqual(set(TimelineEntry.objects.values_list('user_id', flat=True)), {self.reader.pk, self.other.pk})
+
+        draft.status = 0
+        draft.save()
+        self.assertFalse(TimelineEntry.objects.exists())
+
+    def test_cursor_pages_are_newest_first_without_gaps(self):
+        for i in range(5):
+            self._publish(f'Post {i}')
+        self.assertEqual(self._walk(self.reader, per_page=2), [f'Post {i}' for i in reversed(range(5))])
+
+    def test_widely_followed_authors_are_merged_on_read(self):
+        from .models import TimelineEntry
+
+        self._publish('Pushed')
+        with self.settings(TIMELINE_FANOUT_LIMIT=1):
+            pulled = self._publish('Pulled')
+        pulled.refresh_from_db()
+        self.assertTrue(pulled.timeline_pull)
+        self.assertFalse(TimelineEntry.objects.filter(blog=pulled).exists())
+        self.assertEqual(self._walk(self.reader, per_page=1), ['Pulled', 'Pushed'])
+
+    def test_follow_backfills_and_unfollow_clears(self):
+        self._publish('Earlier')
+        newcomer = User.objects.create_user(username='newcomer', email='newcomer@example.com', password='password')
+        follow = Follow.objects.create(follower=newcomer, followee=self.author)
+        self.assertEqual(self._walk(newcomer, per_page=10), ['Earlier'])
+        follow.delete()
+        self.assertEqual(self._walk(newcomer, per_page=10), [])
+
+    def test_trim_keeps_newest_entries(self):
+        for i in range(4):
+            self._publish(f'Post {i}')
+        call_command('trim_timelines', max_entries=2, stdout=StringIO())
+        self.assertEqual(self._walk(self.reader, per_page=10), ['Post 3', 'Post 2'])
+
+    def test_following_view(self):
+        self._publish('Followed post')
+        self._publish('Unrelated post', author=self.other)
+        self.client.login(username='reader@example.com', password='password')
+        response = self.client.get(reverse('following'))
+        self.assertContains(response, 'Followed post')
+        self.assertNotContains(response, 'Unrelated post')
+
+    def test_page_is_two_keyset_queries_and_one_load(self):
+        from .related import RELATED_POST_FIELDS
+        from .timeline import timeline_page
+
+        self._publish('Followed post')
+        with self.assertNumQueries(3):
+            page = timeline_page(self.reader.pk, posts=Blog.objects.only(*RELATED_POST_FIELDS))
+        self.assertEqual([post.title for post in page], ['Followed post'])
+        with self.assertNumQueries(5):  # Plus the tags and categories of the default cards
+            timeline_page(self.reader.pk)
+
+
+# Test the precomputed related posts
+class RelatedPostsTests(TestCase):
+
+    def setUp(self):
+        from django.core.cache import caches
+        from .models import Tag
+
+        caches['fragments'].clear()
+        self.author = User.objects.create_user(username='writer', email='writer@example.com', password='password')
+        self.reader = User.objects.create_user(username='reader', email='reader@example.com', password='password')
+        self.python, self.django, self.cooking = (Tag.objects.create(name=name) for name in ('Python', 'Django', 'Cooking'))
+        self.main = self._post('Main', self.python, self.django)
+        self.twin = self._post('Twin', self.python, self.django)
+        self.cousin = self._post('Cousin', self.python)
+        self.unrelated = self._post('Unrelated', self.cooking)
+
+    def _post(self, title, *tags):
+        blog = Blog.objects.create(title=title, content='Body', author=self.author, status=1)
+        blog.tags.set(tags)
+        return blog
+
+    def _refresh(self):
+        call_command('refresh_related_posts', stdout=StringIO())
+
+    def _related(self, blog):
+        from .related import related_posts
+
+        return [post.title for post in related_posts(blog.pk)]
+
+    def test_tag_overlap_ranks_related_posts(self):
+        self._refresh()
+        self.assertEqual(self._related(self.main), ['Twin', 'Cousin'])
+        self.assertCountEqual(self._related(self.cousin), ['Main', 'Twin'])  # Tied
+        self.assertEqual(self._related(self.unrelated), [])
+
+    def test_tag_change_refreshes_both_sides(self):
+        from .models import RelatedPostsRefresh
+
+        self._refresh()
+        self.unrelated.tags.add(self.python, self.django)
+        self.assertTrue(RelatedPostsRefresh.objects.filter(blog=self.unrelated).exists())
+        self._refresh()
+        self._refresh()  # Neighbours queued by the first pass
+        self.assertIn('Unrelated', self._related(self.main))
+        self.assertIn('Main', self._related(self.unrelated))
+
+    def test_co_reactions_relate_untagged_posts(self):
+        untagged = self._post('Untagged')
+        for i in range(3):
+            user = User.objects.create_user(username=f'fan{i}', email=f'fan{i}@example.com', password='password')
+            Reaction.objects.create(blog=self.unrelated, user=user, reaction_type='like')
+            Reaction.objects.create(blog=untagged, user=user, reaction_type='love')
+        self._refresh()
+        self.assertEqual(self._related(self.unrelated), ['Untagged'])
+
+    def test_unpublished_posts_drop_out(self):
+        self._refresh()
+        self.twin.status = 0
+        self.twin.save()
+        self._refresh()
+        self._refresh()
+        self.assertEqual(self._related(self.main), ['Cousin'])
+
+    def test_related_posts_are_one_query(self):
+        self._refresh()
+        with self.assertNumQueries(1):
+            self._related(self.main)
+
+    def test_detail_page_caches_related_posts_until_they_change(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self._refresh()
+        self.client.login(username='writer@example.com', password='password')
+        url = reverse('blog_detail', args=[self.main.slug])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertContains(response, 'Twin')
+        self.assertFalse([q for q in queries if 'blog_relatedpost' in q['sql']])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.twin.title = 'Renamed twin'
+            self.twin.save()
+        self.assertContains(self.client.get(url), 'Renamed twin')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cousin.delete()
+        self.assertNotContains(self.client.get(url), 'Cousin')
+
+    def test_recommendations_are_one_query(self):
+        from .related import recommended_posts_for
+
+        self._refresh()
+        Reaction.objects.create(blog=self.cousin, user=self.reader, reaction_type='like')
+        with self.assertNumQueries(1):
+            recommended = recommended_posts_for(self.reader.pk)
+        self.assertCountEqual([post.title for post in recommended], ['Main', 'Twin'])
+        with self.assertNumQueries(0):
+            [post.author.username for post in recommended]
+
+    def test_home_recommends_posts_related_to_reactions(self):
+        self._refresh()
+        Reaction.objects.create(blog=self.cousin, user=self.reader, reaction_type='like')
+        self.client.login(username='reader@example.com', password='password')
+        recommended = [post.title for post in self.client.get(reverse('home')).context['recommended_posts']]
+        self.assertCountEqual(recommended, ['Main', 'Twin'])
+
+
+# Test the upload image pipeline
+class ImagePipelineTests(TestCase):
+
+    def setUp(self):
+        import shutil
+        import tempfile
+
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = self.settings(MEDIA_ROOT=media_root, IMAGE_PIPELINE_BACKGROUND=False)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.author = User.objects.create_user(username='writer', email='writer@example.com', password='password')
+
+    def _photo(self, name='photo.jpg'):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from PIL import Image
+
+        image = Image.new('RGB', (800, 400), (200, 30, 30))
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Orientation: rotate 90 degrees clockwise to display
+        exif[0x010F] = 'SecretCam'  # Make
+        buffer = BytesIO()
+        image.save(buffer, 'JPEG', exif=exif)
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+    def _open(self, name):
+        from django.core.files.storage import default_storage
+        from PIL import Image
+
+        with default_storage.open(name, 'rb') as f:
+            image = Image.open(f)
+            image.load()
+        return image
+
+    def test_upload_is_stripped_measured_and_resized(self):
+        from .images import variant_name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            blog = Blog.objects.create(title='Pictured', content='Body', author=self.author, blog_image=self._photo())
+        blog.refresh_from_db()
+
+        self.assertEqual((blog.blog_image_width, blog.blog_image_height), (400, 800))  # Upright
+        self.assertEqual(blog.blog_image_variants, [320])
+        original = self._open(blog.blog_image.name)
+        self.assertEqual(original.size, (400, 800))
+        self.assertFalse(original.getexif())
+        webp = self._open(variant_name(blog.blog_image.name, 320, 'webp'))
+        self.assertEqual((webp.format, webp.size), ('WEBP', (320, 640)))
+        self.assertFalse(webp.getexif())
+        self.assertEqual(self._open(variant_name(blog.blog_image.name, 320, 'jpg')).format, 'JPEG')
+
+    def test_upload_is_processed_off_the_request_thread(self):
+        from unittest import mock
+
+        with self.settings(IMAGE_PIPELINE_BACKGROUND=True), \
+                mock.patch('blog.images._pipeline_executor') as executor, \
+                self.captureOnCommitCallbacks(execute=True):
+            blog = Blog.objects.create(title='Pictured', content='Body', author=self.author, blog_image=self._photo())
+        job, model, pk, field_name = executor.return_value.submit.call_args[0][:4]
+        self.assertEqual((model, pk, field_name), (Blog, blog.pk, 'blog_image'))
+        blog.refresh_from_db()
+        self.assertIsNone(blog.blog_image_width)  # Nothing waited for the job
+
+        job(*executor.return_value.submit.call_args[0][1:])
+        blog.refresh_from_db()
+        self.assertEqual(blog.blog_image_variants, [320])
+
+    def test_tag_renders_srcset_of_variants(self):
+        from django.template import Context, Template
+
+        with self.captureOnCommitCallbacks(execute=True):
+            blog = Blog.objects.create(title='Pictured', content='Body', author=self.author, blog_image=self._photo())
+        blog.refresh_from_db()
+        template = Template('{% load blog_images %}{% responsive_image blog.blog_image sizes="300px" alt=blog.title %}')
+        html = template.render(Context({'blog': blog}))
+        self.assertIn('<source type="image/webp" srcset="/media/blog_images/photo__w320.webp 320w"', html)
+        self.assertIn('srcset="/media/blog_images/photo__w320.jpg 320w, /media/blog_images/photo.jpg 400w"', html)
+        self.assertIn('alt="Pictured" height="800" width="400"', html)
+
+        blog.blog_image_variants = []
+        self.assertEqual(
+            template.render(Context({'blog': blog})),
+            '<img src="/media/blog_images/photo.jpg" alt="Pictured" height="800" width="400">',
+        )
+        sized = Template('{% load blog_images %}{% responsive_image blog.blog_image width="300" height="360" %}')
+        self.assertEqual(
+            sized.render(Context({'blog': blog})), '<img src="/media/blog_images/photo.jpg" height="360" width="300">'
+        )
+
+    def test_backfill_command_processes_existing_media(self):
+        from django.core.files.storage import default_storage
+
+        name = default_storage.save('blog_images/legacy.jpg', self._photo())
+        blog = Blog.objects.create(title='Legacy', content='Body', author=self.author)
+        Blog.objects.filter(pk=blog.pk).update(blog_image=name)  # As uploaded before the pipeline existed
+        Blog.objects.create(title='Lost', content='Body', author=self.author)
+        Blog.objects.filter(title='Lost').update(blog_image='blog_images/missing.jpg')
+
+        out = StringIO()
+        call_command('process_images', only='blog', stdout=out)
+        self.assertIn('Processed 1 blog images (1 missing or unreadable)', out.getvalue())
+        blog.refresh_from_db()
+        self.assertEqual(blog.blog_image_variants, [320])
+
+    def test_unwritable_format_keeps_original(self):
+        from django.core.files.storage import default_storage
+        from PIL import Image
+
+        from .images import process_image
+
+        # A cursor file: Pillow decodes CUR but has no encoder for it
+        buffer = BytesIO()
+        Image.new('RGB', (64, 64), (1, 2, 3)).save(buffer, 'ICO', sizes=[(64, 64)], bitmap_format='bmp')
+        data = bytearray(buffer.getvalue())
+        data[2] = 2  # ICONDIR type 2: cursor
+        name = default_storage.save('blog_images/pointer.cur', BytesIO(bytes(data)))
+        blog = Blog.objects.create(title='Cursor', content='Body', author=self.author)
+        Blog.objects.filter(pk=blog.pk).update(blog_image=name)
+        blog.refresh_from_db()
+
+        with self.assertLogs('blog.images', 'WARNING'):
+            self.assertIsNone(process_image(blog.blog_image, (32,)))
+        with default_storage.open(name, 'rb') as f:
+            self.assertEqual(f.read(), bytes(data))
+
+
+# Test the stored excerpt and reading-time metadata
+class BlogExcerptTests(TestCase):
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='writer', email='writer@example.com', password='password')
+
+    def test_save_stores_sanitized_excerpt_and_reading_time(self):
+        body = '<p>Fish &amp; <strong>chips</strong></p><script>alert(1)</script>' + '<p>word</p>' * 450
+        blog = Blog.objects.create(title='Long read', content=body, author=self.author, status=1)
+        blog.refresh_from_db()
+
+        self.assertTrue(blog.excerpt.startswith('Fish & chips word word'))
+        self.assertNotIn('<', blog.excerpt)
+        self.assertEqual(len(blog.excerpt.split()), 30)
+        self.assertEqual(blog.word_count, 453)
+        self.assertEqual(blog.reading_time, 3)
+
+        blog.content = '<p>Short now.</p>'
+        blog.save(update_fields=['content'])
+        blog.refresh_from_db()
+        self.assertEqual((blog.excerpt, blog.word_count, blog.reading_time), ('Short now.', 2, 1))
+
+    def test_listing_queries_do_not_load_content(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        Blog.objects.create(title='Listed', content='<p>Hidden body</p>', author=self.author, status=1)
+        with CaptureQueriesContext(connection) as queries:
+            card = Blog.objects.published().cards().get()
+        self.assertNotIn('"content"', queries.captured_queries[0]['sql'])
+        self.assertEqual(card.excerpt, 'Hidden body')
+
+        card.title = 'Renamed'
+        card.save()  # Saving a card keeps the metadata of the body it never loaded
+        self.assertEqual(Blog.objects.values_list('title', 'excerpt').get(), ('Renamed', 'Hidden body'))
+
+    def test_backfill_command_fills_existing_posts(self):
+        Blog.objects.create(title='Old', content='<p>Written before excerpts</p>', author=self.author)
+        Blog.objects.update(excerpt='', word_count=0)
+
+        out = StringIO()
+        call_command('backfill_excerpts', batch_size=1, stdout=out)
+        self.assertIn('Updated the excerpts of 1 posts', out.getvalue())
+        self.assertEqual(Blog.objects.values_list('excerpt', 'word_count').get(), ('Written before excerpts', 3))
+
+
+# Test the reaction upsert engine and the replay endpoint
+class ReactionUpsertTests(TestCase):
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', email='author@example.com', password='password')
+        self.reader = User.objects.create_user(username='reader', email='reader@example.com', password='password')
+        self.first = Blog.objects.create(title='First', content='Body', author=self.author, status=1)
+        self.second = Blog.objects.create(title='Second', content='Body', author=self.author, status=1)
+        self.client.login(username='reader@example.com', password='password')
+
+    def _react(self, blog, reaction_type):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('save_reaction', kwargs={'slug': blog.slug}),
+                data=json.dumps({'reaction': reaction_type}),
+                content_type='application/json',
+            )
+        return response.json()
+
+    def _assert_engine(self):
+        from .models import EngagementEvent
+
+        data = self._react(self.first, 'like')
+        self.assertEqual((data['current_reaction'], data['reaction_summary']['like']), ('like', 1))
+
+        data = self._react(self.first, 'wow')
+        self.assertEqual((data['reaction_summary']['like'], data['reaction_summary']['wow']), (0, 1))
+        data = self._react(self.first, 'wow')  # Unchanged: nothing is written
+        self.assertEqual(data['reaction_summary']['wow'], 1)
+
+        self.assertEqual(Reaction.objects.get().reaction_type, 'wow')
+        self.assertEqual(ReactionCount.objects.get(blog=self.first).as_dict(), ReactionCount.count_reactions(self.first))
+        self.assertEqual(Notification.objects.filter(recipient=self.author, notification_type='reaction').count(), 1)
+        self.assertEqual(
+            sorted(EngagementEvent.objects.values_list('metric', flat=True)), ['reaction_like', 'reaction_wow']
+        )
+
+    def test_save_reaction_upserts_and_moves_counters(self):
+        self._assert_engine()
+
+    def test_transaction_fallback_matches_upsert(self):
+        from django.db import connection
+
+        with patch('blog.reactions._returning_supported', return_value=False):
+            self._assert_engine()
+
+    def _race_first_reaction(self):
+        from blog import reactions
+
+        # Another request's first reaction, committed after this one's read but before its insert
+        Reaction.objects.create(blog=self.first, user=self.reader, reaction_type='like')
+        read = reactions._lock_reactions
+        reads = []
+
+        def stale_read(user_id, blog_ids):
+            reads.append(set(blog_ids))
+            return {} if len(reads) == 1 else read(user_id, blog_ids)
+
+        with patch('blog.reactions._lock_reactions', side_effect=stale_read):
+            counts = reactions.write_reactions(self.reader.pk, {self.first.pk: 'love'}, {self.first.pk: self.author.pk})
+        self.assertEqual((counts[self.first.pk]['like'], counts[self.first.pk]['love']), (0, 1))
+        self.assertEqual(ReactionCount.objects.get(blog=self.first).as_dict(), ReactionCount.count_reactions(self.first))
+        self.assertEqual(Reaction.objects.get().reaction_type, 'love')
+
+    def test_first_reaction_losing_a_race_counts_once(self):
+        self._race_first_reaction()
+
+    def test_first_reaction_losing_a_race_counts_once_without_returning(self):
+        with patch('blog.reactions._returning_supported', return_value=False):
+            self._race_first_reaction()
+
+    def test_changed_reaction_is_one_update_and_one_counter_update(self):
+        from blog.reactions import write_reactions
+
+        Reaction.objects.create(blog=self.first, user=self.reader, reaction_type='like')
+        # Locked read, UPDATE, counter UPDATE ... RETURNING, engagement insert, plus the savepoint pair
+        with self.assertNumQueries(6):
+            counts = write_reactions(self.reader.pk, {self.first.pk: 'love'}, {self.first.pk: self.author.pk})
+        self.assertEqual((counts[self.first.pk]['like'], counts[self.first.pk]['love']), (0, 1))
+
+    def test_first_reaction_is_one_insert_and_one_counter_update(self):
+        from blog.reactions import write_reactions
+
+        # Locked read, INSERT ... RETURNING, counter UPDATE ... RETURNING, engagement insert, related-posts queue
+        # entry, plus the savepoint pair
+        with self.assertNumQueries(7):
+            counts = write_reactions(self.reader.pk, {self.first.pk: 'love'}, {self.first.pk: self.author.pk})
+        self.assertEqual(counts[self.first.pk]['love'], 1)
+
+    def test_invalidations_are_one_delete_each_after_commit(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from blog.reactions import write_reactions
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            write_reactions(self.reader.pk, {self.first.pk: 'like', self.second.pk: 'wow'},
+                            {self.first.pk: self.author.pk, self.second.pk: self.author.pk})
+        with CaptureQueriesContext(connection) as queries:
+            for callback in callbacks:
+                callback()
+        cache_writes = [query['sql'] for query in queries if 'my_cache_table' in query['sql']]
+        # Analytics, then the author's notification caches; fragment versions live outside the database
+        self.assertEqual(len(cache_writes), 2)
+        self.assertTrue(all(sql.startswith('DELETE') for sql in cache_writes))
+
+    def test_batch_replays_in_order(self):
+        Reaction.objects.create(blog=self.second, user=self.reader, reaction_type='haha')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('save_reactions_batch'), data=json.dumps({'reactions': [
+                {'blog': self.first.slug, 'reaction': 'like'},
+                {'blog': self.second.slug, 'reaction': 'applaud'},
+                {'blog': self.first.slug, 'reaction': 'love'},
+                {'blog': 'gone', 'reaction': 'like'},
+            ]}), content_type='application/json')
+        data = response.json()
+
+        self.assertEqual(data['missing'], ['gone'])
+        self.assertEqual(data['results'][self.first.slug]['current_reaction'], 'love')
+        self.assertEqual(data['results'][self.first.slug]['reaction_summary']['love'], 1)
+        self.assertEqual(data['results'][self.second.slug]['reaction_summary']['haha'], 0)
+        self.assertEqual(
+            dict(Reaction.objects.filter(user=self.reader).values_list('blog_id', 'reaction_type')),
+            {self.first.pk: 'love', self.second.pk: 'applaud'},
+        )
+        self.assertEqual(Notification.objects.filter(notification_type='reaction').count(), 1)  # First only
+
+    def test_batch_rejects_invalid_payloads(self):
+        url = reverse('save_reactions_batch')
+        for payload in ({'reactions': 'like'}, {'reactions': [{'blog': self.first.slug, 'reaction': 'meh'}]},
+                        {'reactions': [{'blog': self.first.slug, 'reaction': 'like'}] * 101}):
+            response = self.client.post(url, data=json.dumps(payload), content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+        self.assertFalse(Reaction.objects.exists())
+
+
+# Test the session-free read deduplication
+class ReadDedupTests(TestCase):
+
+    def setUp(self):
+        from django.core.cache import caches
+
+        caches['read_dedup'].clear()
+        caches['fragments'].clear()
+        self.author = User.objects.create_user(username='author', email='author@example.com', password='password')
+        self.reader = User.objects.create_user(username='reader', email='reader@example.com', password='password')
+        self.blog = Blog.objects.create(title='Deduped', content='Body', author=self.author, status=1)
+
+    def test_repeat_views_count_once_without_session_writes(self):
+        url = reverse('blog_detail', kwargs={'slug': self.blog.slug})
+        self.client.login(username='reader@example.com', password='password')
+        with patch('blog.views.record_read') as record_read:
+            self.client.get(url)
+            self.client.get(url)
+            self.client.login(username='author@example.com', password='password')
+            self.client.get(url)  # Authors never count
+        self.assertEqual(record_read.call_count, 1)
+        self.assertFalse([key for key in self.client.session.keys() if key.startswith('viewed_')])
+
+    def test_views_expire_with_their_bucket(self):
+        from blog.read_dedup import first_read
+
+        with self.settings(READ_DEDUP_WINDOW=100):
+            self.assertTrue(first_read(self.reader.pk, self.blog.pk, now=1000))
+            self.assertFalse(first_read(self.reader.pk, self.blog.pk, now=1050))
+            self.assertFalse(first_read(self.reader.pk, self.blog.pk, now=1150))  # Found in the previous bucket
+            self.assertTrue(first_read(self.reader.pk, self.blog.pk + 1, now=1150))
+            self.assertTrue(first_read(self.author.pk, self.blog.pk, now=1150))
+            self.assertTrue(first_read(self.reader.pk, self.blog.pk, now=1200))  # Two buckets later
+
+    def test_redis_filters_use_one_pipeline(self):
+        from unittest import mock
+        from blog.read_dedup import BLOOM_HASHES, first_read
+
+        client = mock.Mock()
+        pipeline = client.pipeline.return_value
+        pipeline.execute.side_effect = [[0] * 2 * BLOOM_HASHES + [True], [1] * BLOOM_HASHES + [0] * BLOOM_HASHES + [True]]
+        with self.settings(READ_DEDUP_WINDOW=100), patch('blog.read_dedup._dedup_redis', return_value=client):
+            self.assertTrue(first_read(self.reader.pk, self.blog.pk, now=1000))
+            self.assertFalse(first_read(self.reader.pk, self.blog.pk, now=1050))
+        pipeline.expire.assert_called_with(f'read_dedup:read_seen_{self.reader.pk}_10', 200)
+        self.assertEqual(pipeline.setbit.call_count, 2 * BLOOM_HASHES)
+
+    def test_deploy_check_requires_shared_store(self):
+        from blog.checks import check_read_dedup_store
+
+        with self.settings(READ_DEDUP_REDIS_URL=None):
+            self.assertEqual([error.id for error in check_read_dedup_store(None)], ['blog.E001'])
+        with self.settings(READ_DEDUP_REDIS_URL='redis://localhost:6379/2'):
+            self.assertEqual(check_read_dedup_store(None), [])
@@ -0,0 +1,175 @@
+# blog/timeline.py
+
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.db.models import Count, Q
+from django.utils.dateparse import parse_datetime
+
+from .models import Blog, Follow, TimelineEntry
+from .pagination import KeysetPage
+
+TIMELINE_PAGE_SIZE = 10
+FANOUT_BATCH_SIZE = 1000
+
+
+def _fanout_limit():
+    # Authors with more followers than this are merged into timelines on read instead
+    return getattr(settings, 'TIMELINE_FANOUT_LIMIT', 5000)
+
+
+def _max_entries():
+    return getattr(settings, 'TIMELINE_MAX_ENTRIES', 500)
+
+
+def _follow_backfill():
+    # How many recent posts of a newly followed author are copied into the follower's timeline
+    return getattr(settings, 'TIMELINE_FOLLOW_BACKFILL', 20)
+
+
+def fan_out_post(blog_id):
+    """
+    Delivers a newly published post to the timelines of its author's
+    followers, in batches of FANOUT_BATCH_SIZE rows. Posts of authors with
+    more than TIMELINE_FANOUT_LIMIT followers are flagged for fan-out on
+    read instead. Returns how many timelines were written.
+    """
+    blog = Blog.objects.published().filter(pk=blog_id).only('id', 'author_id', 'published_at').first()
+    if blog is None:
+        return 0
+
+    followers = Follow.objects.filter(followee_id=blog.author_id)
+    # Counting stops past the limit, so a celebrity's follower index is never fully scanned here
+    if followers[:_fanout_limit() + 1].count() > _fanout_limit():
+        Blog.objects.filter(pk=blog.pk).update(timeline_pull=True)
+        return 0
+
+    delivered = 0
+    batch = []
+    for follower_id in followers.values_list('follower_id', flat=True).iterator(chunk_size=FANOUT_BATCH_SIZE):
+        batch.append(TimelineEntry(
+            user_id=follower_id, blog_id=blog.pk, author_id=blog.author_id, published_at=blog.published_at
+        ))
+        if len(batch) >= FANOUT_BATCH_SIZE:
+            delivered += len(TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True))
+            batch = []
+    if batch:
+        delivered += len(TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True))
+    return delivered
+
+
+def remove_post_from_timelines(blog_id):
+    """Takes an unpublished post out of every timeline it was delivered to."""
+    return TimelineEntry.objects.filter(blog_id=blog_id).delete()[0]
+
+
+def backfill_timeline(user_id, author_id):
+    """
+    Copies the latest posts of a newly followed author into the follower's
+    timeline, so following someone is not followed by an empty feed.
+    """
+    posts = (
+        Blog.objects.published()
+                    .filter(author_id=author_id, timeline_pull=False, published_at__isnull=False)
+                    .order_by('-published_at')
+                    .values_list('pk', 'published_at')[:_follow_backfill()]
+    )
+    return len(TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, blog_id=blog_id, author_id=author_id, published_at=published_at)
+            for blog_id, published_at in posts
+        ],
+        ignore_conflicts=True,
+    ))
+
+
+def remove_author_from_timeline(user_id, author_id):
+    """Drops an unfollowed author's posts from the former follower's timeline."""
+    return TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()[0]
+
+
+def trim_timelines(max_entries=None):
+    """
+    Deletes everything but the newest max_entries entries of each timeline
+    over the cap. Returns how many entries were deleted.
+    """
+    max_entries = _max_entries() if max_entries is None else max_entries
+    over_cap = (
+        TimelineEntry.objects.values('user_id')
+                             .annotate(entries=Count('id'))
+                             .filter(entries__gt=max_entries)
+                             .values_list('user_id', flat=True)
+    )
+    deleted = 0
+    for user_id in over_cap:
+        entries = TimelineEntry.objects.filter(user_id=user_id)
+        # The newest entry past the cap; it and everything older go
+        published_at, blog_id = entries.order_by('-published_at', '-blog_id').values_list(
+            'published_at', 'blog_id'
+        )[max_entries]
+        deleted += entries.filter(
+            Q(published_at__lt=published_at) | Q(published_at=published_at, blog_id__lte=blog_id)
+        ).delete()[0]
+    return deleted
+
+
+def encode_timeline_cursor(published_at, blog_id):
+    payload = json.dumps([published_at.isoformat(), blog_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_timeline_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        published_at, blog_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        published_at = parse_datetime(published_at)
+    except (binascii.Error, ValueError, TypeError, json.JSONDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    if published_at is None or not isinstance(blog_id, int):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return published_at, blog_id
+
+
+def timeline_page(user_id, cursor=None, per_page=TIMELINE_PAGE_SIZE, posts=None):
+    """
+    One page of a user's following timeline, newest first.
+
+    Merges the user's delivered entries with the posts of followed authors
+    that were too widely followed to fan out, each side fetched with one
+    keyset query, then loads the page's posts from `posts` (listing cards
+    by default). A missing or invalid cursor yields the first page; pages
+    only link forward.
+    """
+    position = None
+    if cursor:
+        try:
+            position = decode_timeline_cursor(cursor)
+        except ValueError:
+            position = None
+
+    def older(queryset, blog_field):
+        if position is None:
+            return queryset
+        published_at, blog_id = position
+        return queryset.filter(
+            Q(published_at__lt=published_at) | Q(**{'published_at': published_at, f'{blog_field}__lt': blog_id})
+        )
+
+    delivered = older(TimelineEntry.objects.filter(user_id=user_id), 'blog_id') \
+        .order_by('-published_at', '-blog_id').values_list('published_at', 'blog_id')[:per_page + 1]
+    pulled = older(
+        Blog.objects.published().filter(timeline_pull=True, author__followers__follower_id=user_id), 'pk'
+    ).order_by('-published_at', '-pk').values_list('published_at', 'pk')[:per_page + 1]
+
+    # A post can come from both sides if its author crossed the fan-out limit; keep one copy
+    keys = sorted({blog_id: (published_at, blog_id) for published_at, blog_id in [*delivered, *pulled]}.values(),
+                  reverse=True)
+    has_next = len(keys) > per_page
+    keys = keys[:per_page]
+
+    queryset = Blog.objects.cards() if posts is None else posts
+    cards = queryset.published().in_bulk([blog_id for _, blog_id in keys])
+    posts = [cards[blog_id] for _, blog_id in keys if blog_id in cards]
+    return KeysetPage(posts, next_cursor=encode_timeline_cursor(*keys[-1]) if has_next else None)
@@ -5,8 +5,11 @@ from . import views
 urlpatterns = [
     path('blog/<slug:slug>/', views.blog_detail, name='blog_detail'),
     path('blog/<slug:slug>/save_reaction/', views.save_reaction, name='save_reaction'),
+    path('reactions/batch/', views.save_reactions_batch, name='save_reactions_batch'),
     # path('<slug:slug>/comment/', views.add_comment, name='add_comment'),
-    path('mark-as-read/<slug:slug>/', views.mark_as_read, name='mark_as_read'),
+    path('mark-as-read/<slug:slug>/', views.mark_blog_as_read, name='mark_blog_as_read'),
+    path('read-counts/stats/', views.read_count_stats, name='read_count_stats'),
+    path('fragments/stats/', views.fragment_cache_stats, name='fragment_cache_stats'),
 
     
     path('create/', views.create_blog, name='create_blog'),
@@ -16,12 +19,14 @@ urlpatterns = [
 
     
     path('blogs', views.blog_list, name='blogs'),
+    path('following/', views.following_feed, name='following'),
     path('search/', views.search, name='search'),
 
 
     #path('follow/<int:user_id>/', views.follow_user, name='follow_user'),
     path('notifications/', views.notification_list, name='notification_list'),
     path('notifications/<int:notification_id>/read/', views.mark_as_read, name='mark_as_read'),
+    path('notifications/context-stats/', views.notification_stats, name='notification_stats'),
 
     # Other URLs...
     path('toggle-follow/<int:user_id>/', views.toggle_follow, name='toggle_follow'),
@@ -1,46 +1,122 @@
 from .models import Notification
-from django.utils.timezone import now
+from django.core.cache import caches
+from django.conf import settings
+from collections import Counter
+
+UNREAD_COUNT_CACHE_KEY = "notifications:unread:{user_id}"
+UNREAD_COUNT_CACHE_TIMEOUT = 60 * 60  # 1 hour
+
+# How often the unread count was served from the cache versus counted in the database
+unread_count_stats = Counter()
+
+
+def _notification_cache():
+    return caches[getattr(settings, 'NOTIFICATION_CACHE_ALIAS', 'default')]
+
+
+def get_unread_notifications_count(user_id):
+    """
+    Returns the unread notification count of a user, served from a per-user cache entry.
+    """
+    cache = _notification_cache()
+    key = UNREAD_COUNT_CACHE_KEY.format(user_id=user_id)
+    count = cache.get(key)
+    if count is not None:
+        unread_count_stats['cache_hits'] += 1
+        return count
+
+    count = Notification.objects.filter(recipient_id=user_id, is_read=False).count()
+    unread_count_stats['count_queries'] += 1
+    cache.set(key, count, UNREAD_COUNT_CACHE_TIMEOUT)
+    return count
+
+
+def increment_unread_notifications_count(user_id, delta=1):
+    """
+    Bumps a cached unread count in place. A missing entry is simply recomputed on the next read.
+    """
+    try:
+        _notification_cache().incr(UNREAD_COUNT_CACHE_KEY.format(user_id=user_id), delta)
+    except ValueError:
+        pass
+
+
+LATEST_NOTIFICATION_CACHE_KEY = "notifications:latest:{user_id}"
+
+
+def set_latest_notification_id(user_id, notification_id):
+    """
+    Records the newest notification id of a user, so streaming clients can
+    check for news without querying the Notification table.
+    """
+    _notification_cache().set(
+        LATEST_NOTIFICATION_CACHE_KEY.format(user_id=user_id), notification_id, UNREAD_COUNT_CACHE_TIMEOUT
+    )
+
+
+def forget_latest_notification_id(user_id):
+    """Drops the recorded latest id when it is unknown, e.g. after a bulk insert."""
+    _notification_cache().delete(LATEST_NOTIFICATION_CACHE_KEY.format(user_id=user_id))
+
+
+def forget_notification_caches(user_ids):
+    """
+    Drops the cached unread counts and latest ids of several users with one
+    delete_many, for writes that do not know the new values (bulk inserts).
+    """
+    _notification_cache().delete_many([
+        key.format(user_id=user_id)
+        for user_id in user_ids
+        for key in (UNREAD_COUNT_CACHE_KEY, LATEST_NOTIFICATION_CACHE_KEY)
+    ])
+
+
+async def aget_latest_notification_id(user_id):
+    """Async counterpart used by the notification stream; None means unknown."""
+    return await _notification_cache().aget(LATEST_NOTIFICATION_CACHE_KEY.format(user_id=user_id))
+
+
+async def aseed_latest_notification_id(user_id, notification_id):
+    """Stores a known latest id unless a newer notification already recorded one."""
+    await _notification_cache().aadd(
+        LATEST_NOTIFICATION_CACHE_KEY.format(user_id=user_id), notification_id, UNREAD_COUNT_CACHE_TIMEOUT
+    )
+
+
+def reset_unread_notifications_count(user_id, count=None):
+    """
+    Sets the cached unread count of a user, or drops it when the new value is unknown.
+    """
+    cache = _notification_cache()
+    key = UNREAD_COUNT_CACHE_KEY.format(user_id=user_id)
+    if count is None:
+        cache.delete(key)
+    else:
+        cache.set(key, count, UNREAD_COUNT_CACHE_TIMEOUT)
+
 
 def create_reaction_notification(sender, recipient, blog):
     """
     Creates a notification when a user reacts to a blog post.
     """
-    if sender != recipient:  # Prevent self-notifications
-        Notification.objects.create(
-            recipient=recipient,
-            sender=sender,
-            notification_type='reaction',
-            blog=blog,
-            created_at=now()
-        )
+    from .notification_dispatcher import dispatcher
+    dispatcher.dispatch('reaction', recipient=recipient, sender=sender, blog=blog)
 
 
 def create_comment_notification(sender, recipient, comment):
     """
     Creates a notification when a user comments on a blog post.
     """
-    if sender != recipient:  # Prevent self-notifications
-        Notification.objects.create(
-            recipient=recipient,
-            sender=sender,
-            notification_type='comment',
-            comment=comment,
-            blog=comment.blog,
-            created_at=now()
-        )
+    from .notification_dispatcher import dispatcher
+    dispatcher.dispatch('comment', recipient=recipient, sender=sender, blog=comment.blog_id, comment=comment)
 
 
 def create_follow_notification(sender, recipient):
     """
     Creates a notification when a user follows another user.
     """
-    if sender != recipient:  # Prevent self-notifications
-        Notification.objects.create(
-            recipient=recipient,
-            sender=sender,
-            notification_type='follow',
-            created_at=now()
-        )
+    from .notification_dispatcher import dispatcher
+    dispatcher.dispatch('follow', recipient=recipient, sender=sender)
 
 
 def delete_follow_notification(sender, recipient):
@@ -1,5 +1,5 @@
 from django.shortcuts import redirect, get_object_or_404, render
-from django.contrib.auth.decorators import login_required
+from django.contrib.auth.decorators import login_required, user_passes_test
 from .models import *
 from .forms import *
 from django.http import JsonResponse, HttpResponseRedirect
@@ -11,12 +11,24 @@ from django.views.decorators.csrf import csrf_protect
 from django.core.serializers.json import DjangoJSONEncoder
 from django.urls import reverse
 from .util import *
+from .read_counts import read_buffer, record_read
+from .read_dedup import first_read
+from .pagination import KeysetPaginator
+from .related import related_posts
+from .reactions import REACTION_BATCH_LIMIT, write_reactions
+from .timeline import timeline_page
+from .fragment_cache import BlogFragmentCache, blog_fragment_stats
+from .context_processors import notification_context_stats
 import logging
-from .util import create_follow_notification, delete_follow_notification
+from .util import delete_follow_notification
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
+# Rather than the admin's staff_member_required, whose import loads the whole admin and whose
+# redirect needs its login page, neither of which the lean settings profile has
+staff_member_required = user_passes_test(lambda user: user.is_active and user.is_staff)
+
 # Set up logging
 logger = logging.getLogger(__name__)
 
@@ -101,13 +113,25 @@ def delete_blog(request, slug):
 # View to list all published blog posts
 @login_required
 def blog_list(request):
-    blogs = Blog.objects.filter(status=1)  # Only show published blogs
-    paginator = Paginator(blogs, 5)  # Show 5 blogs per page
+    blogs = Blog.objects.published().cards()  # Only show published blogs
+    paginator = KeysetPaginator(blogs, 5)  # Show 5 blogs per page
+
+    cursor = request.GET.get('cursor')  # Opaque position from the previous/next links
+    page_obj = paginator.get_page(cursor)  # Get the page for that position, no COUNT needed
+
+    # blogs.html iterates and paginates `blogs`, so hand it the page rather than every blog
+    return render(request, 'blog/blogs.html', {'page_obj': page_obj, 'blogs': page_obj})
 
-    page_number = request.GET.get('page')  # Get the current page number from query parameters
-    page_obj = paginator.get_page(page_number)  # Get the page object for the current page
 
-    return render(request, 'blog/blogs.html', {'page_obj': page_obj, 'blogs':blogs})
+@login_required
+def following_feed(request):
+    # New posts of the authors the user follows, newest first; pages only link forward
+    page_obj = timeline_page(request.user.pk, request.GET.get('cursor'))
+    return render(request, 'blog/blogs.html', {
+        'page_obj': page_obj,
+        'blogs': page_obj,
+        'page_title': 'From Authors You Follow',
+    })
 
     
 @login_required
@@ -115,15 +139,14 @@ def blog_detail(request, slug):
     print(f"DEBUG: Entering blog_detail view with slug: {slug}")
 
     # Retrieve the blog by slug
-    blog = get_object_or_404(Blog, slug=slug)
+    blog = get_object_or_404(Blog.objects.select_related('reaction_counts', 'author__profile'), slug=slug)
     print(f"DEBUG: Retrieved blog '{blog.title}' (ID: {blog.id}) by {blog.author}")
 
-    # Track views
-    if not request.session.get(f"viewed_{slug}", False) and request.user != blog.author:
-        blog.read_count += 1
-        blog.save()
-        request.session[f"viewed_{slug}"] = True
-        print(f"DEBUG: Incremented read count for blog '{blog.title}'. New count: {blog.read_count}")
+    # Track views; repeat views are filtered in the cache, never in the session
+    if request.user.pk != blog.author_id and first_read(request.user.pk, blog.pk):
+        record_read(blog)
+        blog.read_count += 1  # Buffered write; reflect it in this response only
+        print(f"DEBUG: Buffered read for blog '{blog.title}'. New count: {blog.read_count}")
 
     # Handle comment submission
     if request.method == 'POST':
@@ -138,18 +161,12 @@ def blog_detail(request, slug):
                 author=request.user,
                 content=comment_body,
             )
-            print("DEBUG: Comment created successfully")
-
-            # Get the author of the blog (recipient of the comment notification)
-            recipient = blog.author  # Assuming the blog's author should receive the notification
-
-            # Create a comment notification for the blog author
-            create_comment_notification(sender=request.user, recipient=recipient, comment=comment)
+            print("DEBUG: Comment created successfully")  # The Comment signal notifies the blog author
 
             return HttpResponseRedirect(request.path_info)  # Redirect to the same page
 
     # Get reaction summary counts for each reaction type
-    reactions_summary = {reaction_type: blog.get_reaction_count(reaction_type) for reaction_type in REACTION_CHOICES}
+    reactions_summary = blog.get_reaction_counts()
     print(f"DEBUG: Reactions summary: {reactions_summary}")
 
     # Get the user's current reaction
@@ -159,16 +176,20 @@ def blog_detail(request, slug):
         current_reaction = user_reaction.reaction_type if user_reaction else None
         print(f"DEBUG: Current reaction by user '{request.user.username}': {current_reaction}")
 
-    # Render the template
+    # Render the template; the shared parts come from the fragment cache when current
     print(f"DEBUG: Rendering blog_detail template for blog '{blog.title}'")
-    return render(request, 'blog/blog_detail.html', {
+    fragments = BlogFragmentCache(blog.pk)
+    response = render(request, 'blog/blog_detail.html', {
         'blog': blog,
+        'comments': blog.comments.select_related('author__profile'),  # Only evaluated on a cache miss
         'reactions_summary': reactions_summary,
         'current_reaction': current_reaction,
         'slug': slug,
+        'blog_fragments': fragments,
+        'related_posts': related_posts(blog.pk),  # Precomputed; only evaluated on a cache miss
     })
-
-from .util import create_reaction_notification
+    fragments.save()
+    return response
 
 REACTION_CHOICES = ['like', 'love', 'haha', 'wow', 'applaud']
 
@@ -180,7 +201,7 @@ def save_reaction(request, slug):
     if request.method == 'POST':
         try:
             # Get the blog by slug
-            blog = get_object_or_404(Blog, slug=slug)
+            blog = get_object_or_404(Blog.objects.only('id', 'title', 'author_id'), slug=slug)
             print(f"DEBUG: Retrieved blog '{blog.title}' (ID: {blog.id}) for reaction update")
             
             # Parse the request body
@@ -193,39 +214,16 @@ def save_reaction(request, slug):
                 print(f"DEBUG: Invalid reaction type: {reaction_type}")
                 return JsonResponse({'success': False, 'message': 'Invalid reaction type'})
 
-            # Check if the user has already reacted to the blog
-            existing_reaction = blog.reactions.filter(user=request.user).first()
-        
-            if existing_reaction:
-                # If the user has reacted with a different reaction type, update their reaction
-                if existing_reaction.reaction_type != reaction_type:
-                    existing_reaction.reaction_type = reaction_type
-                    existing_reaction.save()
-                    print(f"DEBUG: Updated existing reaction to '{reaction_type}'")
-                # If the user has already reacted with the same reaction type, do nothing
-                else:
-                    print(f"DEBUG: User already reacted with '{reaction_type}', no update needed")
-            else:
-                # If the user hasn't reacted yet, create a new reaction
-                blog.reactions.create(user=request.user, reaction_type=reaction_type)
-                print(f"DEBUG: Created new reaction '{reaction_type}' for user {request.user.username}")
-
-                # Create a notification for the blog's author (recipient)
-                create_reaction_notification(sender=request.user, recipient=blog.author, blog=blog)
-                print(f"DEBUG: Notification created for user {blog.author.username}")
-
-            # Get updated reaction counts
-            reactions_summary = {reaction: blog.reactions.filter(reaction_type=reaction).count() for reaction in REACTION_CHOICES}
+            # Upsert the reaction; the counts come back from the counter row it moved
+            counts = write_reactions(request.user.pk, {blog.pk: reaction_type}, {blog.pk: blog.author_id})
+            reactions_summary = counts[blog.pk]
             print(f"DEBUG: Updated reaction summary: {reactions_summary}")
 
-            # Get current reaction for the user
-            current_reaction = blog.reactions.filter(user=request.user).first().reaction_type if existing_reaction else reaction_type
-
             # Return the updated data
             return JsonResponse({
                 'success': True,
                 'reaction_summary': reactions_summary,
-                'current_reaction': current_reaction
+                'current_reaction': reaction_type
             })
 
         except Exception as e:
@@ -235,19 +233,90 @@ def save_reaction(request, slug):
     return JsonResponse({'success': False, 'message': 'Invalid request method'})
 
 @login_required
-def mark_as_read(request, slug):
+def save_reactions_batch(request):
+    """
+    Replays reactions queued by a client while offline, as a JSON body
+    {"reactions": [{"blog": slug, "reaction": type}, ...]} applied in order,
+    so the last entry for a post wins. Returns the final reaction and counts
+    of every post; unknown posts are listed under "missing".
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'message': 'Invalid request method'}, status=405)
+    try:
+        entries = json.loads(request.body).get('reactions')
+    except (ValueError, AttributeError):
+        entries = None
+    if not isinstance(entries, list) or not all(isinstance(entry, dict) for entry in entries):
+        return JsonResponse({'success': False, 'message': 'Expected a list of reactions'}, status=400)
+    if len(entries) > REACTION_BATCH_LIMIT:
+        return JsonResponse(
+            {'success': False, 'message': f'At most {REACTION_BATCH_LIMIT} reactions per batch'}, status=400
+        )
+
+    latest = {}
+    for entry in entries:
+        if entry.get('reaction') not in REACTION_CHOICES or not isinstance(entry.get('blog'), str):
+            return JsonResponse({'success': False, 'message': f'Invalid reaction: {entry}'}, status=400)
+        latest[entry['blog']] = entry['reaction']
+
+    blogs = {
+        slug: (blog_id, author_id)
+        for blog_id, slug, author_id in Blog.objects.filter(slug__in=latest).values_list('id', 'slug', 'author_id')
+    }
+    counts = write_reactions(
+        request.user.pk,
+        {blog_id: latest[slug] for slug, (blog_id, _) in blogs.items()},
+        {blog_id: author_id for blog_id, author_id in blogs.values()},
+    ) if blogs else {}
+    return JsonResponse({
+        'success': True,
+        'results': {
+            slug: {'current_reaction': latest[slug], 'reaction_summary': counts[blog_id]}
+            for slug, (blog_id, _) in blogs.items()
+        },
+        'missing': [slug for slug in latest if slug not in blogs],
+    })
+
+@login_required
+def mark_blog_as_read(request, slug):
     if request.method == "POST":
-        blog = get_object_or_404(Blog, slug=slug)
-        blog.read_count += 1
-        blog.save()
-        return JsonResponse({'success': True})
+        blog = get_object_or_404(Blog.objects.only('id', 'author_id'), slug=slug)
+        # blog_detail usually counted this view already; the same dedup keeps the beacon from counting it twice
+        counted = request.user.pk != blog.author_id and first_read(request.user.pk, blog.pk)
+        if counted:
+            record_read(blog)
+        return JsonResponse({'success': True, 'counted': counted})
     return JsonResponse({'success': False}, status=400)
 
+@staff_member_required
+def read_count_stats(request):
+    """
+    Exposes the read-count buffer counters of the worker serving the request.
+    """
+    return JsonResponse(read_buffer.stats())
+
+@staff_member_required
+def notification_stats(request):
+    """
+    Reports how many unread-count queries the notification context processor saved.
+    """
+    return JsonResponse(notification_context_stats())
+
+@staff_member_required
+def fragment_cache_stats(request):
+    """
+    Exposes the blog_detail fragment cache hit/miss counters of the worker serving the request.
+    """
+    return JsonResponse(blog_fragment_stats())
+
+NOTIFICATIONS_PER_PAGE = 20
+
 # View to list all notifications for the current user
 @login_required
 def notification_list(request):
-    notifications = request.user.notifications.all()  # Get all notifications for the logged-in user
-    return render(request, 'blog/notification_list.html', {'notifications': notifications})
+    notifications = request.user.notifications.select_related('sender', 'blog', 'comment')  # Notifications for the logged-in user
+    page_obj = KeysetPaginator(notifications, NOTIFICATIONS_PER_PAGE).get_page(request.GET.get('cursor'))
+    return render(request, 'blog/notification_list.html', {'notifications': page_obj, 'page_obj': page_obj})
 
 
 # View to mark a notification as read
@@ -266,9 +335,8 @@ def toggle_follow(request, user_id):
     if request.user != author:  # Prevent users from following/unfollowing themselves
         follow, created = Follow.objects.get_or_create(follower=request.user, followee=author)
         if created:
-            # If the follow was just created, send a notification to the followed user
-            create_follow_notification(sender=request.user, recipient=author)
-            print(f"DEBUG: Follow notification created for user {author.username}")
+            # The Follow signal sends a notification to the followed user
+            print(f"DEBUG: User {request.user.username} followed {author.username}")
         else:
             # If the follow already exists, delete it (unfollow)
             follow.delete()
@@ -277,31 +345,34 @@ def toggle_follow(request, user_id):
     
     return redirect('profile', username=author.username)
 
-from django.shortcuts import render
 from django.db.models import Q
-from .models import Blog
+from .search import search_blogs
 from users.models import CustomUser
 
+SEARCH_RESULTS_PER_PAGE = 10
+SEARCH_AUTHORS_LIMIT = 10
+
 @login_required
 def search(request):
-    query = request.GET.get('q', '')
-    blogs = Blog.objects.none()
+    query = request.GET.get('q', '').strip()
+    page_obj = None
     authors = CustomUser.objects.none()
 
     if query:
-        blogs = Blog.objects.filter(
-            Q(title__icontains=query) | Q(content__icontains=query)
-        )
+        # Ranked full-text match over published blogs only
+        page_obj = Paginator(search_blogs(query).cards(), SEARCH_RESULTS_PER_PAGE).get_page(request.GET.get('page'))
+
+        # Prefix matches can use the column indexes, unlike a leading-wildcard icontains
         authors = CustomUser.objects.filter(
-            Q(username__icontains=query) | 
-            Q(email__icontains=query) | 
-            Q(profile__first_name__icontains=query) | 
-            Q(profile__last_name__icontains=query)
-        )
+            Q(username__istartswith=query) |
+            Q(email__iexact=query) |
+            Q(profile__first_name__istartswith=query) |
+            Q(profile__last_name__istartswith=query)
+        ).select_related('profile')[:SEARCH_AUTHORS_LIMIT]
 
     context = {
         'query': query,
-        'blogs': blogs,
+        'blogs': page_obj,
         'authors': authors,
     }
     return render(request, 'blog/search_results.html', context)
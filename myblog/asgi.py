@@ -3,6 +3,10 @@ ASGI config for myblog project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serving through this entry point (e.g. ``daphne myblog.asgi:application``)
+enables the Server-Sent Events notification stream at
+``/users/notifications/stream``; WSGI deployments fall back to polling.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
@@ -0,0 +1,22 @@
+# myblog/cache.py
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.locmem import LocMemCache
+
+
+class BoundedLocMemCache(LocMemCache):
+    """
+    Process-local cache whose entries never outlive the configured TIMEOUT,
+    even when a caller asks for longer or for no expiry.
+
+    Used as the local tier of cached_db sessions when they are chosen without
+    SESSION_REDIS_URL: Django caches a session for its whole lifetime, and a
+    copy in one worker's memory is not invalidated by a logout served by
+    another worker, so the cap bounds that staleness.
+    """
+
+    def get_backend_timeout(self, timeout=DEFAULT_TIMEOUT):
+        cap = self.default_timeout
+        if timeout is DEFAULT_TIMEOUT or timeout is None:
+            return super().get_backend_timeout(cap)
+        return super().get_backend_timeout(min(timeout, cap))
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+
+class LoopingCommand(BaseCommand):
+    """
+    A maintenance command that runs once, or keeps running with --loop.
+
+    Subclasses implement run_once(**options), one pass of the work. A pass
+    that returns a true value has more work waiting and is followed by
+    another at once; otherwise the command exits, or with --loop calls
+    idle(**options) and sleeps --interval seconds before the next pass.
+    Ctrl-C stops the loop cleanly.
+    """
+    interval = 60  # Default of --interval
+    loop_help = 'Keep running instead of exiting once done'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help=self.loop_help)
+        parser.add_argument('--interval', type=float, default=self.interval, help='Seconds between passes with --loop')
+
+    def run_once(self, **options):
+        raise NotImplementedError('subclasses of LoopingCommand must provide a run_once() method')
+
+    def idle(self, **options):
+        """Called with --loop before sleeping between passes."""
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                if self.run_once(**options):
+                    continue
+                if not options['loop']:
+                    break
+                self.idle(**options)
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,64 @@
+import json
+import os
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from myblog.startup import STARTUP_PHASES, profile_startup
+
+
+class Command(BaseCommand):
+    help = (
+        'Profile a cold worker start in fresh interpreters: time per startup phase up to the first '
+        'response, and the costliest imports, for one or more settings modules'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--module', action='append',
+            help='Settings module to profile (repeatable); defaults to DJANGO_SETTINGS_MODULE',
+        )
+        parser.add_argument('--path', default='/users/login/', help='Path of the first request')
+        parser.add_argument('--runs', type=int, default=5, help='Timed starts per module; medians are reported')
+        parser.add_argument('--limit', type=int, default=15, help='Imports and packages listed per module')
+        parser.add_argument('--output', help='Also write the results to this JSON file')
+
+    def handle(self, *args, **options):
+        modules = options['module'] or [os.environ['DJANGO_SETTINGS_MODULE']]
+        results = []
+        for module in modules:
+            try:
+                results.append(profile_startup(module, options['path'], options['runs'], limit=options['limit']))
+            except RuntimeError as e:
+                raise CommandError(str(e))
+
+        for result in results:
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"{result['settings_module']}: GET {result['path']} -> {result['status']} "
+                f"(median of {result['runs']} starts)"
+            ))
+            previous = 0
+            for phase in STARTUP_PHASES:
+                at = result['phases_ms'][phase]
+                self.stdout.write(f'  {phase:<16}{at:>10.1f} ms  (+{at - previous:.1f})')
+                previous = at
+            self.stdout.write(f"  {'whole process':<16}{result['process_ms']:>10.1f} ms")
+            imports = result['imports']
+            self.stdout.write(f"  Imports: {imports['total_ms']:.1f} ms under -X importtime; costliest top-level:")
+            for name, ms in imports['roots']:
+                self.stdout.write(f'    {name:<56}{ms:>9.1f} ms')
+            self.stdout.write('  Self time by package:')
+            for name, ms in imports['packages']:
+                self.stdout.write(f'    {name:<56}{ms:>9.1f} ms')
+
+        if len(results) > 1:
+            base = results[0]
+            for result in results[1:]:
+                saved = base['phases_ms']['first_response'] - result['phases_ms']['first_response']
+                self.stdout.write(self.style.SUCCESS(
+                    f"{result['settings_module']} reaches its first response {saved:.1f} ms sooner "
+                    f"than {base['settings_module']}"
+                ))
+
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(results, indent=2) + '\n')
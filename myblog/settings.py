@@ -1,9 +1,10 @@
 from pathlib import Path
 import os
+import dj_database_url
 from dotenv import load_dotenv
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
-load_dotenv()
+load_dotenv(BASE_DIR / '.env')  # An explicit path skips python-dotenv's search up the call stack
 APP_NAME = "Bloggy"
 
 AUTH_USER_MODEL = 'users.CustomUser'
@@ -39,6 +40,7 @@ INSTALLED_APPS = [
     #My Apps
     'blog',
     'users',
+    'myblog',  # Management commands only (profile_startup)
 
     
     'django_recaptcha',
@@ -98,8 +100,97 @@ CACHES = {
     "default": {
         "BACKEND": "django.core.cache.backends.db.DatabaseCache",
         "LOCATION": "my_cache_table",
+    },
+    # Cache tier of cached_db sessions; SESSION_REDIS_URL shares it across workers and makes cached_db the default
+    "sessions": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.getenv('SESSION_REDIS_URL'),
+    } if os.getenv('SESSION_REDIS_URL') else {
+        "BACKEND": "myblog.cache.BoundedLocMemCache",
+        "LOCATION": "sessions",
+        "TIMEOUT": 60,  # Bounds how long another worker may still see a session after logout
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+    # Per-user Bloom filters of blog/read_dedup.py when READ_DEDUP_REDIS_URL is unset: a single
+    # development process only, since each worker would count a read once (see READ_DEDUP_REDIS_URL)
+    "read_dedup": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "read_dedup",
+        "OPTIONS": {"MAX_ENTRIES": 20000},  # 512 bytes each, about 10 MB per worker
+    },
+    # Rendered blog_detail fragments and their versions (see blog/fragment_cache.py), never the database,
+    # which would cost a query per lookup and per write. Every worker must see an invalidation, so a
+    # shared Redis (BLOG_FRAGMENT_REDIS_URL) across hosts, otherwise files shared by the host's workers
+    "fragments": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.getenv('BLOG_FRAGMENT_REDIS_URL'),
+    } if os.getenv('BLOG_FRAGMENT_REDIS_URL') else {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.getenv('BLOG_FRAGMENT_CACHE_DIR', str(BASE_DIR / '.cache' / 'fragments')),
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+}
+READ_DEDUP_CACHE_ALIAS = "read_dedup"
+BLOG_FRAGMENT_CACHE_ALIAS = "fragments"
+
+# Unread counts and latest notification ids (see blog/util.py) must be shared by every worker, so they
+# stay in the database cache unless NOTIFICATION_REDIS_URL provides a shared one
+if os.getenv('NOTIFICATION_REDIS_URL'):
+    CACHES["notifications"] = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.getenv('NOTIFICATION_REDIS_URL'),
     }
+NOTIFICATION_CACHE_ALIAS = "notifications" if os.getenv('NOTIFICATION_REDIS_URL') else "default"
+
+# Counters of users.ratelimit must be shared by every worker, and incremented atomically: a per-process
+# cache would multiply each limit by the number of workers, and the database cache's incr is a get and
+# a set that can lose concurrent hits. Redis (RATELIMIT_REDIS_URL) when available, otherwise the
+# users.RateLimitCounter table, moved by one UPDATE per hit (prune it with sweep_ratelimits)
+if os.getenv('RATELIMIT_REDIS_URL'):
+    CACHES["ratelimit"] = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.getenv('RATELIMIT_REDIS_URL'),
+    }
+RATELIMIT_CACHE_ALIAS = "ratelimit" if os.getenv('RATELIMIT_REDIS_URL') else None
+
+# Sessions: 'db', 'cached_db' (database plus the "sessions" cache tier) or
+# 'signed_cookies' (no server-side storage; payloads must stay well under 4 KB)
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
 }
+# cached_db is only the default over a shared Redis tier: a process-local tier lets one worker keep
+# serving a session that another logged out or changed, and write its stale copy back over the newer one
+SESSION_ENGINE = SESSION_ENGINES[os.getenv('SESSION_BACKEND', 'cached_db' if os.getenv('SESSION_REDIS_URL') else 'db')]
+SESSION_CACHE_ALIAS = "sessions"
+
+# Buffered read counts (see blog/read_counts.py)
+READ_COUNT_FLUSH_INTERVAL = float(os.getenv('READ_COUNT_FLUSH_INTERVAL', 5))  # Seconds; 0 writes through
+READ_COUNT_MAX_PENDING = 10000  # Max distinct blogs buffered per worker before events are dropped
+# Redis server shared by every worker for the read dedup filters; required when serving with more than
+# one process, and enforced by `manage.py check --deploy`
+READ_DEDUP_REDIS_URL = os.getenv('READ_DEDUP_REDIS_URL')
+READ_DEDUP_WINDOW = 86400  # Seconds; repeat views of a post by the same user within it are not counted
+
+# Rendered blog_detail fragments (see blog/fragment_cache.py)
+BLOG_FRAGMENT_CACHE_TIMEOUT = 3600  # Seconds; also bounds staleness of author profile changes
+
+# Following timelines (see blog/timeline.py)
+TIMELINE_FANOUT_LIMIT = int(os.getenv('TIMELINE_FANOUT_LIMIT', 5000))  # Followers above which posts are read on demand
+TIMELINE_MAX_ENTRIES = 500  # Entries kept per user by the trim_timelines command
+TIMELINE_FOLLOW_BACKFILL = 20  # Recent posts copied into a new follower's timeline
+
+# Upload image pipeline (see blog/images.py)
+IMAGE_PIPELINE_WORKERS = int(os.getenv('IMAGE_PIPELINE_WORKERS', 4))  # Threads encoding variants
+IMAGE_PIPELINE_JOBS = 1  # Background threads per process taking uploads off the request thread
+IMAGE_PIPELINE_BACKGROUND = True  # False processes uploads inline after commit
+
+# Notification stream (ASGI only, see users.views.notification_stream)
+NOTIFICATION_STREAM_TIMEOUT = 55  # Seconds a stream stays open before the browser reconnects
+# Seconds between checks for new notifications. Each open stream checks the notification cache, so over
+# the database cache it polls no faster than the 30s fetch_notifications polling it replaces
+NOTIFICATION_STREAM_INTERVAL = 2 if NOTIFICATION_CACHE_ALIAS != "default" else 30
 
 SECURITY_SALT = os.getenv('SECURITY_SALT')
 
@@ -109,15 +200,6 @@ WSGI_APPLICATION = 'myblog.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-import os
-import sys
-from pathlib import Path
-
-BASE_DIR = Path(__file__).resolve().parent.parent
-
-import os
-import dj_database_url
-
 DATABASES = {
     'default': dj_database_url.config(default=os.getenv('DATABASE_URL'))
 }
@@ -164,6 +246,10 @@ EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = f"Bloggy <{EMAIL_HOST_USER}>"
 
+# Outbound mail queue (see users/mail_queue.py); run `manage.py send_queued_mail --loop` as a worker.
+# Unset delivers through EMAIL_BACKEND; e.g. django.core.mail.backends.filebased.EmailBackend offline
+MAIL_QUEUE_EMAIL_BACKEND = os.getenv('MAIL_QUEUE_EMAIL_BACKEND')
+
 # Email settings (optional)
 ACCOUNT_EMAIL_VERIFICATION = "mandatory"
 ACCOUNT_EMAIL_REQUIRED = True
@@ -0,0 +1,51 @@
+"""
+Lean settings profile for autoscaled web dynos:
+DJANGO_SETTINGS_MODULE=myblog.settings_lean gunicorn myblog.wsgi
+
+Everything in myblog.settings applies, minus what `manage.py profile_startup`
+measured as costly for a user-facing worker that can do without it, so a cold
+worker imports less before its first response:
+
+- Social providers other than SOCIAL_PROVIDERS, e.g. SOCIAL_PROVIDERS=google,github
+  (by default, the providers whose credentials are set). Each one installed costs
+  its import: Facebook's views, Google PyJWT and cryptography, Twitter
+  requests-oauthlib and urllib3.
+- The admin, whose autodiscovery imports every app's admin module and its forms.
+  Serve /admin/ from a process on the full profile.
+- The myblog app, which only carries management commands.
+
+Compare the two with
+`manage.py profile_startup --module myblog.settings --module myblog.settings_lean`.
+"""
+
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import INSTALLED_APPS, SOCIALACCOUNT_PROVIDERS
+
+SOCIAL_PROVIDER_CREDENTIALS = {
+    'facebook': 'FACEBOOK_APP_ID',
+    'twitter': 'TWITTER_CONSUMER_KEY',
+    'github': 'GITHUB_CLIENT_ID',
+    'google': 'GOOGLE_client_id',
+}
+SOCIAL_PROVIDERS = [
+    provider.strip() for provider in os.getenv(
+        'SOCIAL_PROVIDERS',
+        ','.join(provider for provider, variable in SOCIAL_PROVIDER_CREDENTIALS.items() if os.getenv(variable)),
+    ).split(',')
+    if provider.strip()
+]
+
+# Apps this profile defers to processes running the full settings
+DEFERRED_APPS = [
+    'django.contrib.admin',
+    'myblog',
+    *(f'allauth.socialaccount.providers.{provider}' for provider in SOCIAL_PROVIDER_CREDENTIALS
+      if provider not in SOCIAL_PROVIDERS),
+]
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in DEFERRED_APPS]
+SOCIALACCOUNT_PROVIDERS = {
+    provider: config for provider, config in SOCIALACCOUNT_PROVIDERS.items() if provider in SOCIAL_PROVIDERS
+}
@@ -0,0 +1,125 @@
+# myblog/startup.py
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+
+# Runs in a fresh interpreter: imports the settings, sets up the apps, loads the middleware and the
+# URLconf, then serves one request through the WSGI handler. Prints the cumulative ms at each phase.
+STARTUP_SCRIPT = '''
+import io, json, sys, time
+started = time.perf_counter()
+phases = {}
+
+def mark(phase):
+    phases[phase] = (time.perf_counter() - started) * 1000
+
+from django.conf import settings
+settings.INSTALLED_APPS
+mark('settings')
+import django
+django.setup(set_prefix=False)
+mark('apps')
+from django.core.handlers.wsgi import WSGIHandler
+handler = WSGIHandler()
+mark('middleware')
+from django.urls import get_resolver
+get_resolver().url_patterns
+mark('urlconf')
+
+path, host = sys.argv[1], (settings.ALLOWED_HOSTS or ['localhost'])[0].lstrip('.').replace('*', 'localhost')
+environ = {
+    'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '', 'SCRIPT_NAME': '',
+    'SERVER_NAME': host, 'SERVER_PORT': '443', 'HTTP_HOST': host, 'wsgi.url_scheme': 'https',
+    'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr, 'wsgi.version': (1, 0),
+    'wsgi.multithread': False, 'wsgi.multiprocess': True, 'wsgi.run_once': False,
+}
+status = []
+body = b''.join(handler(environ, lambda line, headers, exc_info=None: status.append(line)))
+mark('first_response')
+print(json.dumps({'phases': phases, 'status': status[0], 'modules': sorted(sys.modules)}))
+'''
+STARTUP_PHASES = ('settings', 'apps', 'middleware', 'urlconf', 'first_response')
+
+
+def parse_importtime(stderr):
+    """
+    [(module, self_us, cumulative_us, depth)] from `python -X importtime`
+    output, in the order the interpreter reports them (children first).
+    """
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        imports.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return imports
+
+
+def summarize_imports(imports, limit=15):
+    """
+    The costliest top-level imports by cumulative time, and the self time
+    spent in each top-level package, both in ms and largest first.
+    """
+    roots = sorted(
+        ((name, cumulative / 1000) for name, _, cumulative, depth in imports if depth == 0),
+        key=lambda item: -item[1],
+    )[:limit]
+    packages = {}
+    for name, self_us, _, _ in imports:
+        package = name.split('.')[0]
+        packages[package] = packages.get(package, 0) + self_us / 1000
+    return {
+        'roots': [(name, round(ms, 2)) for name, ms in roots],
+        'packages': [(name, round(ms, 2)) for name, ms in sorted(packages.items(), key=lambda item: -item[1])[:limit]],
+        'total_ms': round(sum(self_us for _, self_us, _, _ in imports) / 1000, 2),
+    }
+
+
+def _run_startup(settings_module, path, env, importtime=False):
+    command = [sys.executable, *(['-X', 'importtime'] if importtime else []), '-c', STARTUP_SCRIPT, path]
+    started = time.perf_counter()
+    completed = subprocess.run(
+        command,
+        cwd=settings.BASE_DIR,
+        env={**os.environ, **env, 'DJANGO_SETTINGS_MODULE': settings_module},
+        capture_output=True,
+        text=True,
+    )
+    wall_ms = (time.perf_counter() - started) * 1000
+    if completed.returncode != 0:
+        raise RuntimeError(f"Startup of {settings_module} failed:\n{completed.stderr[-2000:]}")
+    # Views may print debug output before the report, which is always the last line
+    report = json.loads(completed.stdout.strip().splitlines()[-1])
+    report['process_ms'] = wall_ms
+    return report, completed.stderr
+
+
+def profile_startup(settings_module, path='/', runs=5, env=None, limit=15):
+    """
+    Profiles a cold start under `settings_module` in fresh interpreters:
+    the median time at each startup phase up to the first response over
+    `runs` runs, plus per-module import costs from one extra run under
+    `python -X importtime` (kept out of the timings, which it inflates).
+    """
+    env = env or {}
+    reports = [_run_startup(settings_module, path, env)[0] for _ in range(runs)]
+    report, stderr = _run_startup(settings_module, path, env, importtime=True)
+    return {
+        'settings_module': settings_module,
+        'path': path,
+        'status': reports[-1]['status'],
+        'runs': runs,
+        'phases_ms': {
+            phase: round(statistics.median(run['phases'][phase] for run in reports), 2) for phase in STARTUP_PHASES
+        },
+        'process_ms': round(statistics.median(run['process_ms'] for run in reports), 2),
+        'imports': summarize_imports(parse_importtime(stderr), limit=limit),
+        'modules': report['modules'],
+    }
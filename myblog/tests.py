@@ -0,0 +1,87 @@
+from django.test import TestCase
+
+
+# Test the startup profiler and the lean settings profile
+class StartupProfileTests(TestCase):
+
+    def test_parse_importtime(self):
+        from .startup import parse_importtime, summarize_imports
+
+        stderr = (
+            'import time: self [us] | cumulative | imported package\n'
+            'import time:       100 |        100 |     idna.core\n'
+            'import time:       300 |        400 |   idna\n'
+            'import time:      1000 |       1400 | requests\n'
+            'import time:       500 |        500 | jwt\n'
+        )
+        imports = parse_importtime(stderr)
+        self.assertEqual(imports[0], ('idna.core', 100, 100, 2))
+        summary = summarize_imports(imports)
+        self.assertEqual(summary['roots'], [('requests', 1.4), ('jwt', 0.5)])
+        self.assertEqual(summary['packages'][0], ('requests', 1.0))
+        self.assertEqual(summary['total_ms'], 1.9)
+
+    def test_lean_profile_loads_only_configured_providers(self):
+        from .startup import profile_startup
+
+        result = profile_startup('myblog.settings_lean', '/users/login/', runs=1, env={'SOCIAL_PROVIDERS': 'github'})
+        self.assertTrue(result['status'].startswith('200'))
+        self.assertIn('allauth.socialaccount.providers.github.urls', result['modules'])
+        for skipped in ('allauth.socialaccount.providers.google', 'jwt', 'requests_oauthlib', 'PIL.Image'):
+            self.assertNotIn(skipped, result['modules'])
+        self.assertEqual(list(result['phases_ms']), ['settings', 'apps', 'middleware', 'urlconf', 'first_response'])
+
+    def test_default_settings_keep_every_provider(self):
+        from django.conf import settings
+
+        for provider in ('facebook', 'twitter', 'github', 'google'):
+            self.assertIn(f'allauth.socialaccount.providers.{provider}', settings.INSTALLED_APPS)
+            self.assertIn(provider, settings.SOCIALACCOUNT_PROVIDERS)
+
+    def test_lean_profile_defers_admin_and_unconfigured_providers(self):
+        from .startup import profile_startup
+
+        result = profile_startup('myblog.settings_lean', '/users/login/', runs=1, env={'SOCIAL_PROVIDERS': ''})
+        self.assertTrue(result['status'].startswith('200'))
+        for skipped in ('django.contrib.admin.sites', 'allauth.socialaccount.providers.github',
+                        'allauth.socialaccount.providers.facebook.views', 'cryptography', 'urllib3'):
+            self.assertNotIn(skipped, result['modules'])
+
+
+# Test the shared --loop scaffold of the maintenance commands
+class LoopingCommandTests(TestCase):
+
+    def _command(self, results):
+        from io import StringIO
+        from .management.base import LoopingCommand
+
+        class Command(LoopingCommand):
+            passes = 0
+
+            def run_once(self, **options):
+                self.passes += 1
+                return results.pop(0)
+
+            def idle(self, **options):
+                self.idled = True
+
+        return Command(stdout=StringIO())
+
+    def test_runs_until_a_pass_finds_no_more_work(self):
+        from django.core.management import call_command
+
+        command = self._command([True, True, False, True])
+        call_command(command)
+        self.assertEqual(command.passes, 3)
+        self.assertFalse(hasattr(command, 'idled'))
+
+    def test_loop_idles_and_sleeps_between_passes_until_interrupted(self):
+        from unittest.mock import patch
+        from django.core.management import call_command
+
+        command = self._command([False, True, False])
+        with patch('myblog.management.base.time.sleep', side_effect=[None, KeyboardInterrupt]) as sleep:
+            call_command(command, loop=True, interval=7)
+        self.assertEqual(command.passes, 3)
+        self.assertTrue(command.idled)
+        sleep.assert_called_with(7.0)
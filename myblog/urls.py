@@ -1,15 +1,10 @@
-from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from . import views
-from allauth.socialaccount.providers.github.urls import urlpatterns as github_urlpatterns
 
 
 urlpatterns = [
-    # Admin URLs
-    path('admin/', admin.site.urls),  # Default admin login and dashboard
-
     # Home page
     path('', views.home, name='home'),
     path('verify_email/', views.verify_email, name='verify_email'),
@@ -23,7 +18,19 @@ urlpatterns = [
     path('accounts/', include('allauth.urls')), 
     path('accounts/social/debug/', include('allauth.socialaccount.urls')),
 
-]+ github_urlpatterns
+]
+
+if 'django.contrib.admin' in settings.INSTALLED_APPS:
+    from django.contrib import admin
+
+    # Admin URLs
+    urlpatterns.insert(0, path('admin/', admin.site.urls))  # Default admin login and dashboard
+
+if 'allauth.socialaccount.providers.github' in settings.INSTALLED_APPS:
+    # Root-level GitHub callback kept for the registered OAuth app; importing it loads requests
+    from allauth.socialaccount.providers.github.urls import urlpatterns as github_urlpatterns
+
+    urlpatterns += github_urlpatterns
 
 if settings.DEBUG:
     # For static files
@@ -3,6 +3,8 @@ from users.models import SubscriptionList
 from users.forms import SubscriptionListForm
 from users.models import *
 from blog.models import Blog
+from blog.related import RELATED_POST_FIELDS, recommended_posts_for
+from blog.timeline import timeline_page
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 import uuid
@@ -17,16 +19,24 @@ def home(request):
         print(f"User: '{request.user.username}' is authenticated, redirecting to the Home page.")  
 
         # Get the featured posts (limiting to 6 featured posts)
-        featured_posts = Blog.objects.filter(featured=True).exclude(status=0)[:6]
+        featured_posts = Blog.objects.published().cards().filter(featured=True)[:6]
 
         # Get the top 2 authors (you can adjust the logic here based on your actual use case)
-        top_authors = Profile.objects.all()[:2]
+        top_authors = Profile.objects.only(
+            'id', 'user_id', 'profile_picture', 'profile_picture_width', 'profile_picture_variants'
+        )[:2]
 
         # Fetch the latest 6 posts ordered by 'created_at'
-        recent_posts = Blog.objects.all().order_by('-created_at').exclude(status=0)[:6] 
+        recent_posts = list(Blog.objects.published().cards().order_by('-created_at')[:6])
 
-        # Fetch a random or relevant list of recommended posts, filtering by categories, and excluding post with id=1 for demonstration
-        recommended_posts = Blog.objects.filter(categories__name__in=['Tech', 'Business']).exclude(id=1)[:5] 
+        # Latest posts of the authors the user follows, from their precomputed timeline;
+        # shown as title-and-image teasers, so without the card's author, tags and categories
+        following_posts = timeline_page(request.user.pk, per_page=6, posts=Blog.objects.only(*RELATED_POST_FIELDS))
+
+        # Posts related to what the user recently reacted to, from the precomputed related-posts table
+        recommended_posts = recommended_posts_for(
+            request.user.pk, fallback_blog_id=recent_posts[0].pk if recent_posts else None
+        )
 
         # Check if the user is already subscribed
         subscription_exists = SubscriptionList.objects.filter(user=request.user).exists()
@@ -64,6 +74,7 @@ def home(request):
             'featured_posts': featured_posts,
             'top_authors': top_authors,
             'recent_posts': recent_posts,
+            'following_posts': following_posts,
             'recommended_posts': recommended_posts,
         })
     else:
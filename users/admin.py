@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Profile
+from .models import Profile, OutboundEmail
 
 
 @admin.register(Profile)
@@ -10,4 +10,10 @@ class ProfileAdmin(admin.ModelAdmin):
     ordering = ('user__username',)
 
 
-
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('subject', 'recipients')
+    readonly_fields = ('attempts', 'last_error', 'created_at', 'sent_at')
+    exclude = ('body',)  # Pending bodies hold OTP codes and password reset links
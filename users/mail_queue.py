@@ -0,0 +1,128 @@
+# users/mail_queue.py
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+MAIL_QUEUE_BATCH_SIZE = 50
+MAIL_QUEUE_MAX_ATTEMPTS = 5
+MAIL_QUEUE_RETRY_DELAY = 30  # Seconds before the first retry; doubled after each failure
+MAIL_QUEUE_LEASE = 300  # Seconds a claimed message stays hidden from other workers
+MAIL_QUEUE_RETENTION = 7  # Days sent and failed rows are kept, bodies already blanked, for auditing
+MAIL_QUEUE_PRUNE_BATCH = 1000
+
+
+def queue_mail(subject, message, from_email, recipient_list):
+    """
+    Queues an email for the send_queued_mail worker; a drop-in for send_mail
+    that never touches SMTP inside the request.
+    """
+    return OutboundEmail.objects.create(
+        subject=subject,
+        body=message,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        recipients=list(recipient_list),
+    )
+
+
+def get_delivery_connection():
+    """
+    Opens the connection the worker delivers through. MAIL_QUEUE_EMAIL_BACKEND
+    overrides EMAIL_BACKEND, e.g. with the locmem or file backend offline.
+    """
+    backend = getattr(settings, 'MAIL_QUEUE_EMAIL_BACKEND', None) or settings.EMAIL_BACKEND
+    return get_connection(backend, fail_silently=False)
+
+
+def retry_delay(attempts):
+    """Exponential backoff: 30s, 60s, 120s, ... after the 1st, 2nd, 3rd failure."""
+    return timedelta(seconds=MAIL_QUEUE_RETRY_DELAY * 2 ** max(attempts - 1, 0))
+
+
+def claim_batch(batch_size=MAIL_QUEUE_BATCH_SIZE):
+    """
+    Claims due messages by pushing their next attempt past a lease, so
+    concurrent workers skip them and a crashed worker's claim expires.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        messages = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+                                 .filter(status=OutboundEmail.STATUS_PENDING, next_attempt_at__lte=now)
+                                 .order_by('next_attempt_at', 'id')[:batch_size]
+        )
+        OutboundEmail.objects.filter(pk__in=[m.pk for m in messages]).update(
+            next_attempt_at=now + timedelta(seconds=MAIL_QUEUE_LEASE)
+        )
+    return messages
+
+
+def deliver_queued_mail(batch_size=MAIL_QUEUE_BATCH_SIZE, max_attempts=MAIL_QUEUE_MAX_ATTEMPTS, connection=None):
+    """
+    Sends one batch of due messages over a single connection and returns
+    how many were claimed, sent, rescheduled for a retry and given up on.
+    """
+    stats = {'claimed': 0, 'sent': 0, 'retried': 0, 'failed': 0}
+    messages = claim_batch(batch_size)
+    stats['claimed'] = len(messages)
+    if not messages:
+        return stats
+
+    own_connection = connection is None
+    connection = connection or get_delivery_connection()
+    try:
+        for outbound in messages:
+            email = EmailMessage(
+                outbound.subject, outbound.body, outbound.from_email, outbound.recipients, connection=connection
+            )
+            outbound.attempts += 1
+            try:
+                connection.open()  # No-op while the pooled connection is open
+                email.send()
+            except Exception as e:
+                outbound.last_error = str(e)
+                if outbound.attempts >= max_attempts:
+                    outbound.status = OutboundEmail.STATUS_FAILED
+                    outbound.body = ''
+                    stats['failed'] += 1
+                    logger.error(f"Giving up on email {outbound.pk} after {outbound.attempts} attempts: {e}")
+                else:
+                    outbound.next_attempt_at = timezone.now() + retry_delay(outbound.attempts)
+                    stats['retried'] += 1
+                    logger.warning(f"Email {outbound.pk} failed (attempt {outbound.attempts}), retrying: {e}")
+                # The connection may be broken; reopen it for the next message
+                connection.close()
+            else:
+                outbound.status = OutboundEmail.STATUS_SENT
+                outbound.sent_at = timezone.now()
+                outbound.last_error = ''
+                outbound.body = ''  # OTP codes and reset links must not outlive delivery
+                stats['sent'] += 1
+            outbound.save(update_fields=['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at', 'body'])
+    finally:
+        if own_connection:
+            connection.close()
+    return stats
+
+
+def prune_delivered_mail(retention_days=MAIL_QUEUE_RETENTION, batch_size=MAIL_QUEUE_PRUNE_BATCH):
+    """
+    Deletes sent and failed messages older than the retention period in
+    short batches by primary key, and returns how many were deleted.
+    """
+    cutoff = timezone.now() - timedelta(days=retention_days)
+    finished = OutboundEmail.objects.exclude(status=OutboundEmail.STATUS_PENDING).filter(created_at__lt=cutoff)
+    deleted = 0
+    while True:
+        ids = list(finished.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += OutboundEmail.objects.filter(pk__in=ids).delete()[0]
@@ -0,0 +1,61 @@
+import time
+
+from myblog.management.base import LoopingCommand
+from users.mail_queue import (
+    MAIL_QUEUE_BATCH_SIZE, MAIL_QUEUE_MAX_ATTEMPTS, MAIL_QUEUE_RETENTION, deliver_queued_mail,
+    get_delivery_connection, prune_delivered_mail,
+)
+
+
+class Command(LoopingCommand):
+    help = 'Deliver queued outbound emails, retrying failures with exponential backoff, and prune old ones'
+    interval = 5
+    loop_help = 'Keep polling the queue instead of draining it once'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--batch-size', type=int, default=MAIL_QUEUE_BATCH_SIZE, help='Messages claimed per batch')
+        parser.add_argument('--max-attempts', type=int, default=MAIL_QUEUE_MAX_ATTEMPTS,
+                            help='Attempts before a message is marked failed')
+        parser.add_argument('--retention-days', type=int, default=MAIL_QUEUE_RETENTION,
+                            help='Days sent and failed messages are kept before they are deleted')
+        parser.add_argument('--prune-interval', type=float, default=3600,
+                            help='Seconds between pruning passes with --loop')
+
+    def prune(self, retention_days):
+        deleted = prune_delivered_mail(retention_days)
+        if deleted:
+            self.stdout.write(f"Pruned {deleted} delivered or failed emails")
+        self.pruned_at = time.monotonic()
+
+    def run_once(self, **options):
+        stats = deliver_queued_mail(
+            batch_size=options['batch_size'], max_attempts=options['max_attempts'], connection=self.connection
+        )
+        for key in self.totals:
+            self.totals[key] += stats[key]
+        if stats['claimed']:
+            self.stdout.write(
+                f"Sent {stats['sent']} emails, {stats['retried']} scheduled for retry, {stats['failed']} failed"
+            )
+        return stats['claimed']
+
+    def idle(self, **options):
+        if time.monotonic() - self.pruned_at >= options['prune_interval']:
+            self.prune(options['retention_days'])
+        self.connection.close()
+
+    def handle(self, *args, **options):
+        # One connection serves every batch; it is closed while the queue is idle
+        self.connection = get_delivery_connection()
+        self.totals = {'sent': 0, 'retried': 0, 'failed': 0}
+        self.prune(options['retention_days'])
+        try:
+            super().handle(*args, **options)
+        finally:
+            self.connection.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Mail queue drained: {self.totals['sent']} sent, {self.totals['retried']} retried, "
+            f"{self.totals['failed']} failed"
+        ))
@@ -0,0 +1,22 @@
+from myblog.management.base import LoopingCommand
+from users.models import OTP
+
+
+class Command(LoopingCommand):
+    help = 'Delete verified and expired OTPs in small batches'
+    interval = 300
+    loop_help = 'Keep sweeping instead of exiting once done'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows deleted per statement')
+
+    def run_once(self, **options):
+        deleted = 0
+        while True:
+            # Short DELETEs by primary key keep locks brief on a busy table
+            ids = list(OTP.objects.stale().values_list('pk', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            deleted += OTP.objects.filter(pk__in=ids).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} stale OTPs'))
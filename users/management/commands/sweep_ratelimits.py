@@ -0,0 +1,21 @@
+from myblog.management.base import LoopingCommand
+from users.models import RateLimitCounter
+
+
+class Command(LoopingCommand):
+    help = 'Delete rate-limit counters whose windows have ended, in small batches'
+    interval = 300
+    loop_help = 'Keep sweeping instead of exiting once done'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows deleted per statement')
+
+    def run_once(self, **options):
+        deleted = 0
+        while True:
+            keys = list(RateLimitCounter.objects.stale().values_list('pk', flat=True)[:options['batch_size']])
+            if not keys:
+                break
+            deleted += RateLimitCounter.objects.filter(pk__in=keys).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} stale rate-limit counters'))
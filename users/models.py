@@ -1,7 +1,7 @@
 from django.db import models
 from django.utils.timezone import now
 from django.core.validators import RegexValidator
-from django.utils.crypto import get_random_string
+from django.utils.crypto import constant_time_compare, get_random_string, salted_hmac
 import random
 import time
 from datetime import timedelta
@@ -28,6 +28,10 @@ class Profile(models.Model):
     bio = models.TextField(blank=True, null=True, help_text="Write a short bio about yourself.")
     email_verified = models.BooleanField(default=False)
     profile_picture = models.ImageField(upload_to='authors/', null=True, blank=True)
+    # Recorded by the image pipeline (blog/images.py): upright size and generated variant widths
+    profile_picture_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    profile_picture_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    profile_picture_variants = models.JSONField(default=list, blank=True, editable=False)
     phone_number = models.CharField(
         max_length=15,
         blank=True,
@@ -38,18 +42,74 @@ class Profile(models.Model):
     location = models.CharField(max_length=100, blank=True, null=True)
     birth_date = models.DateField(null=True, blank=True)
 
+class OTPQuerySet(models.QuerySet):
+    def active(self):
+        """Unverified OTPs; the partial unique constraint allows at most one per user."""
+        return self.filter(is_verified=False)
+
+    def stale(self, now=None):
+        """OTPs that can never be used again: verified, or past their expiry."""
+        return self.filter(models.Q(is_verified=True) | models.Q(expires_at__lte=now or timezone.now()))
+
+
 class OTP(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
-    otp = models.CharField(max_length=6)
+    otp_hash = models.CharField(max_length=64)  # Keyed hash of the code; the code itself is never stored
     expires_at = models.DateTimeField(null=True, blank=True)
     is_verified = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)  # To track OTP generation time
 
+    objects = OTPQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'is_verified', 'expires_at'], name='users_otp_lookup_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user'], condition=models.Q(is_verified=False), name='users_otp_one_active_per_user'
+            ),
+        ]
+
+    @staticmethod
+    def hash_code(user_id, code):
+        return salted_hmac('users.OTP', f'{user_id}:{code}', algorithm='sha256').hexdigest()
+
+    def check_code(self, code):
+        """Compare a submitted code against the stored hash in constant time."""
+        return constant_time_compare(self.otp_hash, self.hash_code(self.user_id, code or ''))
+
     def is_expired(self):
         """Check if the OTP has expired."""
         return timezone.now() > self.expires_at
 
 
+class RateLimitCounterQuerySet(models.QuerySet):
+    def stale(self, now=None):
+        """Counters whose current and previous windows have both ended."""
+        return self.filter(expires_at__lte=now or timezone.now())
+
+
+class RateLimitCounter(models.Model):
+    """
+    Hits of one users.ratelimit key in its current and previous fixed window.
+
+    The shared store of the rate limiter when no Redis cache is configured:
+    every hit moves a counter with a single UPDATE, which the database
+    serializes, so concurrent hits are never lost.
+    """
+    key = models.CharField(max_length=100, primary_key=True)
+    current_window = models.BigIntegerField()
+    count = models.PositiveIntegerField(default=0)
+    previous_count = models.PositiveIntegerField(default=0)
+    expires_at = models.DateTimeField(db_index=True)  # Once past, neither window counts any more
+
+    objects = RateLimitCounterQuerySet.as_manager()
+
+    def __str__(self):
+        return f"{self.key}: {self.count}"
+
+
 class SubscriptionList(models.Model):
     user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, related_name="subscription")
     user_email = models.EmailField(max_length=254)
@@ -62,3 +122,39 @@ class SubscriptionList(models.Model):
 
     def __str__(self):
         return self.user_email
+
+
+class OutboundEmail(models.Model):
+    """
+    A message waiting in the outbound mail queue.
+
+    Requests only insert rows here; the send_queued_mail worker delivers them
+    over a shared SMTP connection, retrying failures with backoff.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = (
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_SENT, 'Sent'),
+        (STATUS_FAILED, 'Failed'),
+    )
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254)
+    recipients = models.JSONField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='users_outbound_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.recipients)} ({self.status})"
@@ -0,0 +1,179 @@
+# users/ratelimit.py
+
+import hashlib
+import time
+from datetime import datetime, timezone as dt_timezone
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Case, F, Value, When
+from django.http import HttpResponse
+
+from .models import RateLimitCounter
+
+
+def _ratelimit_cache():
+    """The shared cache holding the counters, or None to keep them in the RateLimitCounter table."""
+    alias = getattr(settings, 'RATELIMIT_CACHE_ALIAS', None)
+    return caches[alias] if alias else None
+
+
+def _upsert_returning_supported():
+    # MySQL and MariaDB have no ON CONFLICT clause, and MySQL no RETURNING either
+    return connection.vendor in ('postgresql', 'sqlite') and connection.features.can_return_columns_from_insert
+
+
+def _hit_counter(key, window, expires_at):
+    """
+    Counts a hit of `key` in `window` and returns (current, previous) counts.
+
+    One INSERT ... ON CONFLICT DO UPDATE ... RETURNING where supported;
+    otherwise an UPDATE of the row (or an INSERT for a new key) read back in
+    the same transaction, under the row lock the UPDATE took.
+    """
+    if _upsert_returning_supported():
+        table = connection.ops.quote_name(RateLimitCounter._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} (key, current_window, count, previous_count, expires_at) "
+                f"VALUES (%s, %s, 1, 0, %s) ON CONFLICT (key) DO UPDATE SET "
+                f"previous_count = CASE WHEN {table}.current_window = excluded.current_window "
+                f"THEN {table}.previous_count WHEN {table}.current_window = excluded.current_window - 1 "
+                f"THEN {table}.count ELSE 0 END, "
+                f"count = CASE WHEN {table}.current_window = excluded.current_window "
+                f"THEN {table}.count + 1 ELSE 1 END, "
+                f"current_window = excluded.current_window, expires_at = excluded.expires_at "
+                f"RETURNING count, previous_count",
+                [key, window, connection.ops.adapt_datetimefield_value(expires_at)],
+            )
+            return cursor.fetchone()
+
+    counters = RateLimitCounter.objects.filter(key=key)
+    with transaction.atomic():
+        # MySQL assigns left to right, so previous_count must read count before it moves
+        updated = counters.update(
+            previous_count=Case(
+                When(current_window=window, then=F('previous_count')),
+                When(current_window=window - 1, then=F('count')),
+                default=Value(0),
+            ),
+            count=Case(When(current_window=window, then=F('count') + 1), default=Value(1)),
+            current_window=window,
+            expires_at=expires_at,
+        )
+        if not updated:
+            try:
+                with transaction.atomic():
+                    RateLimitCounter.objects.create(key=key, current_window=window, count=1, expires_at=expires_at)
+                return 1, 0
+            except IntegrityError:
+                # Created by a concurrent first hit; count this one on top of it
+                return _hit_counter(key, window, expires_at)
+        return counters.values_list('count', 'previous_count').get()
+
+
+def client_ip(request, *args, **kwargs):
+    """Default rate-limit key: the client address (first hop of X-Forwarded-For behind a proxy)."""
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+    if forwarded:
+        return forwarded.split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+class SlidingWindowLimiter:
+    """
+    Sliding-window rate limiter over shared counters.
+
+    Each fixed window gets its own counter, bumped atomically: with
+    cache.incr on the RATELIMIT_CACHE_ALIAS cache (Redis), otherwise by a
+    single statement on the RateLimitCounter row of the key. The previous
+    window's count is weighted by how much of it still overlaps the sliding
+    window, which smooths the burst a plain fixed window allows at its
+    boundary.
+    """
+
+    def __init__(self, scope, limit, period):
+        self.scope = scope
+        self.limit = limit
+        self.period = period
+
+    def _key(self, ident, window=None):
+        digest = hashlib.sha256(str(ident).encode()).hexdigest()[:32]  # Safe for any backend's key rules
+        if window is None:
+            return f"{self.scope}:{digest}"  # One RateLimitCounter row spans both windows
+        return f"ratelimit:{self.scope}:{digest}:{window}"
+
+    def hit(self, ident, now=None):
+        """
+        Records one attempt and returns (allowed, retry_after_seconds).
+        """
+        now = time.time() if now is None else now
+        window, elapsed = divmod(now, self.period)
+        window = int(window)
+        cache = _ratelimit_cache()
+        if cache is None:
+            expires_at = datetime.fromtimestamp((window + 2) * self.period, tz=dt_timezone.utc)
+            current, previous = _hit_counter(self._key(ident), window, expires_at)
+        else:
+            current, previous = self._hit_cache(cache, ident, window)
+
+        weighted = previous * (1 - elapsed / self.period) + current
+        if weighted <= self.limit:
+            return True, 0
+        return False, int(self.period - elapsed) + 1
+
+    def _hit_cache(self, cache, ident, window):
+        key = self._key(ident, window)
+        try:
+            current = cache.incr(key)
+        except ValueError:
+            # First hit of the window. add() is a no-op if a concurrent first hit created the counter
+            # meanwhile, so it cannot be reset; count this attempt on top of that one instead
+            if cache.add(key, 1, timeout=self.period * 2):
+                current = 1
+            else:
+                current = cache.incr(key)
+        return current, cache.get(self._key(ident, window - 1), 0)
+
+    def reset(self, ident, now=None):
+        cache = _ratelimit_cache()
+        if cache is None:
+            RateLimitCounter.objects.filter(key=self._key(ident)).delete()
+            return
+        now = time.time() if now is None else now
+        window = int(now // self.period)
+        cache.delete_many([self._key(ident, window), self._key(ident, window - 1)])
+
+
+def too_many_requests(request, retry_after, *args, **kwargs):
+    response = HttpResponse("Too many requests. Please try again later.", status=429)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def ratelimit(scope, limit, period, key=client_ip, methods=('POST',), on_limited=too_many_requests):
+    """
+    Allows at most `limit` requests per `period` seconds for each value of
+    key(request, *args, **kwargs) on the decorated view.
+
+    Only `methods` are counted (None counts every request). Limited requests
+    get on_limited(request, retry_after, *args, **kwargs), a 429 by default.
+    """
+    limiter = SlidingWindowLimiter(scope, limit, period)
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if methods is None or request.method in methods:
+                ident = key(request, *args, **kwargs)
+                if ident:
+                    allowed, retry_after = limiter.hit(ident)
+                    if not allowed:
+                        return on_limited(request, retry_after, *args, **kwargs)
+            return view_func(request, *args, **kwargs)
+
+        wrapper.limiter = limiter
+        return wrapper
+    return decorator
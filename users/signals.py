@@ -1,7 +1,9 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_init, post_save
 from django.dispatch import receiver
 from django.contrib.auth.models import User
 from .models import Profile
+from blog.images import PROFILE_PICTURE_WIDTHS, image_name, queue_model_image
 
 @receiver(post_save, sender=User)
 def create_or_save_profile(sender, instance, created, **kwargs):
@@ -16,3 +18,27 @@ def create_or_save_profile(sender, instance, created, **kwargs):
         # Save the profile if the user is updated
         instance.profile.save()
         print(f"Profile saved for {instance.username}")
+
+
+@receiver(post_init, sender=Profile)
+def remember_profile_picture(sender, instance, **kwargs):
+    """
+    Remember the stored picture name as loaded, so a later save can tell whether a new one was uploaded.
+    """
+    instance._original_profile_picture = image_name(instance.__dict__.get('profile_picture')) if instance.pk else None
+
+
+@receiver(post_save, sender=Profile)
+def process_profile_picture(sender, instance, **kwargs):
+    """
+    Queue a new profile picture for stripping, measuring and resizing once it is committed.
+    """
+    if 'profile_picture' in instance.get_deferred_fields():
+        return
+    name = image_name(instance.profile_picture)
+    if name and name != instance._original_profile_picture:
+        profile_id = instance.pk
+        transaction.on_commit(
+            lambda: queue_model_image(Profile, profile_id, 'profile_picture', PROFILE_PICTURE_WIDTHS)
+        )
+    instance._original_profile_picture = name
@@ -1,3 +1,411 @@
 from django.test import TestCase
 
 # Create your tests here.
+from unittest.mock import patch
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from blog.models import Notification
+
+User = get_user_model()
+
+
+#Test Notification Stream
+class NotificationStreamTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', email='reader@example.com', password='password')
+        self.sender = User.objects.create_user(username='sender', email='sender@example.com', password='password')
+
+    def test_wsgi_requests_fall_back_to_polling(self):
+        self.client.login(username='reader@example.com', password='password')
+        response = self.client.get(reverse('notification_stream'))
+        self.assertEqual(response.status_code, 204)
+
+    @patch('users.views.NOTIFICATION_STREAM_INTERVAL', 0.01)
+    @patch('users.views.NOTIFICATION_STREAM_TIMEOUT', 0.05)
+    async def test_stream_pushes_only_new_notifications(self):
+        old = await Notification.objects.acreate(recipient=self.user, sender=self.sender, notification_type='follow')
+        new = await Notification.objects.acreate(recipient=self.user, sender=self.sender, notification_type='follow')
+        await self.async_client.aforce_login(self.user)
+
+        response = await self.async_client.get(reverse('notification_stream'), {'since': old.id})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+
+        self.assertIn(f"id: {new.id}\n", body)
+        self.assertIn(f'"id": {new.id}', body)
+        self.assertNotIn(f'"id": {old.id},', body)
+
+
+#Test Notification Feed
+class FetchNotificationsTests(TestCase):
+    def setUp(self):
+        from blog.models import Blog
+
+        self.user = User.objects.create_user(username='reader', email='reader@example.com', password='password')
+        self.sender = User.objects.create_user(username='sender', email='sender@example.com', password='password')
+        self.blog = Blog.objects.create(title='Feed Blog', content='Content', author=self.user, status=1)
+        self.client.login(username='reader@example.com', password='password')
+
+    def _notify(self, count):
+        for _ in range(count):
+            Notification.objects.create(
+                recipient=self.user, sender=self.sender, notification_type='comment', blog=self.blog
+            )
+
+    def _queries_for_feed(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('fetch_notifications'))
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_notifications(self):
+        self._notify(1)
+        few = self._queries_for_feed()
+        self._notify(10)
+        self.assertEqual(self._queries_for_feed(), few)
+
+    def test_payload_shape_and_cursor_pagination(self):
+        self._notify(3)
+        data = self.client.get(reverse('fetch_notifications'), {'limit': 2}).json()
+        self.assertEqual(data['unseen_count'], 3)
+        self.assertEqual(len(data['notifications']), 2)
+        self.assertEqual(data['notifications'][0]['message'], 'sender Comment your post: Feed Blog')
+        self.assertIn('created_at', data['notifications'][0])
+
+        older = self.client.get(
+            reverse('fetch_notifications'), {'limit': 2, 'before': data['next_cursor']}
+        ).json()
+        self.assertEqual(len(older['notifications']), 1)
+        self.assertIsNone(older['next_cursor'])
+
+    def test_malformed_paging_falls_back_to_defaults(self):
+        self._notify(3)
+        response = self.client.get(reverse('fetch_notifications'), {'limit': 'abc', 'before': 'xyz'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['notifications']), 3)
+
+
+#Test Outbound Mail Queue
+class MailQueueTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='mailer', email='mailer@example.com', password='password')
+
+    def test_otp_is_queued_not_sent(self):
+        from django.core import mail
+        from .models import OutboundEmail
+        from .utils import create_and_send_otp
+
+        otp = create_and_send_otp(self.user)
+        self.assertEqual(len(mail.outbox), 0)
+        queued = OutboundEmail.objects.get()
+        self.assertEqual(queued.recipients, ['mailer@example.com'])
+        self.assertTrue(otp.check_code(queued.body.split('Your OTP code is: ')[1][:6]))
+
+    def test_worker_delivers_over_one_connection(self):
+        from io import StringIO
+        from django.core import mail
+        from django.core.management import call_command
+        from .mail_queue import queue_mail
+        from .models import OutboundEmail
+
+        for i in range(3):
+            queue_mail(f'Subject {i}', 'Body', None, ['reader@example.com'])
+        with patch('django.core.mail.backends.locmem.EmailBackend.open') as mock_open:
+            call_command('send_queued_mail', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertFalse(OutboundEmail.objects.exclude(status=OutboundEmail.STATUS_SENT).exists())
+        self.assertFalse(OutboundEmail.objects.exclude(body='').exists())  # Secrets are not kept once sent
+        self.assertTrue(mock_open.called)
+
+    def test_worker_prunes_finished_messages(self):
+        from datetime import timedelta
+        from io import StringIO
+        from django.core.management import call_command
+        from django.utils import timezone
+        from .mail_queue import queue_mail
+        from .models import OutboundEmail
+
+        old = timezone.now() - timedelta(days=30)
+        sent = queue_mail('Old', 'Body', None, ['reader@example.com'])
+        failed = queue_mail('Old failure', 'Body', None, ['reader@example.com'])
+        pending = queue_mail('Old but pending', 'Body', None, ['reader@example.com'])
+        OutboundEmail.objects.filter(pk=sent.pk).update(status=OutboundEmail.STATUS_SENT, created_at=old)
+        OutboundEmail.objects.filter(pk=failed.pk).update(status=OutboundEmail.STATUS_FAILED, created_at=old)
+        OutboundEmail.objects.filter(pk=pending.pk).update(
+            created_at=old, next_attempt_at=timezone.now() + timedelta(hours=1)  # Waiting on a retry
+        )
+        recent = queue_mail('Recent', 'Body', None, ['reader@example.com'])
+
+        out = StringIO()
+        call_command('send_queued_mail', stdout=out)
+        self.assertIn('Pruned 2 delivered or failed emails', out.getvalue())
+        self.assertEqual(set(OutboundEmail.objects.values_list('pk', flat=True)), {pending.pk, recent.pk})
+
+    def test_failures_back_off_then_give_up(self):
+        from django.utils import timezone
+        from .mail_queue import deliver_queued_mail, queue_mail
+        from .models import OutboundEmail
+
+        outbound = queue_mail('Flaky', 'Body', None, ['reader@example.com'])
+        with patch('django.core.mail.EmailMessage.send', side_effect=OSError('SMTP down')):
+            stats = deliver_queued_mail(max_attempts=2)
+            self.assertEqual(stats['retried'], 1)
+            outbound.refresh_from_db()
+            self.assertEqual(outbound.status, OutboundEmail.STATUS_PENDING)
+            self.assertGreater(outbound.next_attempt_at, timezone.now())
+            self.assertEqual(deliver_queued_mail(max_attempts=2)['claimed'], 0)  # Not due yet
+
+            OutboundEmail.objects.update(next_attempt_at=timezone.now())
+            stats = deliver_queued_mail(max_attempts=2)
+        self.assertEqual(stats['failed'], 1)
+        outbound.refresh_from_db()
+        self.assertEqual(outbound.status, OutboundEmail.STATUS_FAILED)
+        self.assertEqual(outbound.last_error, 'SMTP down')
+        self.assertEqual(outbound.body, '')
+
+
+#Test Rate Limiting
+class RateLimitTests(TestCase):
+
+    def test_sliding_window_weights_previous_window(self):
+        from .ratelimit import SlidingWindowLimiter
+
+        limiter = SlidingWindowLimiter('test', limit=2, period=100)
+        self.assertEqual(limiter.hit('a', now=1000)[0], True)
+        self.assertEqual(limiter.hit('a', now=1010)[0], True)
+        allowed, retry_after = limiter.hit('a', now=1020)
+        self.assertFalse(allowed)
+        self.assertEqual(retry_after, 81)
+        # Early in the next window most of the previous one still counts
+        self.assertFalse(limiter.hit('a', now=1110)[0])
+        # Once it has slid past, attempts are allowed again
+        self.assertTrue(limiter.hit('a', now=1290)[0])
+        self.assertTrue(limiter.hit('b', now=1020)[0])  # Keys are independent
+
+    def test_database_counter_is_one_row_moved_by_one_statement(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from .models import RateLimitCounter
+        from .ratelimit import SlidingWindowLimiter, _upsert_returning_supported
+
+        limiter = SlidingWindowLimiter('test', limit=5, period=100)
+        limiter.hit('a', now=1000)
+        with self.assertNumQueries(1 if _upsert_returning_supported() else 4):
+            limiter.hit('a', now=1010)
+        limiter.hit('a', now=1120)
+        counter = RateLimitCounter.objects.get()
+        self.assertEqual((counter.current_window, counter.count, counter.previous_count), (11, 1, 2))
+        # Two windows later the old counts no longer carry over
+        limiter.hit('a', now=1310)
+        counter.refresh_from_db()
+        self.assertEqual((counter.count, counter.previous_count), (1, 0))
+
+        limiter.hit('b')
+        call_command('sweep_ratelimits', stdout=StringIO())
+        # Only the counter of 'a', whose windows ended in 1970, is stale
+        self.assertEqual(RateLimitCounter.objects.get().key, limiter._key('b'))
+
+    def test_database_counter_fallback_without_upsert(self):
+        from .ratelimit import SlidingWindowLimiter
+
+        limiter = SlidingWindowLimiter('test', limit=2, period=100)
+        with patch('users.ratelimit._upsert_returning_supported', return_value=False):
+            self.assertTrue(limiter.hit('a', now=1000)[0])
+            self.assertTrue(limiter.hit('a', now=1010)[0])
+            self.assertFalse(limiter.hit('a', now=1020)[0])
+            self.assertFalse(limiter.hit('a', now=1110)[0])
+            self.assertTrue(limiter.hit('a', now=1290)[0])
+
+    def test_password_reset_is_limited_per_email(self):
+        url = reverse('password_reset')
+        for _ in range(3):
+            response = self.client.post(url, {'email': 'someone@example.com'})
+            self.assertRedirects(response, url, fetch_redirect_response=False)
+        response = self.client.post(url, {'email': 'someone@example.com'}, follow=True)
+        self.assertContains(response, 'Too many attempts')
+        response = self.client.post(url, {'email': 'other@example.com'}, follow=True)
+        self.assertNotContains(response, 'Too many attempts')
+
+    def test_resend_verification_is_limited(self):
+        url = reverse('resend_verification_email', args=['pending@example.com'])
+        for _ in range(2):
+            self.client.get(url)
+        response = self.client.get(url, follow=True)
+        self.assertContains(response, 'exceeded the maximum number of resend attempts')
+
+
+#Test OTP Store
+class OTPStoreTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='otpuser', email='otp@example.com', password='password')
+
+    def _issue(self):
+        from .models import OutboundEmail
+        from .utils import create_and_send_otp
+
+        create_and_send_otp(self.user)
+        body = OutboundEmail.objects.order_by('-id').first().body
+        return body.split('Your OTP code is: ')[1][:6]
+
+    def test_code_is_hashed_and_reissue_replaces_it(self):
+        from .models import OTP
+
+        first = self._issue()
+        second = self._issue()
+        otp = OTP.objects.get()
+        self.assertNotIn(second, otp.otp_hash)
+        self.assertTrue(otp.check_code(second))
+        if first != second:
+            self.assertFalse(otp.check_code(first))
+
+    def test_one_active_otp_per_user_is_enforced(self):
+        from django.db import IntegrityError, transaction
+        from django.utils import timezone
+        from .models import OTP
+
+        OTP.objects.create(user=self.user, otp_hash='a', expires_at=timezone.now())
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            OTP.objects.create(user=self.user, otp_hash='b', expires_at=timezone.now())
+        OTP.objects.create(user=self.user, otp_hash='c', expires_at=timezone.now(), is_verified=True)
+
+    def test_verify_and_resend_otp(self):
+        session = self.client.session
+        session['temp_user_id'] = self.user.pk
+        session.save()
+
+        code = self._issue()
+        self.assertRedirects(self.client.post(reverse('resend_otp')), reverse('verify_otp'))
+        response = self.client.post(reverse('verify_otp'), {'otp': '000000' if code != '000000' else '111111'})
+        self.assertContains(response, 'Invalid OTP')
+        response = self.client.post(reverse('verify_otp'), {'otp': code})
+        self.assertRedirects(response, reverse('home'), fetch_redirect_response=False)
+
+    def test_sweeper_deletes_stale_rows_in_batches(self):
+        from datetime import timedelta
+        from io import StringIO
+        from django.core.management import call_command
+        from django.utils import timezone
+        from .models import OTP
+
+        past = timezone.now() - timedelta(minutes=1)
+        for i in range(5):
+            user = User.objects.create_user(username=f'old{i}', email=f'old{i}@example.com', password='password')
+            OTP.objects.create(user=user, otp_hash='x', expires_at=past)
+            OTP.objects.create(user=user, otp_hash='y', expires_at=timezone.now() + timedelta(minutes=5), is_verified=True)
+        self._issue()
+
+        out = StringIO()
+        call_command('sweep_otps', batch_size=3, stdout=out)
+        self.assertIn('Deleted 10 stale OTPs', out.getvalue())
+        self.assertEqual(OTP.objects.get().user, self.user)
+
+
+#Test Author Analytics
+class AnalyticsPageTests(TestCase):
+
+    def setUp(self):
+        from blog.models import Blog, Comment, Reaction
+
+        self.author = User.objects.create_user(username='analyst', email='analyst@example.com', password='password')
+        self.reader = User.objects.create_user(username='fan', email='fan@example.com', password='password')
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(7):
+                blog = Blog.objects.create(
+                    title=f'Post {i}', content='Body', author=self.author, status=1, read_count=10
+                )
+                Comment.objects.create(blog=blog, author=self.reader, content='Nice')
+                Reaction.objects.create(blog=blog, user=self.reader, reaction_type='like')
+        self.blog = blog
+        self.client.login(username='analyst@example.com', password='password')
+
+    def _get(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.get(reverse('analytics_page'))
+
+    def test_totals_cover_every_post(self):
+        response = self._get()
+        self.assertEqual(len(response.context['blogs']), 5)
+        self.assertEqual(response.context['total_blogs'], 7)
+        self.assertEqual(response.context['total_reads'], 70)
+        self.assertEqual(response.context['total_engagements'], 14)
+        first = response.context['blogs'][0]
+        self.assertEqual(first['reactions']['like'], 1)
+        self.assertEqual(first['chart_data'], [10, 1, 1])
+
+    def test_counts_read_without_joining_reactions_and_comments(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from blog.analytics import compute_author_analytics
+        from blog.models import Comment, Reaction
+
+        Comment.objects.create(blog=self.blog, author=self.author, content='Thanks')
+        Reaction.objects.create(blog=self.blog, user=self.author, reaction_type='love')
+        with CaptureQueriesContext(connection) as queries:
+            latest = compute_author_analytics(self.author.pk)['posts'][0]
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn(f'"{Reaction._meta.db_table}"', queries[0]['sql'])
+        self.assertEqual((latest['comments_count'], latest['reactions']['like'], latest['reactions']['love']), (2, 1, 1))
+
+    def _queries(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as queries:
+            self._get()
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_posts(self):
+        from django.core.cache import cache
+        from blog.analytics import AUTHOR_ANALYTICS_CACHE_KEY
+        from blog.models import Blog
+
+        self._get()  # Warm the session and notification caches
+        cache.delete(AUTHOR_ANALYTICS_CACHE_KEY.format(self.author.pk))
+        few = self._queries()
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(10):
+                Blog.objects.create(title=f'More {i}', content='Body', author=self.author, status=1)
+        self.assertEqual(self._queries(), few)
+
+    def test_cached_until_engagement(self):
+        from blog.models import Comment
+
+        computed = self._queries()
+        self.assertLess(self._queries(), computed)  # Served from the analytics cache
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(blog=self.blog, author=self.reader, content='Another')
+        self.assertEqual(self._get().context['total_engagements'], 15)
+
+
+#Test Session Storage
+class SessionStoreTests(TestCase):
+    def test_local_session_tier_caps_timeouts(self):
+        from myblog.cache import BoundedLocMemCache
+
+        cache = BoundedLocMemCache('bounded-test', {'TIMEOUT': 60})
+        now = 1000.0
+        with patch('django.core.cache.backends.base.time.time', return_value=now):
+            self.assertEqual(cache.get_backend_timeout(1209600), now + 60)  # A two-week session expiry
+            self.assertEqual(cache.get_backend_timeout(None), now + 60)
+            self.assertEqual(cache.get_backend_timeout(10), now + 10)
+
+    def test_prune_sessions_deletes_only_expired_rows(self):
+        from datetime import timedelta
+        from io import StringIO
+        from django.contrib.sessions.models import Session
+        from django.core.management import call_command
+        from django.utils import timezone
+
+        now = timezone.now()
+        Session.objects.bulk_create(
+            [Session(session_key=f'expired{i}', session_data='', expire_date=now - timedelta(days=1)) for i in range(5)]
+            + [Session(session_key='live', session_data='', expire_date=now + timedelta(days=1))]
+        )
+        out = StringIO()
+        call_command('prune_sessions', batch_size=2, stdout=out)
+        self.assertIn('Deleted 5 expired sessions', out.getvalue())
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), ['live'])
@@ -38,6 +38,7 @@ urlpatterns = [
 
     
     path('analytics/', views.analytics_page, name='analytics_page'),
+    path('analytics/series/', views.analytics_series, name='analytics_series'),
 
     # User Blog Interactions
     path('blog-interactions/', views.user_blog_interactions, name='blog_interactions'),
@@ -56,6 +57,7 @@ urlpatterns = [
 
     path('notifications/', views.notifications, name='notifications'),
     path('notifications/api', views.fetch_notifications, name='fetch_notifications'),
+    path('notifications/stream', views.notification_stream, name='notification_stream'),
     path('notifications/mark-as-read/', views.mark_notifications_as_read, name='mark_notifications_as_read'),
 
     
@@ -1,13 +1,13 @@
-from django.core.mail import send_mail
 from django.contrib.sites.shortcuts import get_current_site
 from django.urls import reverse
 from django.conf import settings
 from itsdangerous import URLSafeTimedSerializer, BadData, SignatureExpired
 import logging
 from users.models import OTP
+from users.mail_queue import queue_mail
 from datetime import timedelta
 from django.utils import timezone
-import random
+import secrets
 import string
 from django.utils.http import urlsafe_base64_encode
 from django.utils.encoding import force_bytes
@@ -62,10 +62,10 @@ def send_verification_email(request, user):
     message = generate_verification_message(user, verification_url)
 
     try:
-        send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [user.email], fail_silently=False)
-        logger.info(f"Verification email sent to {user.email}.")
+        queue_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [user.email])
+        logger.info(f"Verification email queued for {user.email}.")
     except Exception as e:
-        logger.error(f"Error sending verification email: {e}")
+        logger.error(f"Error queueing verification email: {e}")
         raise Exception('Error sending verification email.')
 
 def generate_verification_message(user, verification_url):
@@ -88,33 +88,38 @@ def generate_verification_message(user, verification_url):
 #Functions for handling user login with token verification
 def generate_otp(length=6):
     """Generate a random OTP with the specified length (default 6 digits)."""
-    otp = ''.join(random.choices(string.digits, k=length))  # Generate a random 6-digit OTP
+    otp = ''.join(secrets.choice(string.digits) for _ in range(length))  # Generate a random 6-digit OTP
     return otp
 
 def create_and_send_otp(user):
-    """Generate OTP for a user, set expiration time of 10 minutes, and send OTP via email."""
+    """
+    Generate OTP for a user, set expiration time of 10 minutes, and send OTP via email.
+    Any earlier unverified OTP of the user is replaced, so only the latest code works.
+    """
     # Generate OTP
     otp_code = generate_otp()
     
     # Set expiration time to 10 minutes from now
     expiration_time = timezone.now() + timedelta(minutes=10)
     
-    # Create OTP object and save to the database
-    otp = OTP.objects.create(user=user, otp=otp_code, expires_at=expiration_time, is_verified=False)
+    # Replace the user's active OTP in place; only its hash is stored
+    otp, _ = OTP.objects.update_or_create(
+        user=user,
+        is_verified=False,
+        defaults={
+            'otp_hash': OTP.hash_code(user.pk, otp_code),
+            'expires_at': expiration_time,
+            'created_at': timezone.now(),
+        },
+    )
     
     # Send OTP to user's email
     subject = 'Your OTP Code'
-    message = f'Your OTP code is: {otp.otp}\nIt will expire in 10 minutes.'
+    message = f'Your OTP code is: {otp_code}\nIt will expire in 10 minutes.'
     from_email = settings.DEFAULT_FROM_EMAIL  # Use default from email set in settings
     
-    # Send OTP email
-    send_mail(
-        subject,
-        message,
-        from_email,
-        [user.email],
-        fail_silently=False,
-    )
+    # Queue the OTP email; the send_queued_mail worker delivers it
+    queue_mail(subject, message, from_email, [user.email])
 
     return otp
 
@@ -125,7 +130,6 @@ from django.contrib.auth.tokens import default_token_generator
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes, force_str
 from django.contrib.auth import get_user_model
-from django.core.mail import send_mail
 from django.utils.timezone import now
 from datetime import timedelta
 from django.conf import settings
@@ -145,7 +149,7 @@ def generate_reset_token_and_url(user, request):
 
 def send_reset_email(user, reset_url):
     """
-    Send the password reset email to the user.
+    Queue the password reset email for the user.
     """
     subject = 'Password Reset Request'
     message = (
@@ -155,7 +159,7 @@ def send_reset_email(user, reset_url):
         f"This link expires in 10 minutes!\n\n"
         f"If you didn't request this, please ignore this email."
     )
-    send_mail(
+    queue_mail(
         subject,
         message,
         settings.DEFAULT_FROM_EMAIL,
@@ -3,9 +3,11 @@ from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from .forms import *
-from .models import Profile, CustomUser
+from .models import Profile, CustomUser, OTP
 from .utils import *
-from django.core.mail import send_mail
+from blog.pagination import KeysetPaginator
+from .mail_queue import queue_mail
+from .ratelimit import client_ip, ratelimit
 from django.db import IntegrityError
 from django.core.exceptions import ValidationError
 from django.db.models import Q
@@ -14,7 +16,6 @@ from http.client import RemoteDisconnected
 from django.contrib.auth.forms import PasswordChangeForm
 from django.contrib.auth import update_session_auth_hash
 from django.contrib.auth.hashers import make_password
-from django.core.cache import cache
 from django.utils.timezone import now
 from datetime import datetime, timedelta
 from urllib.error import URLError
@@ -132,38 +133,21 @@ def email_verification(request, token):
         messages.error(request, 'An unexpected error occurred. Please try again later.')
         return redirect('register')
 
+def resend_verification_limited(request, retry_after, email):
+    messages.error(
+        request,
+        f"You have exceeded the maximum number of resend attempts. Please try again after "
+        f"{retry_after // 60} minutes."
+    )
+    return redirect("email_sent", email=email)
+
+# At most 2 resends per email address per hour
+@ratelimit('resend_verification', limit=2, period=3600, key=lambda request, email: email, methods=None,
+           on_limited=resend_verification_limited)
 def resend_verification_email(request, email):
     """
     Resends the email verification link to the given email address with rate limiting.
     """
-    cache_key = f"resend_email_limit_{email}"
-    max_resends = 2  # Maximum allowed resends
-    time_window = timedelta(hours=1)  # Time window for the rate limit (e.g., 1 hour)
-
-    # Retrieve rate limit data from the cache
-    resend_data = cache.get(cache_key, {"count": 0, "first_attempt": now()})
-    resend_count = resend_data["count"]
-    first_attempt = resend_data["first_attempt"]
-
-    # Check if the rate limit has been exceeded
-    if resend_count >= max_resends and now() < first_attempt + time_window:
-        messages.error(
-            request,
-            f"You have exceeded the maximum number of resend attempts. Please try again after "
-            f"{(first_attempt + time_window - now()).seconds // 60} minutes."
-        )
-        return redirect("email_sent", email=email)
-
-    # Update the cache with the new attempt
-    if now() > first_attempt + time_window:
-        # Reset the counter if the time window has passed
-        resend_data = {"count": 1, "first_attempt": now()}
-    else:
-        resend_data["count"] += 1
-
-    # Save the updated data to the cache
-    cache.set(cache_key, resend_data, timeout=int(time_window.total_seconds()))
-
     try:
         user = CustomUser.objects.get(email=email, is_active=False)
         send_verification_email(request, user)
@@ -242,6 +226,16 @@ def login_view(request):
 from django.contrib.auth import authenticate, login
 from django.contrib.auth.backends import ModelBackend
 
+def otp_user_key(request, *args, **kwargs):
+    """Rate-limit key for the OTP views: the user waiting for OTP verification."""
+    return request.session.get('temp_user_id') or request.user.pk or client_ip(request)
+
+def verify_otp_limited(request, retry_after):
+    messages.error(request, f'Too many OTP attempts. Please try again in {retry_after // 60 + 1} minutes.')
+    return redirect('verify_otp')
+
+# At most 5 OTP guesses per user per 10 minutes
+@ratelimit('verify_otp', limit=5, period=600, key=otp_user_key, on_limited=verify_otp_limited)
 def verify_otp(request):
     """Handle OTP verification"""
     print("Accessing OTP verification view...")
@@ -259,8 +253,11 @@ def verify_otp(request):
     if request.method == 'POST':
         otp_code = request.POST.get('otp')
         try:
-            otp = OTP.objects.get(user=user, otp=otp_code, is_verified=False)
+            # One indexed lookup: a user has at most one active OTP
+            otp = OTP.objects.active().get(user=user)
             print(f"Attempting OTP verification for {user.username}.")
+            if not otp.check_code(otp_code):
+                raise OTP.DoesNotExist
 
             if otp.is_expired():
                 messages.error(request, 'OTP has expired. Please request a new one.')
@@ -268,7 +265,7 @@ def verify_otp(request):
                 return redirect('login')
 
             otp.is_verified = True
-            otp.save()
+            otp.save(update_fields=['is_verified'])  # The sweep_otps command deletes it later
 
             # Login the user after successful OTP verification
             login(request, user)
@@ -283,41 +280,42 @@ def verify_otp(request):
     print("Passing OTP verification form to template.")
     return render(request, 'users/verify_otp.html')
 
+def resend_otp_limited(request, retry_after):
+    messages.error(request, 'You have reached the limit of 2 OTP resend attempts within 10 minutes. Please try again later.')
+    print(f"User {otp_user_key(request)} reached OTP resend attempt limit.")
+    return redirect('verify_otp')  # Redirect to OTP verification page
+
+@ratelimit('resend_otp', limit=2, period=600, key=otp_user_key, on_limited=resend_otp_limited)
 def resend_otp(request):
     """Handle resending OTP with rate limit of 2 attempts within 10 minutes."""
     print("Accessing resend OTP view...")  
     
     if request.method == "POST":
-        try:
-            # Check if the user has attempted to resend OTP more than twice in the last 10 minutes
-            recent_attempts = OTP.objects.filter(
-                user=request.user,
-                is_verified=False,
-                created_at__gte=timezone.now() - timezone.timedelta(minutes=10)
-            ).count()
-
-            if recent_attempts >= 2:
-                messages.error(request, 'You have reached the limit of 2 OTP resend attempts within 10 minutes. Please try again later.')
-                print(f"User {request.user.username} reached OTP resend attempt limit.")
-                return redirect('verify_otp')  # Redirect to OTP verification page
+        # The user is not logged in yet while waiting for their OTP
+        user_id = request.session.get('temp_user_id') or request.user.pk
+        if not user_id:
+            messages.error(request, 'You must be logged in first.')
+            return redirect('login')
+        user = get_object_or_404(CustomUser, id=user_id)
 
-            # Attempt to fetch an existing OTP (that is not yet verified) for the user
-            otp = OTP.objects.get(user=request.user, is_verified=False)
+        try:
+            # Fetch the user's active OTP; there is at most one
+            otp = OTP.objects.active().get(user=user)
 
             if otp.is_expired():
                 # If OTP expired, generate a new one and send it
-                otp = create_and_send_otp(request.user)
+                otp = create_and_send_otp(user)
                 messages.success(request, 'A new OTP has been sent to your email.')
-                print(f"A new OTP has been sent to {request.user.email}.")
+                print(f"A new OTP has been sent to {user.email}.")
             else:
                 messages.error(request, 'Your OTP is still valid. Please use it before requesting a new one.')
-                print(f"OTP for {request.user.username} is still valid.")
+                print(f"OTP for {user.username} is still valid.")
                 
         except OTP.DoesNotExist:
             # If no valid OTP is found, generate a new one
-            otp = create_and_send_otp(request.user)
+            otp = create_and_send_otp(user)
             messages.success(request, 'A new OTP has been sent to your email.')
-            print(f"No valid OTP found. Generated new OTP for {request.user.email}.")
+            print(f"No valid OTP found. Generated new OTP for {user.email}.")
 
     return redirect('verify_otp')  # Redirect to OTP verification page
 
@@ -328,32 +326,18 @@ User = get_user_model()
 
 ATTEMPT_LIMIT = 3
 RATE_LIMIT_DURATION = 3600  # 1 hour in seconds
+
+def password_reset_limited(request, retry_after):
+    minutes, seconds = divmod(retry_after, 60)
+    messages.error(request, f"Too many attempts. Please try again in {minutes} minutes and {seconds} seconds.")
+    return redirect('password_reset')
+
+@ratelimit('password_reset', limit=ATTEMPT_LIMIT, period=RATE_LIMIT_DURATION,
+           key=lambda request: request.POST.get('email'), on_limited=password_reset_limited)
 def password_reset_request(request):
     if request.method == 'POST':
         email = request.POST.get('email')
 
-        # Check rate limit
-        cache_key = f"password_reset_attempts:{email}"
-        last_attempt_time_key = f"{cache_key}:last_attempt_time"
-        
-        # Get current attempts and the last attempt time
-        attempts = cache.get(cache_key, 0)
-        last_attempt_time = cache.get(last_attempt_time_key)
-
-        if last_attempt_time:
-            elapsed_time = datetime.now() - last_attempt_time
-            if elapsed_time.total_seconds() > RATE_LIMIT_DURATION:
-                # Reset attempts after the rate limit period has passed
-                attempts = 0
-                cache.set(cache_key, attempts, RATE_LIMIT_DURATION)
-        
-        if attempts >= ATTEMPT_LIMIT:
-            # Calculate remaining time
-            remaining_time = RATE_LIMIT_DURATION - elapsed_time.total_seconds()
-            minutes, seconds = divmod(int(remaining_time), 60)
-            messages.error(request, f"Too many attempts. Please try again in {minutes} minutes and {seconds} seconds.")
-            return redirect('password_reset')
-
         # Check if the email exists in the database
         try:
             user = User.objects.get(email=email)
@@ -366,10 +350,6 @@ def password_reset_request(request):
 
         messages.success(request, "If an account with this email exists, a password reset email has been sent.")
 
-        # Increment attempts and store the time of the last attempt
-        cache.set(cache_key, attempts + 1, RATE_LIMIT_DURATION)
-        cache.set(last_attempt_time_key, datetime.now(), RATE_LIMIT_DURATION)
-
         return redirect('password_reset')
 
     return render(request, 'users/password_reset_request.html')
@@ -458,6 +438,10 @@ def profile_view(request):
     return render(request, 'users/profile.html', context)
 
 
+PROFILE_BLOGS_PER_PAGE = 9
+MY_BLOGS_PER_PAGE = 10
+NOTIFICATIONS_PER_PAGE = 20
+
 @login_required
 def author_profile_view(request, username):
     print(f"Accessing profile view for author -> {username}.")
@@ -467,7 +451,8 @@ def author_profile_view(request, username):
     profile = author.profile  # Assuming a OneToOne relation exists with Profile
     
     # Get all published blogs by this author
-    blogs = Blog.objects.filter(author=author, status=1).order_by('-created_at')  # Only published blogs
+    blogs = Blog.objects.published().cards().filter(author=author)  # Only published blogs
+    blogs = KeysetPaginator(blogs, PROFILE_BLOGS_PER_PAGE).get_page(request.GET.get('cursor'))
     
     # Check if the current user follows the author
     is_following = Follow.objects.filter(follower=request.user, followee=author).exists()
@@ -580,45 +565,119 @@ def my_blogs(request):
     Displays all the blogs posted by the logged-in user.
     """
     # Retrieve blogs by the logged-in user
-    blogs = Blog.objects.filter(author=request.user)
+    blogs = Blog.objects.cards().filter(author=request.user)
+    page_obj = KeysetPaginator(blogs, MY_BLOGS_PER_PAGE).get_page(request.GET.get('cursor'))
 
     context = {
-        'blogs': blogs
+        'blogs': page_obj
     }
 
     return render(request, 'users/my_blogs.html', context)
 
-from django.http import JsonResponse
+import asyncio
+import json
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from django.contrib.auth.decorators import login_required
 from blog.models import Notification
+from blog.notification_feed import FEED_PAGE_SIZE, NotificationFeedSerializer
+from blog.util import (
+    aget_latest_notification_id, aseed_latest_notification_id,
+    get_unread_notifications_count, reset_unread_notifications_count,
+)
 
 @login_required
 def fetch_notifications(request):
-    # Fetch unseen notifications for the logged-in user
-    unseen_notifications = Notification.objects.filter(recipient=request.user, is_read=False)
-    
-    notifications_data = []
-    for n in unseen_notifications:
-        if n.notification_type == 'follow':
-            message = f"{n.sender.username} started following you."
-            url = "/profile/"  # Adjust the URL to the user's profile page
-        elif n.notification_type == 'reaction' or n.notification_type == 'comment':
-            message = f"{n.sender.username} {n.get_notification_type_display()} your post: {n.blog.title}" if n.blog else ""
-            url = f"/blog/{n.blog.id}" if n.blog else "/"
-        else:
-            message = "You have a new notification."
-            url = "/"
-        
-        notifications_data.append({
-            "message": message,
-            "url": url,
-            "created_at": n.created_at.strftime("%Y-%m-%d %H:%M:%S")
-        })
-    
-    return JsonResponse({
-        "unseen_count": unseen_notifications.count(),
-        "notifications": notifications_data
-    })
+    """
+    Returns a page of unseen notifications for the notification badge.
+    Older pages are requested with ?before=<next_cursor>.
+    """
+    try:
+        limit = int(request.GET.get('limit') or FEED_PAGE_SIZE)
+    except ValueError:
+        limit = FEED_PAGE_SIZE
+    try:
+        before = int(request.GET.get('before') or 0)
+    except ValueError:
+        before = 0
+    feed = NotificationFeedSerializer(request.user.pk, limit=limit)
+    return JsonResponse(feed.page(before=before))
+
+
+NOTIFICATION_STREAM_TIMEOUT = getattr(settings, 'NOTIFICATION_STREAM_TIMEOUT', 55)  # Seconds before the client reconnects
+NOTIFICATION_STREAM_INTERVAL = getattr(settings, 'NOTIFICATION_STREAM_INTERVAL', 2)  # Seconds between cache checks
+NOTIFICATION_STREAM_HEARTBEAT = 15  # Seconds between keep-alive comments
+NOTIFICATION_STREAM_BATCH = 50  # Notifications per event
+
+
+def _notification_cursor(request):
+    """Reads the "since" cursor from the query string or the EventSource Last-Event-ID header."""
+    cursor = request.GET.get('since') or request.headers.get('Last-Event-ID') or 0
+    try:
+        return max(int(cursor), 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+async def _notification_events(user_id, cursor):
+    """
+    Yields Server-Sent Events for notifications newer than the cursor.
+
+    Idle connections only await asyncio.sleep and a cache lookup; the
+    Notification table is queried when the cached latest id moves past the cursor.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + NOTIFICATION_STREAM_TIMEOUT
+    last_heartbeat = loop.time()
+    checked_latest_id = -1  # Forces one catch-up query on connect
+    feed = NotificationFeedSerializer(user_id, limit=NOTIFICATION_STREAM_BATCH)
+
+    yield f"retry: {NOTIFICATION_STREAM_INTERVAL * 1000}\n\n"
+    while loop.time() < deadline:
+        latest_id = await aget_latest_notification_id(user_id)
+        if latest_id is None or latest_id != checked_latest_id:
+            checked_latest_id = latest_id
+            new_notifications = await feed.anewer_than(cursor)
+            if new_notifications:
+                cursor = new_notifications[-1]['id']
+                payload = {
+                    "unseen_count": await sync_to_async(get_unread_notifications_count)(user_id),
+                    "notifications": new_notifications,
+                }
+                yield f"id: {cursor}\nevent: notifications\ndata: {json.dumps(payload)}\n\n"
+                last_heartbeat = loop.time()
+            if latest_id is None:
+                await aseed_latest_notification_id(user_id, cursor)
+            if len(new_notifications) == NOTIFICATION_STREAM_BATCH:
+                checked_latest_id = -1  # More are waiting; page through them without sleeping
+                continue
+
+        if loop.time() - last_heartbeat >= NOTIFICATION_STREAM_HEARTBEAT:
+            yield ": keep-alive\n\n"
+            last_heartbeat = loop.time()
+        await asyncio.sleep(NOTIFICATION_STREAM_INTERVAL)
+
+
+@login_required
+async def notification_stream(request):
+    """
+    Streams new notifications as Server-Sent Events when served over ASGI.
+
+    Under WSGI a held-open response would pin a whole worker, so it answers
+    204 No Content instead and the page falls back to polling fetch_notifications.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+
+    user = await request.auser()
+    response = StreamingHttpResponse(
+        _notification_events(user.pk, _notification_cursor(request)),
+        content_type="text/event-stream",
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # Keep reverse proxies from buffering the stream
+    return response
 
 
 @login_required
@@ -626,6 +685,7 @@ def mark_notifications_as_read(request):
     if request.method == "POST":
         # Mark all unseen notifications as read
         Notification.objects.filter(recipient=request.user, is_read=False).update(is_read=True)
+        reset_unread_notifications_count(request.user.pk, 0)
         return JsonResponse({"status": "success"})
     return JsonResponse({"status": "error", "message": "Invalid request"}, status=400)
 
@@ -637,14 +697,16 @@ def notifications(request):
     """
     Displays the notifications for the logged-in user and marks them as read.
     """
-    # Retrieve notifications for the logged-in user, ordered by creation date
-    notifications = Notification.objects.filter(recipient=request.user).order_by('-created_at')
+    # Retrieve a page of notifications for the logged-in user, newest first
+    notifications = Notification.objects.filter(recipient=request.user).select_related('sender', 'blog', 'comment')
+    notifications = KeysetPaginator(notifications, NOTIFICATIONS_PER_PAGE).get_page(request.GET.get('cursor'))
 
     # Mark unread notifications as read
     Notification.objects.filter(
         recipient=request.user,
         is_read=False
     ).update(is_read=True)
+    reset_unread_notifications_count(request.user.pk, 0)
 
     context = {
         'notifications': notifications
@@ -661,7 +723,7 @@ def change_email(request):
         # Process the email change request
         new_email = request.POST['email']
         # Logic to verify email and send token can go here
-        send_mail("Change your email", "Verification token", "no-reply@example.com", [new_email])
+        queue_mail("Change your email", "Verification token", "no-reply@example.com", [new_email])
         return redirect('settings')  # Redirect back to settings after email change request
     
     return render(request, 'users/change_email.html')
@@ -691,65 +753,73 @@ def change_email(request):
 
 from django.shortcuts import render
 from blog.models import *
+from blog.analytics import get_author_analytics
+from blog.engagement import engagement_series
 from django.core.paginator import Paginator
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 
+@login_required
 def analytics_page(request):
-    # Get all blogs by the logged-in user, ordered by creation date
-    blogs = Blog.objects.filter(author=request.user).order_by('-created_at')
-
-    # Debugging print: List of blogs retrieved
-    print("Blogs Retrieved: ", blogs)
+    # Aggregates for all of the user's blogs, newest first, from one cached grouped query
+    analytics = get_author_analytics(request.user.pk)
 
-    # Pagination: Display 5 blogs per page
-    paginator = Paginator(blogs, 5)  # Show 5 blogs per page
+    # Pagination: Display 5 blogs per page (of the already aggregated rows)
+    paginator = Paginator(analytics['posts'], 5)  # Show 5 blogs per page
     page_number = request.GET.get('page')  # Get the current page number from the URL
     page_obj = paginator.get_page(page_number)
 
-    # Gather analytics data for each blog
-    blog_analytics = []
-    for blog in page_obj:
-        reactions_data = {
-            'like': blog.get_reaction_count('like'),
-            'love': blog.get_reaction_count('love'),
-            'haha': blog.get_reaction_count('haha'),
-            'wow': blog.get_reaction_count('wow'),
-            'applaud': blog.get_reaction_count('applaud')
-        }
-
-        # Calculate total reactions
-        total_reactions = sum(reactions_data.values())
-
-        # Total comments and reads
-        comments_count = blog.comments.count()
-        total_reads = blog.read_count
-
-        # Debugging print: Key metrics for each blog
-        print(f"Blog: {blog.title}")
-        print(f"Reads: {total_reads}, Comments: {comments_count}, Total Reactions: {total_reactions}")
-
-        # Add data to the list
-        blog_analytics.append({
-            'blog': blog,
-            'reactions': reactions_data,
-            'comments_count': comments_count,
-            'total_reads': total_reads,
-            'chart_data': [total_reads, comments_count, total_reactions]  # Format for chart
-        })
-
-    # Total counts for the header
-    total_blogs = blogs.count()
-    total_reads = sum(blog['total_reads'] for blog in blog_analytics)
-    total_engagements = sum(blog['comments_count'] + sum(blog['reactions'].values()) for blog in blog_analytics)
-
-    # Debugging print: Total values
-    print("Total Blogs: ", total_blogs)
-    print("Total Reads: ", total_reads)
-    print("Total Engagements: ", total_engagements)
-
+    # The header totals cover every blog, not just the current page
     return render(request, 'users/analytics.html', {
-        'blogs': blog_analytics,
-        'total_blogs': total_blogs,
-        'total_reads': total_reads,
-        'total_engagements': total_engagements,
+        'blogs': page_obj,
+        'total_blogs': analytics['total_blogs'],
+        'total_reads': analytics['total_reads'],
+        'total_engagements': analytics['total_engagements'],
         'page_obj': page_obj,  # Pass the pagination object to the template
     })
+
+
+def _parse_series_bound(value):
+    """Parses an ISO date (its midnight) or datetime in the site's time zone."""
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"Invalid date: {value}")
+        moment = datetime.combine(day, datetime.min.time())
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+@login_required
+def analytics_series(request):
+    """
+    Engagement history of the user's posts as ApexCharts series, served from
+    the rollup tables. Query parameters: start and end (ISO dates or datetimes,
+    default the last 30 days), granularity (hour or day), blog (a slug of the
+    user's) and any number of metric values.
+    """
+    try:
+        end = _parse_series_bound(request.GET['end']) if request.GET.get('end') else timezone.now()
+        start = _parse_series_bound(request.GET['start']) if request.GET.get('start') else end - timedelta(days=30)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    metrics = request.GET.getlist('metric') or ENGAGEMENT_METRICS
+    unknown = set(metrics) - set(ENGAGEMENT_METRICS)
+    if unknown:
+        return JsonResponse({'error': f"Unknown metrics: {', '.join(sorted(unknown))}"}, status=400)
+
+    blog_id = None
+    if request.GET.get('blog'):
+        blog_id = get_object_or_404(Blog.objects.only('id'), slug=request.GET['blog'], author=request.user).pk
+
+    try:
+        series = engagement_series(
+            request.user.pk, start, end, granularity=request.GET.get('granularity') or None,
+            blog_id=blog_id, metrics=metrics,
+        )
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse(series)